@@ -0,0 +1,135 @@
+"""
+Times what the Airflow scheduler pays to parse each DAG file, against an
+import-time budget.
+
+Each DAG file's module-level imports run in a fresh interpreter, as they do
+when the scheduler parses the file. The "eager" row runs every import the
+file and its task module (injury_etl.tasks, injury_etl.backfill_tasks) make
+anywhere, which is what parsing cost when the tasks' imports still sat at
+the top. Airflow's own imports are left out of both so the
+numbers are comparable with or without Airflow installed. When Airflow is
+installed, the whole file is also imported and timed.
+
+    python benchmarks/bench_dag_import.py
+    python benchmarks/bench_dag_import.py --budget-ms 20 --repeat 10
+
+Exits non-zero when a DAG's parse-time imports exceed the budget or pull in
+a heavy dependency.
+"""
+import argparse
+import ast
+import glob
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DAG_DIR = os.path.join(ROOT, "dags")
+
+# Parsing a DAG file must not import any of these
+HEAVY_MODULES = ("injury_etl", "requests", "bs4", "lxml", "psycopg2", "pandas", "numpy", "orjson")
+# ...other than the modules holding the task callables, which import nothing
+# heavy at module level
+TASK_MODULES = ("injury_etl", "injury_etl.tasks", "injury_etl.backfill_tasks")
+
+# Run in the child interpreter: times the imports, then reports which heavy
+# modules ended up loaded
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+exec(compile({source!r}, {path!r}, "exec"), {{"__name__": "dag_under_test", "__file__": {path!r}}})
+elapsed = time.perf_counter() - t0
+heavy = sorted({{name.split(".")[0] for name in sys.modules if name not in {allowed!r}}} & set({heavy!r}))
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def import_statements(tree, top_level_only):
+    nodes = tree.body if top_level_only else ast.walk(tree)
+    statements = []
+    for node in nodes:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        else:
+            continue
+        if not any(name.split(".")[0] == "airflow" for name in names):
+            statements.append(ast.unparse(node))
+    return "\n".join(statements)
+
+
+def task_module_trees(tree):
+    """Parsed sources of the injury_etl task modules a DAG file imports."""
+    trees = []
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module == "injury_etl":
+            names = [f"injury_etl.{alias.name}" for alias in node.names]
+        elif isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        else:
+            continue
+        for name in names:
+            if name in TASK_MODULES[1:]:
+                with open(os.path.join(ROOT, *name.split(".")) + ".py") as f:
+                    trees.append(ast.parse(f.read()))
+    return trees
+
+
+def run_child(source, path):
+    code = CHILD.format(root=ROOT, source=source, path=path, heavy=HEAVY_MODULES, allowed=TASK_MODULES)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(source, path, repeat):
+    runs = [run_child(source, path) for _ in range(repeat)]
+    return statistics.median(r["seconds"] for r in runs) * 1000, runs[-1]["heavy"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget-ms", type=float, default=20.0,
+                        help="allowed median parse-time import cost per DAG file, Airflow excluded")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with_airflow = importlib.util.find_spec("airflow") is not None
+    failures = []
+
+    print(f"{'dag':<26}{'case':<10}{'median':>10}  heavy modules loaded")
+    for path in sorted(glob.glob(os.path.join(DAG_DIR, "injury_*.py"))):
+        name = os.path.basename(path)
+        with open(path) as f:
+            source = f.read()
+        tree = ast.parse(source)
+
+        cases = {
+            "parse": import_statements(tree, top_level_only=True),
+            "eager": "\n".join(import_statements(t, top_level_only=False)
+                                for t in [tree, *task_module_trees(tree)]),
+        }
+        if with_airflow:
+            cases["full"] = source
+
+        for case, code in cases.items():
+            ms, heavy = measure(code, path, args.repeat)
+            print(f"{name:<26}{case:<10}{ms:>8.1f}ms  {', '.join(heavy) or '-'}")
+            if case == "parse" and ms > args.budget_ms:
+                failures.append(f"{name}: parse-time imports take {ms:.1f}ms, budget {args.budget_ms:.0f}ms")
+            if case != "eager" and heavy:
+                failures.append(f"{name}: parsing imports {', '.join(heavy)}")
+
+    if not with_airflow:
+        print("Airflow is not installed; full-file parse not timed.")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measures extractor throughput, retries and concurrency against the local
+stand-in server (benchmarks/standin.py), with no network access.
+
+Each scenario fetches a fresh range of Understat match pages through
+extract_understat_matches at several worker counts and reports pages per
+second, the requests the server saw per page (retries included), the
+connections opened, the peak number of requests in flight, and pages that
+failed for good.
+
+    python benchmarks/bench_extract.py
+    python benchmarks/bench_extract.py --pages 380 --workers 1 8 16 --latency 0.1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.standin import StandInServer
+
+SCENARIOS = {
+    "clean": {},
+    "errors": {"error_rate": 0.1},
+    "throttled": {"throttle_rate": 0.1},
+    "oversized": {"oversize_rate": 0.02},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = StandInServer(latency=args.latency, oversize_bytes=16 * 1024 * 1024, seed=args.seed).start()
+    # Configure the extractor before it is imported; the cache goes to a
+    # throwaway directory so every page is really fetched.
+    os.environ.update(server.env())
+    os.environ["INJURY_ETL_CACHE_DIR"] = tempfile.mkdtemp()
+    os.environ["INJURY_ETL_MAX_RESPONSE_BYTES"] = str(8 * 1024 * 1024)
+    from injury_etl.extract import extract_understat_matches
+
+    print(f"{'scenario':<12}{'workers':>8}{'pages/s':>10}{'req/page':>10}{'conns':>7}{'in flight':>11}{'failed':>8}")
+    next_id = 30000
+    try:
+        for name in args.scenarios:
+            for workers in args.workers:
+                for attr in ("error_rate", "throttle_rate", "oversize_rate"):
+                    setattr(server, attr, SCENARIOS[name].get(attr, 0.0))
+                server.reset_stats()
+
+                match_ids = range(next_id, next_id + args.pages)
+                next_id += args.pages
+                done, failed = 0, 0
+                t0 = time.perf_counter()
+                try:
+                    for _ in extract_understat_matches(match_ids, max_workers=workers):
+                        done += 1
+                except RuntimeError:
+                    failed = args.pages - done
+                elapsed = time.perf_counter() - t0
+
+                stats = server.stats
+                print(f"{name:<12}{workers:>8}{done / elapsed:>10.1f}{stats['requests'] / args.pages:>10.2f}"
+                      f"{stats['connections']:>7}{stats['max_in_flight']:>11}{failed:>8}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Times the streaming injury table parser (iter_injury_rows) against the
+BeautifulSoup path used by transform_injury_data, and reports the peak RSS
+of each in a fresh interpreter so the numbers do not contaminate each other.
+Both parsers must return the same rows, names included; the synthetic pages
+come with and without a <meta charset>.
+
+    python benchmarks/bench_injury_parse.py --scale 1 --scale 10 --scale 100
+    python benchmarks/bench_injury_parse.py --html saved_injury_table.html
+"""
+import argparse
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.fixtures import injury_table_page
+
+WARM_UP_PAGE = (
+    b"<html><body><table class=\"injury-table injury-table-full\">"
+    b"<tr class=\"heading\"><td><div class=\"injury-team\">Arsenal</div></td></tr>"
+    b"<tr class=\"player-row\">" + b"<td>x</td>" * 6 + b"</tr></table></body></html>"
+)
+
+
+def with_sidebar(page, rows):
+    """Adds a second, unrelated table of `rows` rows after the injury table."""
+    sidebar = "<table class=\"fixtures\">" + "<tr><td>Arsenal</td><td>v</td><td>Chelsea</td></tr>" * rows + "</table>"
+    return page.replace(b"<footer>", sidebar.encode() + b"<footer>")
+
+
+def parse_soup(content):
+    from bs4 import BeautifulSoup
+    from injury_etl.transform import extract_player_injury, extract_team_name, should_skip_row
+
+    soup = BeautifulSoup(content, "lxml")
+    table = soup.find("table", class_="injury-table injury-table-full")
+    current_team = None
+    rows = []
+    for row in table.find_all("tr"):
+        class_list = row.get("class", [])
+        if "heading" in class_list:
+            current_team = extract_team_name(row)
+            continue
+        if should_skip_row(class_list) or not current_team:
+            continue
+        if "player-row" in class_list:
+            injury = extract_player_injury(row)
+            if injury:
+                rows.append((current_team, injury))
+    return rows
+
+
+def parse_stream(content):
+    from injury_etl.transform import iter_injury_rows
+
+    return list(iter_injury_rows(content))
+
+
+def child(mode, source):
+    parse = parse_soup if mode == "soup" else parse_stream
+    # Parse a one-row page first so module loading is not counted as parse
+    # time or memory
+    parse(WARM_UP_PAGE)
+
+    content = open(source, "rb").read()
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    rows = parse(content)
+    elapsed = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base
+    digest = hashlib.blake2b(json.dumps(rows, sort_keys=True).encode(), digest_size=16).hexdigest()
+    print(json.dumps({"rows": len(rows), "digest": digest, "seconds": elapsed, "peak_kb": peak}))
+
+
+def measure(mode, path):
+    out = subprocess.run([sys.executable, __file__, "--child", mode, path],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, action="append")
+    parser.add_argument("--html", action="append", default=[])
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(*args.child)
+
+    import tempfile
+
+    pages = list(args.html)
+    tmpdir = tempfile.mkdtemp()
+    for scale in args.scale or [1, 10, 100]:
+        path = os.path.join(tmpdir, f"synthetic_x{scale}.html")
+        with open(path, "wb") as f:
+            f.write(injury_table_page(scale=scale))
+        pages.append(path)
+    # Rows outside the injury table have to be freed as well, or memory
+    # grows with the rest of the page
+    path = os.path.join(tmpdir, "synthetic_sidebar.html")
+    with open(path, "wb") as f:
+        f.write(with_sidebar(injury_table_page(), 200 * max(args.scale or [100])))
+    pages.append(path)
+    path = os.path.join(tmpdir, "synthetic_no_charset.html")
+    with open(path, "wb") as f:
+        f.write(injury_table_page(meta_charset=False))
+    pages.append(path)
+
+    print(f"{'page':<22}{'rows':>7}{'soup (s)':>10}{'stream (s)':>12}{'soup peak':>12}{'stream peak':>13}")
+    for path in pages:
+        soup, stream = measure("soup", path), measure("stream", path)
+        assert (soup["rows"], soup["digest"]) == (stream["rows"], stream["digest"]), (path, soup, stream)
+        print(f"{os.path.basename(path):<22}{stream['rows']:>7}{soup['seconds']:>10.3f}{stream['seconds']:>12.3f}"
+              f"{soup['peak_kb'] / 1024:>10.1f}MB{stream['peak_kb'] / 1024:>11.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Compares the per-row INSERT load path with the COPY-based bulk path.
+
+Needs a throwaway local Postgres; the prem_injury schema in it is dropped
+and recreated for every run.
+
+    INJURY_BENCH_DSN="dbname=bench user=postgres host=localhost" \
+        python benchmarks/bench_load.py --players 5000 --matches 3800
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import psycopg2 as pg
+
+from injury_etl.load import (
+    create_injury_schema, load_teams,
+    insert_matches, insert_player_details, insert_player_stats, load_injuries_data,
+    bulk_insert_matches, bulk_insert_player_details, bulk_insert_player_stats, bulk_load_injuries_data,
+)
+from injury_etl.reference import create_reference_schema
+
+
+def make_rows(n_players, n_matches, seed=0):
+    rng = random.Random(seed)
+    start = date(2024, 8, 16)
+
+    matches = [{
+        "match_id": 20000 + i,
+        "date": (start + timedelta(days=i // 10)).isoformat(),
+        "home_team_id": rng.randint(1, 20),
+        "away_team_id": rng.randint(1, 20),
+        "result": rng.choice("HAD"),
+        "xg_home": round(rng.uniform(0, 4), 3),
+        "xg_away": round(rng.uniform(0, 4), 3),
+    } for i in range(n_matches)]
+
+    players, stats = [], []
+    for i in range(n_players):
+        team_id = rng.randint(1, 20)
+        players.append({
+            "understat_id": 1000 + i,
+            "name": f"Player {i}",
+            "position": rng.choice(["F", "M", "D", "GK"]),
+            "team_id": team_id,
+            "season": "2024",
+        })
+        stats.append({
+            "understat_id": 1000 + i,
+            "team_id": team_id,
+            "league": "EPL",
+            "season": "2024",
+            "games": rng.randint(0, 38),
+            "minutes": rng.randint(0, 3420),
+            "goals": rng.randint(0, 30),
+            "assists": rng.randint(0, 20),
+            "xg": round(rng.uniform(0, 25), 3),
+            "xa": round(rng.uniform(0, 15), 3),
+        })
+
+    return matches, players, stats
+
+
+def make_injuries(conn, n, seed=0):
+    rng = random.Random(seed)
+    with conn.cursor() as cur:
+        cur.execute("SELECT id, team_id FROM prem_injury.player_details ORDER BY id LIMIT %s", (n,))
+        return [{
+            "player_id": player_id,
+            "team_id": team_id,
+            "reason": rng.choice(["Hamstring", "Knee", "Ankle", "Illness"]),
+            "detail": "Synthetic",
+            "potential_return": None,
+            "condition": "Out",
+            "status": "Ruled Out",
+        } for player_id, team_id in cur.fetchall()]
+
+
+def reset_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute("DROP SCHEMA IF EXISTS prem_injury CASCADE")
+    create_injury_schema(conn)
+    create_reference_schema(conn)
+    with conn.cursor() as cur:
+        load_teams(cur)
+    conn.commit()
+
+
+def run(conn, matches, players, stats, n_injuries, bulk):
+    reset_schema(conn)
+    timings = {}
+    for label in ("insert", "upsert"):
+        t0 = time.perf_counter()
+        with conn.cursor() as cur:
+            if bulk:
+                bulk_insert_matches(cur, matches)
+                bulk_insert_player_details(cur, players)
+                bulk_insert_player_stats(cur, stats)
+            else:
+                insert_matches(cur, matches)
+                insert_player_details(cur, players)
+                insert_player_stats(cur, stats)
+        conn.commit()
+
+        injuries = make_injuries(conn, n_injuries)
+        if bulk:
+            bulk_load_injuries_data(conn, injuries)
+        else:
+            load_injuries_data(conn, injuries)
+        timings[label] = time.perf_counter() - t0
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--players", type=int, default=5000)
+    parser.add_argument("--matches", type=int, default=3800)
+    parser.add_argument("--injuries", type=int, default=500)
+    args = parser.parse_args()
+
+    conn = pg.connect(os.environ.get("INJURY_BENCH_DSN", "dbname=postgres host=localhost"))
+    matches, players, stats = make_rows(args.players, args.matches)
+
+    per_row = run(conn, matches, players, stats, args.injuries, bulk=False)
+    bulk = run(conn, matches, players, stats, args.injuries, bulk=True)
+    conn.close()
+
+    print(f"\n{'pass':<8}{'per-row (s)':>14}{'bulk (s)':>12}{'speedup':>10}")
+    for label in ("insert", "upsert"):
+        print(f"{label:<8}{per_row[label]:>14.3f}{bulk[label]:>12.3f}"
+              f"{per_row[label] / bulk[label]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compares transformed rows held as dicts with the same rows as records
+(injury_etl.records): memory held by the row lists, pickle size and time,
+and an artifact store round trip.
+
+    python benchmarks/bench_records.py
+    python benchmarks/bench_records.py --seasons 10 --repeat 5
+"""
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.fixtures import TEAMS, understat_dates, understat_players
+from injury_etl.artifacts import ArtifactStore
+from injury_etl.records import as_dicts
+from injury_etl.transform import transform_match_data, transform_player_stats
+
+PLAYERS_PER_SEASON = 600
+MATCHES_PER_SEASON = 380
+
+
+def build(seasons):
+    team_name_to_id = {name: i + 1 for i, name in enumerate(TEAMS)}
+    matches, players, stats = [], [], []
+    for season in range(seasons):
+        matches += transform_match_data(understat_dates(MATCHES_PER_SEASON, season), team_name_to_id)
+        p, s = transform_player_stats(understat_players(PLAYERS_PER_SEASON, season), team_name_to_id)
+        players += p
+        stats += s
+    return {"matches": matches, "players": players, "player_stats": stats}
+
+
+def held_bytes(make):
+    # Memory still allocated once make() returns: the row containers, since
+    # both shapes share the same field values
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rows = make()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return rows, held
+
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seasons", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            source = build(args.seasons)
+        finally:
+            sys.stdout = stdout
+
+    store = ArtifactStore(tempfile.mkdtemp())
+    print(f"{'rows':<14}{'shape':<9}{'count':>8}{'held MB':>9}{'pickle MB':>11}{'pickle s':>10}"
+          f"{'store s':>9}{'store KB':>10}")
+    for name, records in source.items():
+        for shape, make in (("dicts", lambda: as_dicts(records)),
+                            ("records", lambda: [type(r)._make(r) for r in records])):
+            rows, held = held_bytes(make)
+            blob = pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle_time = best(lambda: pickle.loads(pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL)),
+                               args.repeat)
+            ref = store.put_rows("bench", f"{name}-{shape}", rows)
+            store_time = best(lambda: store.get_rows(store.put_rows("bench", f"{name}-{shape}", rows)),
+                              args.repeat)
+            print(f"{name:<14}{shape:<9}{len(rows):>8}{held / 2 ** 20:>9.2f}{len(blob) / 2 ** 20:>11.2f}"
+                  f"{pickle_time:>10.4f}{store_time:>9.3f}{ref['bytes'] / 1024:>10.0f}")
+    store.delete_run("bench")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Compares fetching the injury page and the Understat league page one after
+the other with fetching them together through extract_sources, against the
+local stand-in server with a slow ScraperAPI render.
+
+    python benchmarks/bench_sources.py
+    python benchmarks/bench_sources.py --render-latency 3 --latency 0.2 --repeat 5
+
+Concurrent wall time should sit close to the slower source alone rather than
+the sum of both.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.standin import StandInServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--render-latency", type=float, default=1.0, help="seconds ScraperAPI takes to render")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds every response takes")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    server = StandInServer(latency=args.latency, render_latency=args.render_latency).start()
+    os.environ.update(server.env())
+    from injury_etl import cache, extract
+
+    def sequential():
+        return {"injuries": extract.extract_injury_page(), "understat": extract.extract_understat_league()}
+
+    cases = {
+        "injuries only": extract.extract_injury_page,
+        "understat only": extract.extract_understat_league,
+        "sequential": sequential,
+        "extract_sources": extract.extract_sources,
+    }
+
+    print(f"{'case':<18}{'median':>9}{'min':>9}{'conns':>7}")
+    try:
+        for name, fn in cases.items():
+            times, connections = [], 0
+            for _ in range(args.repeat):
+                # A fresh cache directory each time so every page is fetched
+                os.environ["INJURY_ETL_CACHE_DIR"] = tempfile.mkdtemp()
+                cache._cache = None
+                server.reset_stats()
+                t0 = time.perf_counter()
+                fn()
+                times.append(time.perf_counter() - t0)
+                connections += server.stats["connections"]
+            print(f"{name:<18}{statistics.median(times):>8.3f}s{min(times):>8.3f}s{connections / args.repeat:>7.1f}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
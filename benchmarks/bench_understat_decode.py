@@ -0,0 +1,126 @@
+"""
+Times parse_understat_page against the old lazy-regex scan and
+decode("unicode_escape") + json.loads round trip on full-season datesData and
+playersData payloads, reports the peak RSS of each in a fresh interpreter,
+and counts player names the old path mangled.
+
+    python benchmarks/bench_understat_decode.py --scale 1 --scale 10
+    python benchmarks/bench_understat_decode.py --html saved_page.html
+"""
+import argparse
+import importlib.util
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.fixtures import understat_league_page
+
+VARIABLES = ("datesData", "playersData")
+
+
+LEGACY_RE = re.compile(rb"var\s+(\w+)\s*=\s*JSON\.parse\('(.*?)'\)", re.DOTALL)
+
+
+def decode_legacy(content):
+    found = {}
+    for match in LEGACY_RE.finditer(content):
+        name = match.group(1).decode("ascii")
+        if name in VARIABLES:
+            found[name] = json.loads(match.group(2).decode("unicode_escape"))
+    return found
+
+
+def decode_fast(content):
+    from injury_etl.extract import parse_understat_page
+
+    return parse_understat_page(content, VARIABLES)
+
+
+def decode_fields(content):
+    from injury_etl.extract import UNDERSTAT_FIELDS, parse_understat_page
+
+    return parse_understat_page(content, VARIABLES, UNDERSTAT_FIELDS)
+
+
+def decode_orjson(content):
+    import orjson
+    from injury_etl.extract import parse_understat_page
+
+    return parse_understat_page(content, VARIABLES, loads=orjson.loads)
+
+
+MODES = {"legacy": decode_legacy, "fast": decode_fast, "fields": decode_fields, "orjson": decode_orjson}
+
+
+def peak_rss_kb():
+    # ru_maxrss survives exec, so a child would report the parent's peak
+    # from building the fixtures; VmHWM belongs to the new address space.
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# Decoded once before measuring, so every mode has loaded its modules first
+# and their import cost is not counted as decode memory
+EMPTY_PAGE = b"".join(b"var %s = JSON.parse('\\x5B\\x5D');" % name.encode() for name in VARIABLES)
+
+
+def child(mode, source):
+    MODES[mode](EMPTY_PAGE)
+
+    content = open(source, "rb").read()
+    base = peak_rss_kb()
+    t0 = time.perf_counter()
+    data = MODES[mode](content)
+    elapsed = time.perf_counter() - t0
+    peak = peak_rss_kb() - base
+    mangled = sum(1 for p in data["playersData"] if "Ã" in p["player_name"] or "Ä" in p["player_name"])
+    print(json.dumps({"rows": len(data["playersData"]), "mangled": mangled, "seconds": elapsed, "peak_kb": peak}))
+
+
+def measure(mode, path):
+    out = subprocess.run([sys.executable, __file__, "--child", mode, path],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, action="append")
+    parser.add_argument("--html", action="append", default=[])
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(*args.child)
+
+    import tempfile
+
+    pages = list(args.html)
+    tmpdir = tempfile.mkdtemp()
+    for scale in args.scale or [1, 10]:
+        path = os.path.join(tmpdir, f"synthetic_x{scale}.html")
+        with open(path, "wb") as f:
+            f.write(understat_league_page(scale=scale))
+        pages.append(path)
+
+    print(f"{'page':<20}{'mode':>8}{'seconds':>10}{'peak':>11}{'mangled names':>15}")
+    for path in pages:
+        for mode in MODES:
+            if mode == "orjson" and importlib.util.find_spec("orjson") is None:
+                continue
+            result = measure(mode, path)
+            print(f"{os.path.basename(path):<20}{mode:>8}{result['seconds']:>10.3f}"
+                  f"{result['peak_kb'] / 1024:>9.1f}MB{result['mangled']:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Times parse_understat_page against the previous BeautifulSoup extraction,
+which built the DOM and scanned every <script> tag once per dataset.
+
+    python benchmarks/bench_understat_parse.py --scale 1 --scale 10
+    python benchmarks/bench_understat_parse.py --html saved_page.html
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bs4 import BeautifulSoup
+
+from benchmarks.fixtures import understat_league_page
+from injury_etl.extract import parse_understat_page
+
+
+def legacy_parse(content, variable):
+    soup = BeautifulSoup(content, "lxml")
+    script_tag = next(s for s in soup.find_all("script") if variable in s.text)
+    start = script_tag.text.find("JSON.parse('") + len("JSON.parse('")
+    end = script_tag.text.find("')", start)
+    raw_json = script_tag.text[start:end]
+    return json.loads(raw_json.encode("utf-8").decode("unicode_escape"))
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, action="append")
+    parser.add_argument("--html", action="append", default=[])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = [(path, open(path, "rb").read()) for path in args.html]
+    pages += [(f"synthetic x{s}", understat_league_page(scale=s)) for s in (args.scale or [1, 10])]
+
+    print(f"{'page':<20}{'size':>10}{'legacy (s)':>12}{'scan (s)':>11}{'speedup':>10}")
+    for label, content in pages:
+        # The legacy path parsed the page once for matches and once for players.
+        legacy = best_of(lambda: (legacy_parse(content, "datesData"),
+                                  legacy_parse(content, "playersData")), args.repeat)
+        scan = best_of(lambda: parse_understat_page(content), args.repeat)
+        print(f"{label:<20}{len(content) / 1e6:>8.1f}MB{legacy:>12.3f}{scan:>11.3f}{legacy / scan:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Synthetic stand-ins for the pages the extractors scrape.
+
+The generators mirror the structure of the live pages closely enough for
+the parsers to treat them as real, and scale with the number of rows asked
+for so the hot paths can be timed at several multiples of a real season.
+"""
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+
+# Pages checked in under benchmarks/fixtures/, used in place of the
+# generators below when present. manifest.json says where each came from:
+# `benchmarks/run.py --record` saves the live pages, `--pin-synthetic` the
+# generators' own pages at scale 1.
+RECORDED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+MANIFEST_PATH = os.path.join(RECORDED_DIR, "manifest.json")
+
+
+def recorded_page(name):
+    path = os.path.join(RECORDED_DIR, name + ".html.gz")
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, "rb") as f:
+        return f.read()
+
+
+def fixture_manifest() -> dict:
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+
+def save_fixture(name, content, **source):
+    """
+    Saves a page under RECORDED_DIR and records its digest and `source`
+    (e.g. url and date, or the generator call) in the manifest.
+    """
+    os.makedirs(RECORDED_DIR, exist_ok=True)
+    # mtime=0 so saving the same page again gives the same file
+    with open(os.path.join(RECORDED_DIR, name + ".html.gz"), "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+            f.write(content)
+    manifest = fixture_manifest()
+    manifest[name] = {"sha256": hashlib.sha256(content).hexdigest(), "bytes": len(content), **source}
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def scale_understat_page(page, scale):
+    """
+    Repeats the records of every array payload (datesData, playersData) in a
+    saved Understat page `scale` times; object payloads are left alone.
+    """
+    if scale == 1:
+        return page
+    parts, pos = [], 0
+    for match in re.finditer(rb"JSON\.parse\('(\\x5B|\[)", page):
+        end = page.find(b"')", match.end())
+        close = b"\\x5D" if match.group(1) != b"[" else b"]"
+        comma = b"\\x2C" if match.group(1) != b"[" else b","
+        inner = page[match.end():end - len(close)]
+        parts += [page[pos:match.end()], comma.join([inner] * scale) if inner.strip() else inner]
+        pos = end - len(close)
+    return b"".join(parts) + page[pos:]
+
+
+def scale_injury_page(page, scale):
+    """Repeats every row of a saved injury table page `scale` times."""
+    if scale == 1:
+        return page
+    table = page.find(b"injury-table-full")
+    start = page.find(b"<tr", table)
+    end = page.rfind(b"</tr>", start, page.find(b"</table>", start)) + len(b"</tr>")
+    return page[:start] + page[start:end] * scale + page[end:]
+
+TEAMS = [
+    "Arsenal", "Aston Villa", "Bournemouth", "Brentford", "Brighton",
+    "Chelsea", "Crystal Palace", "Everton", "Fulham", "Ipswich",
+    "Leicester", "Liverpool", "Manchester City", "Manchester United",
+    "Newcastle United", "Nottingham Forest", "Southampton", "Tottenham",
+    "West Ham", "Wolverhampton Wanderers",
+]
+
+FIRST_NAMES = ["Bukayo", "Martin", "Gabriel", "Mohamed", "Erling", "Bruno", "Heung-Min",
+               "Son", "Raúl", "Jérémy", "Łukasz", "İlkay", "Đorđe", "João", "Ødegaard"]
+LAST_NAMES = ["Saka", "Ødegaard", "Jesus", "Salah", "Haaland", "Fernandes", "Son",
+              "Jiménez", "Doku", "Fabiański", "Gündoğan", "Petrović", "Félix", "Müller"]
+
+
+def _hex_escape(text):
+    # Understat escapes every non-alphanumeric ASCII character as \xNN and
+    # leaves non-ASCII characters as raw UTF-8.
+    return "".join(
+        c if c.isalnum() or ord(c) > 127 else f"\\x{ord(c):02X}"
+        for c in text
+    )
+
+
+def understat_dates(n_matches, seed=0, played=0.75):
+    """
+    Every fixture of a season, like the real datesData; only the first
+    `played` share have a result, the rest have null goals and xG.
+    """
+    rng = random.Random(seed)
+    dates = []
+    for i in range(n_matches):
+        home, away = rng.sample(TEAMS, 2)
+        is_result = i < n_matches * played
+        goals = {"h": str(rng.randint(0, 5)), "a": str(rng.randint(0, 5))}
+        xg = {"h": f"{rng.uniform(0, 4):.5f}", "a": f"{rng.uniform(0, 4):.5f}"}
+        dates.append({
+            "id": str(26000 + i),
+            "isResult": is_result,
+            "h": {"id": str(TEAMS.index(home) + 70), "title": home, "short_title": home[:3].upper()},
+            "a": {"id": str(TEAMS.index(away) + 70), "title": away, "short_title": away[:3].upper()},
+            "goals": goals if is_result else {"h": None, "a": None},
+            "xG": xg if is_result else {"h": None, "a": None},
+            "datetime": f"2024-{8 + i % 5:02d}-{1 + i % 28:02d} 15:00:00",
+            "forecast": {"w": "0.4", "d": "0.3", "l": "0.3"},
+        })
+    return dates
+
+
+def understat_players(n_players, seed=0):
+    rng = random.Random(seed)
+    players = []
+    for i in range(n_players):
+        players.append({
+            "id": str(1000 + i),
+            "player_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}",
+            "games": str(rng.randint(0, 38)),
+            "time": str(rng.randint(0, 3420)),
+            "goals": str(rng.randint(0, 30)),
+            "xG": f"{rng.uniform(0, 25):.10f}",
+            "assists": str(rng.randint(0, 20)),
+            "xA": f"{rng.uniform(0, 15):.10f}",
+            "shots": str(rng.randint(0, 120)),
+            "key_passes": str(rng.randint(0, 90)),
+            "yellow_cards": str(rng.randint(0, 12)),
+            "red_cards": str(rng.randint(0, 2)),
+            "position": rng.choice(["F S", "M C", "D L", "GK", "F M S"]),
+            "team_title": rng.choice(TEAMS),
+            "npg": str(rng.randint(0, 25)),
+            "npxG": f"{rng.uniform(0, 20):.10f}",
+            "xGChain": f"{rng.uniform(0, 30):.10f}",
+            "xGBuildup": f"{rng.uniform(0, 20):.10f}",
+        })
+    return players
+
+
+def understat_teams(n_matches, seed=0):
+    rng = random.Random(seed)
+    per_team = max(1, n_matches * 2 // len(TEAMS))
+    return {
+        str(70 + i): {
+            "id": str(70 + i),
+            "title": title,
+            "history": [{
+                "h_a": rng.choice("ha"),
+                "xG": rng.uniform(0, 4),
+                "xGA": rng.uniform(0, 4),
+                "scored": rng.randint(0, 5),
+                "missed": rng.randint(0, 5),
+                "result": rng.choice("wdl"),
+                "date": "2024-08-17 15:00:00",
+            } for _ in range(per_team)],
+        }
+        for i, title in enumerate(TEAMS)
+    }
+
+
+def understat_league_page(scale=1, seed=0):
+    """Builds an Understat league page; scale=1 is roughly one EPL season."""
+    n_matches, n_players = 380 * scale, 550 * scale
+    blobs = {
+        "datesData": understat_dates(n_matches, seed),
+        "playersData": understat_players(n_players, seed),
+        "teamsData": understat_teams(n_matches, seed),
+    }
+
+    # Pad the page with the boilerplate the real one carries so a DOM
+    # parser has a comparable amount of markup to chew through.
+    filler = "".join(
+        f'<div class="block"><a href="/team/{t}/2024">{t}</a><span>{i}</span></div>\n'
+        for i, t in enumerate(TEAMS * 40)
+    )
+    scripts = "".join(
+        f"<script>\n\tvar {name}\t= JSON.parse('{_hex_escape(json.dumps(data, ensure_ascii=False))}');\n</script>\n"
+        for name, data in blobs.items()
+    )
+
+    html = (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>EPL 2024/2025</title>"
+        "<script src=\"/js/app.js\"></script></head><body>\n"
+        f"{filler}{scripts}"
+        "<script>var lang = 'en';</script></body></html>"
+    )
+    return html.encode("utf-8")
+
+
+def understat_match_rosters(match_id, seed=0):
+    rng = random.Random(f"{seed}-{match_id}")
+    rosters = {}
+    for side in ("h", "a"):
+        roster = {}
+        # 11 starters and up to 5 substitutes, as on a real match page
+        for slot in range(11 + rng.randint(3, 5)):
+            roster_id = f"{match_id * 40 + len(rosters) * 20 + slot}"
+            roster[roster_id] = {
+                "id": roster_id,
+                "goals": str(rng.choice([0, 0, 0, 0, 1])),
+                "own_goals": "0",
+                "shots": str(rng.randint(0, 5)),
+                "xG": f"{rng.uniform(0, 1):.10f}",
+                "time": str(90 if slot < 11 else rng.randint(1, 30)),
+                "player_id": str(1000 + rng.randrange(550)),
+                "team_id": str(70 + rng.randrange(len(TEAMS))),
+                "position": rng.choice(["GK", "DC", "DL", "MC", "AMC", "FW"]) if slot < 11 else "Sub",
+                "player": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "h_a": side,
+                "yellow_card": str(rng.choice([0, 0, 0, 1])),
+                "red_card": "0",
+                "roster_in": "0",
+                "roster_out": "0",
+                "key_passes": str(rng.randint(0, 4)),
+                "assists": str(rng.choice([0, 0, 0, 0, 1])),
+                "xA": f"{rng.uniform(0, 0.5):.10f}",
+                "xGChain": f"{rng.uniform(0, 1):.10f}",
+                "xGBuildup": f"{rng.uniform(0, 1):.10f}",
+                "positionOrder": str(slot + 1 if slot < 11 else 17),
+            }
+        rosters[side] = roster
+    return rosters
+
+
+def understat_match_shots(match_id, seed=0):
+    rng = random.Random(f"{seed}-{match_id}-shots")
+    shots = {}
+    for side in ("h", "a"):
+        shots[side] = [{
+            "id": str(match_id * 100 + (side == "a") * 50 + i),
+            "minute": str(rng.randint(1, 95)),
+            "result": rng.choice(["MissedShots", "SavedShot", "BlockedShot", "Goal"]),
+            "X": f"{rng.uniform(0.7, 0.99):.10f}",
+            "Y": f"{rng.uniform(0.2, 0.8):.10f}",
+            "xG": f"{rng.uniform(0, 0.8):.10f}",
+            "player": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "h_a": side,
+            "player_id": str(1000 + rng.randrange(550)),
+            "situation": rng.choice(["OpenPlay", "FromCorner", "SetPiece", "Penalty"]),
+            "season": "2024",
+            "shotType": rng.choice(["RightFoot", "LeftFoot", "Head"]),
+            "match_id": str(match_id),
+            "date": "2024-08-17 15:00:00",
+            "player_assisted": rng.choice([None, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"]),
+            "lastAction": rng.choice(["Pass", "Cross", "None", "Rebound"]),
+        } for i in range(rng.randint(5, 20))]
+    return shots
+
+
+def understat_match_page(match_id, seed=0):
+    """Builds one Understat match page with its shotsData and rostersData."""
+    blobs = {
+        "shotsData": understat_match_shots(match_id, seed),
+        "rostersData": understat_match_rosters(match_id, seed),
+    }
+    scripts = "".join(
+        f"<script>\n\tvar {name}\t= JSON.parse('{_hex_escape(json.dumps(data, ensure_ascii=False))}');\n</script>\n"
+        for name, data in blobs.items()
+    )
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Match</title></head><body>\n"
+        f"{scripts}</body></html>"
+    ).encode("utf-8")
+
+
+INJURY_TEAMS = [
+    "Arsenal", "Aston Villa", "Bournemouth", "Brentford", "Brighton & Hove Albion",
+    "Chelsea", "Crystal Palace", "Everton", "Fulham", "Ipswich Town",
+    "Leicester City", "Liverpool", "Manchester City", "Manchester United",
+    "Newcastle United", "Nottingham Forest", "Southampton", "Tottenham Hotspur",
+    "West Ham United", "Wolverhampton Wanderers",
+]
+INJURY_REASONS = ["Hamstring", "Knee Injury", "Ankle Injury", "Illness", "Suspended", "Groin Strain"]
+INJURY_STATUSES = ["Ruled Out", "Doubtful", "Chance of playing 75%", "Fit to play"]
+
+
+def injury_rows(n_per_team, seed=0, teams=INJURY_TEAMS):
+    """(team, player, reason, detail, return, condition, status) tuples."""
+    rng = random.Random(seed)
+    rows = []
+    for t, team in enumerate(teams):
+        for i in range(n_per_team):
+            rows.append((
+                team,
+                f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {t * n_per_team + i}",
+                rng.choice(INJURY_REASONS),
+                "Picked up in training; assessed by the medical team",
+                rng.choice(["TBC", f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025", "No Return Date"]),
+                rng.choice(["Out", "Doubtful", "Available"]),
+                rng.choice(INJURY_STATUSES),
+            ))
+    return rows
+
+
+def injury_table_page(scale=1, seed=0, meta_charset=True):
+    """
+    Builds a premierinjuries.com injury table page; scale=1 is ~10 injuries
+    per team. meta_charset=False leaves out <meta charset>, so the page's
+    UTF-8 names decode correctly only if the parser assumes UTF-8.
+    """
+    labels = ("Player", "Reason", "Further Detail", "Potential Return", "Condition", "Status")
+    rows = injury_rows(10 * scale, seed)
+
+    parts = [
+        "<!DOCTYPE html><html><head>" + ("<meta charset=\"utf-8\">" if meta_charset else "")
+        + "<title>Injury Table</title></head><body>",
+        "<div class=\"nav\">" + "<a href=\"#\">link</a>" * 200 + "</div>",
+        "<table class=\"injury-table injury-table-full\"><tbody>",
+    ]
+    current = None
+    for team, *fields in rows:
+        if team != current:
+            current = team
+            slug = team.lower().replace(" ", "-").replace("&", "and")
+            parts.append(
+                f"<tr class=\"heading\"><td colspan=\"6\"><div class=\"injury-team\">\n  {team}\n</div>"
+                f"<span class=\"injury-count\">{10 * scale} injuries</span></td></tr>"
+                f"<tr class=\"sub-head\">" + "".join(f"<th>{label}</th>" for label in labels) + "</tr>"
+                f"<tr class=\"team-ad-slot\"><td colspan=\"6\"><div class=\"ad\"></div></td></tr>"
+                f"<tr class=\"showTeam-{slug}\"><td colspan=\"6\">Show all</td></tr>"
+            )
+        cells = "".join(
+            f"<td><div class=\"mobile-label\">{label}</div>\n      {value}\n    </td>"
+            for label, value in zip(labels, fields)
+        )
+        parts.append(f"<tr class=\"player-row\">{cells}</tr>")
+    parts.append("</tbody></table><footer>" + "<p>footer</p>" * 50 + "</footer></body></html>")
+    return "".join(parts).encode("utf-8")
@@ -0,0 +1,388 @@
+"""
+Offline benchmark suite for the ETL hot paths.
+
+Times the Understat payload decode, every transform and (when a throwaway
+Postgres is configured) every load function over fixtures at several
+scales, then compares the results against a saved baseline and exits
+non-zero when any case is slower than the allowed threshold.
+
+Fixtures are the pages checked in under benchmarks/fixtures/, and scale N
+repeats their rows N times; benchmarks/fixtures/manifest.json records
+whether each was recorded live with --record (the only mode that touches
+the network) or pinned from the synthetic generators with --pin-synthetic.
+Without them the generators in benchmarks/fixtures.py grow the data N times
+instead.
+
+The checked-in benchmarks/baseline.json carries the digests of the pages it
+was timed on, and a run on different pages refuses to compare against it:
+re-save the baseline whenever the fixtures change.
+
+    python benchmarks/run.py --save-baseline            # record a baseline
+    python benchmarks/run.py --threshold 0.15           # gate against it
+    INJURY_BENCH_DSN="dbname=bench host=localhost" python benchmarks/run.py --scales 1 10 100
+"""
+import argparse
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.fixtures import (
+    INJURY_TEAMS, TEAMS, injury_table_page, recorded_page, save_fixture, scale_injury_page, scale_understat_page,
+    understat_league_page, understat_match_page,
+)
+from injury_etl.extract import UNDERSTAT_MATCH_VARIABLES, parse_understat_page
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+
+
+# --- Fixtures ------------------------------------------------------------
+
+FIXTURE_PAGES = ("understat_league", "injury_table")
+
+
+def record_fixtures():
+    """Saves the live pages once so later runs can replay them offline."""
+    from injury_etl.extract import INJURY_TABLE_URL, UNDERSTAT_LEAGUE_URL, extract_injury_page, fetch
+
+    today = datetime.date.today().isoformat()
+    url = UNDERSTAT_LEAGUE_URL.format(league="EPL", season="2024")
+    pages = {
+        "injury_table": (extract_injury_page(), INJURY_TABLE_URL),
+        "understat_league": (fetch(url).content, url),
+    }
+    for name, (content, source_url) in pages.items():
+        save_fixture(name, content, source="live", url=source_url, recorded=today)
+        print(f"Recorded {name} ({len(content) / 1e6:.1f}MB)")
+
+
+def pin_synthetic_fixtures():
+    """Saves the generators' scale-1 pages, for when the live sources cannot be reached."""
+    pages = {
+        "understat_league": (understat_league_page(scale=1), "understat_league_page(scale=1, seed=0)"),
+        "injury_table": (injury_table_page(scale=1), "injury_table_page(scale=1, seed=0)"),
+    }
+    for name, (content, generator) in pages.items():
+        save_fixture(name, content, source="synthetic", generator=generator)
+        print(f"Pinned {name} ({len(content) / 1e6:.1f}MB)")
+
+
+def fixture_digests() -> dict:
+    """sha256 of each checked-in page, or "generated" where the generators stand in."""
+    digests = {}
+    for name in FIXTURE_PAGES:
+        page = recorded_page(name)
+        digests[name] = hashlib.sha256(page).hexdigest() if page else "generated"
+    return digests
+
+
+class Fixtures:
+    def __init__(self, scale):
+        from injury_etl.transform import iter_injury_rows
+
+        self.scale = scale
+        recorded = recorded_page("understat_league")
+        if recorded:
+            self.understat_page = scale_understat_page(recorded, scale)
+        else:
+            self.understat_page = understat_league_page(scale=scale)
+        data = parse_understat_page(self.understat_page, ("datesData", "playersData"))
+        self.dates, self.players = data["datesData"], data["playersData"]
+
+        recorded = recorded_page("injury_table")
+        self.injury_page = scale_injury_page(recorded, scale) if recorded else injury_table_page(scale=scale)
+        # (team, player) of every row on the page, to seed player_details with
+        self.injury_rows = [(team, injury["Player"]) for team, injury in _quiet(list, iter_injury_rows(self.injury_page))]
+
+        self.team_name_to_id = {name: i + 1 for i, name in enumerate(TEAMS)}
+        self.team_name_to_id.update({name: i + 1 for i, name in enumerate(INJURY_TEAMS)})
+        # A recorded season may have clubs the generators do not
+        titles = {d[side]["title"] for d in self.dates for side in ("h", "a")}
+        titles |= {p["team_title"] for p in self.players} | {team for team, _ in self.injury_rows}
+        for title in sorted(titles - self.team_name_to_id.keys()):
+            self.team_name_to_id[title] = max(self.team_name_to_id.values()) + 1
+        self._match_pages = None
+
+    @property
+    def match_pages(self):
+        """(match row, page) for every played match in self.dates; one season
+        of distinct pages is generated and reused for the rest."""
+        from injury_etl.transform import is_played
+
+        if self._match_pages is None:
+            played = [d for d in self.dates if is_played(d)]
+            distinct = [understat_match_page(int(d["id"])) for d in played[:380]]
+            self._match_pages = [
+                ({"match_id": int(d["id"]), "home_team_id": self.team_name_to_id[d["h"]["title"]],
+                  "away_team_id": self.team_name_to_id[d["a"]["title"]]}, distinct[i % len(distinct)])
+                for i, d in enumerate(played)
+            ]
+        return self._match_pages
+
+
+# --- Cases ---------------------------------------------------------------
+# Each case is (name, setup(fixtures, conn) -> state, run(state)). setup runs
+# before every repetition and is not timed.
+
+def _quiet(fn, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args)
+
+
+def offline_cases():
+    from bs4 import BeautifulSoup
+    from injury_etl.transform import (
+        extract_player_injury, extract_team_name, iter_injury_rows, should_skip_row, transform_match_data,
+        transform_match_details, transform_match_frame, transform_player_frame, transform_player_stats,
+    )
+
+    def soup_rows(page):
+        table = BeautifulSoup(page, "lxml").find("table", class_="injury-table injury-table-full")
+        current_team, rows = None, 0
+        for row in table.find_all("tr"):
+            class_list = row.get("class", [])
+            if "heading" in class_list:
+                current_team = extract_team_name(row)
+            elif not should_skip_row(class_list) and current_team and "player-row" in class_list:
+                rows += extract_player_injury(row) is not None
+        return rows
+
+    return [
+        ("extract.decode_dates", lambda f, c: f.understat_page,
+         lambda page: parse_understat_page(page, ("datesData",))),
+        ("extract.decode_all", lambda f, c: f.understat_page,
+         lambda page: parse_understat_page(page)),
+        ("transform.match_data", lambda f, c: (f.dates, f.team_name_to_id),
+         lambda s: _quiet(transform_match_data, *s)),
+        ("transform.match_frame", lambda f, c: (f.dates, f.team_name_to_id),
+         lambda s: transform_match_frame(*s)),
+        ("transform.player_stats", lambda f, c: (f.players, f.team_name_to_id),
+         lambda s: _quiet(transform_player_stats, *s)),
+        ("transform.player_frame", lambda f, c: (f.players, f.team_name_to_id),
+         lambda s: transform_player_frame(*s)),
+        ("transform.match_details", lambda f, c: f.match_pages,
+         lambda pages: [_quiet(transform_match_details, match, parse_understat_page(page, UNDERSTAT_MATCH_VARIABLES))
+                        for match, page in pages]),
+        ("transform.injury_parse_soup", lambda f, c: f.injury_page, soup_rows),
+        ("transform.injury_parse_stream", lambda f, c: f.injury_page,
+         lambda page: sum(1 for _ in iter_injury_rows(page))),
+    ]
+
+
+def database_cases():
+    from bs4 import BeautifulSoup
+    from injury_etl import load
+    from injury_etl.transform import (
+        frame_to_records, transform_injury_data, transform_injury_stream,
+        transform_match_details, transform_match_frame, transform_player_frame,
+    )
+
+    def truncate(conn):
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE prem_injury.injuries, prem_injury.player_stats, prem_injury.player_details, "
+                        "prem_injury.shots, prem_injury.match_appearances, prem_injury.matches CASCADE")
+        conn.commit()
+
+    def transformed(f, conn):
+        truncate(conn)
+        matches = frame_to_records(transform_match_frame(f.dates, f.team_name_to_id)[0])
+        players_frame, stats_frame, _ = transform_player_frame(f.players, f.team_name_to_id)
+        return conn, matches, frame_to_records(players_frame), frame_to_records(stats_frame)
+
+    def with_players(f, conn):
+        # player_details seeded from the injury fixture so the injury
+        # transform resolves every row
+        truncate(conn)
+        with conn.cursor() as cur:
+            _quiet(load.bulk_insert_player_details, cur, [
+                {"understat_id": i, "name": row[1], "position": "M",
+                 "team_id": f.team_name_to_id[row[0]]}
+                for i, row in enumerate(f.injury_rows)
+            ])
+        conn.commit()
+        return conn, f
+
+    def injuries(f, conn):
+        conn, f = with_players(f, conn)
+        rows = _quiet(lambda: list(transform_injury_stream(f.injury_page, conn, f.team_name_to_id)))
+        return conn, rows
+
+    def match_details(f, conn):
+        conn, matches, _, _ = transformed(f, conn)
+        with conn.cursor() as cur:
+            _quiet(load.bulk_insert_matches, cur, matches)
+        conn.commit()
+        appearances, shots = [], []
+        for i, (match, page) in enumerate(f.match_pages):
+            rows, match_shots = _quiet(transform_match_details, match,
+                                       parse_understat_page(page, UNDERSTAT_MATCH_VARIABLES))
+            appearances.extend(rows)
+            # Reused pages repeat shot ids; keep them unique per match
+            shots.extend({**shot, "shot_id": shot["shot_id"] + i // 380 * 10 ** 8} for shot in match_shots)
+        return conn, appearances, shots
+
+    def run_details(state):
+        conn, appearances, shots = state
+        with conn.cursor() as cur:
+            _quiet(load.bulk_insert_match_appearances, cur, appearances)
+            _quiet(load.bulk_insert_shots, cur, shots)
+        conn.commit()
+
+    def run_load(fn, table):
+        def run(state):
+            conn, matches, players, stats = state
+            with conn.cursor() as cur:
+                if table != "matches":
+                    _quiet(load.bulk_insert_player_details, cur, players)
+                    if table == "player_details":
+                        _quiet(fn, cur, players)
+                        return conn.commit()
+                    _quiet(fn, cur, stats)
+                else:
+                    _quiet(fn, cur, matches)
+            conn.commit()
+        return run
+
+    return [
+        ("transform.injury_data", with_players,
+         lambda s: _quiet(transform_injury_data, BeautifulSoup(s[1].injury_page, "lxml"), s[0], s[1].team_name_to_id)),
+        ("load.insert_matches", transformed, run_load(load.insert_matches, "matches")),
+        ("load.bulk_insert_matches", transformed, run_load(load.bulk_insert_matches, "matches")),
+        ("load.insert_player_details", transformed, run_load(load.insert_player_details, "player_details")),
+        ("load.bulk_insert_player_details", transformed, run_load(load.bulk_insert_player_details, "player_details")),
+        ("load.insert_player_stats", transformed, run_load(load.insert_player_stats, "player_stats")),
+        ("load.bulk_insert_player_stats", transformed, run_load(load.bulk_insert_player_stats, "player_stats")),
+        ("load.bulk_insert_match_details", match_details, run_details),
+        ("load.load_injuries_data", injuries, lambda s: _quiet(load.load_injuries_data, *s)),
+        ("load.bulk_load_injuries_data", injuries, lambda s: _quiet(load.bulk_load_injuries_data, *s)),
+    ]
+
+
+def connect_benchmark_db(dsn):
+    import psycopg2 as pg
+    from injury_etl.load import create_injury_schema, load_teams
+    from injury_etl.reference import create_reference_schema
+
+    conn = pg.connect(dsn)
+    with conn.cursor() as cur:
+        cur.execute("DROP SCHEMA IF EXISTS prem_injury CASCADE")
+    create_injury_schema(conn)
+    create_reference_schema(conn)
+    with conn.cursor() as cur:
+        load_teams(cur)
+    conn.commit()
+    return conn
+
+
+# --- Runner --------------------------------------------------------------
+
+def run_cases(cases, scales, repeat, conn=None, only=None):
+    results = {}
+    for scale in scales:
+        fixtures = Fixtures(scale)
+        for name, setup, fn in cases:
+            if only and not any(pattern in name for pattern in only):
+                continue
+            timings = []
+            for _ in range(repeat):
+                state = setup(fixtures, conn)
+                t0 = time.perf_counter()
+                fn(state)
+                timings.append(time.perf_counter() - t0)
+            key = f"{name}@x{scale}"
+            results[key] = {"min": min(timings), "median": statistics.median(timings)}
+            print(f"{key:<42}{results[key]['min']:>10.4f}s{results[key]['median']:>10.4f}s")
+    return results
+
+
+# slowdowns smaller than this are timer noise on the sub-millisecond cases
+NOISE_FLOOR = 0.002
+
+
+def compare(results, baseline, threshold):
+    """:return: list of (case, baseline seconds, current seconds) over threshold"""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if (previous and current["min"] > previous["min"] * (1 + threshold)
+                and current["min"] - previous["min"] > NOISE_FLOOR):
+            regressions.append((key, previous["min"], current["min"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", help="run cases whose name contains any of these")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown over the baseline minimum (0.2 = 20%%)")
+    parser.add_argument("--dsn", default=os.environ.get("INJURY_BENCH_DSN"),
+                        help="throwaway Postgres for the load cases; they are skipped without it")
+    parser.add_argument("--record", action="store_true", help="record live pages into benchmarks/fixtures/")
+    parser.add_argument("--pin-synthetic", action="store_true",
+                        help="save the generators' pages into benchmarks/fixtures/ instead")
+    args = parser.parse_args()
+
+    if args.record:
+        return record_fixtures()
+    if args.pin_synthetic:
+        return pin_synthetic_fixtures()
+
+    print(f"{'case':<42}{'min':>11}{'median':>11}")
+    results = run_cases(offline_cases(), args.scales, args.repeat, only=args.only)
+    if args.dsn:
+        conn = connect_benchmark_db(args.dsn)
+        try:
+            results.update(run_cases(database_cases(), args.scales, args.repeat, conn, only=args.only))
+        finally:
+            conn.close()
+    else:
+        print("INJURY_BENCH_DSN not set; skipping database cases.")
+
+    fixtures = fixture_digests()
+    if args.save_baseline:
+        baseline = {
+            "fixtures": fixtures,
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+            "results": results,
+        }
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --save-baseline first.")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("fixtures") != fixtures:
+        print(f"{args.baseline} was timed on other fixture pages ({baseline.get('fixtures')}, now {fixtures}); "
+              "re-save it with --save-baseline.")
+        sys.exit(1)
+    print(f"Comparing against {args.baseline} (Python {baseline['python']}, {baseline['machine']}).")
+    regressions = compare(results, baseline["results"], args.threshold)
+    for key, before, after in regressions:
+        print(f"REGRESSION {key}: {before:.4f}s -> {after:.4f}s (+{(after / before - 1) * 100:.0f}%)")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
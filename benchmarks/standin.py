@@ -0,0 +1,257 @@
+"""
+Local stand-in for ScraperAPI and Understat.
+
+Serves recorded pages from benchmarks/fixtures/ when they exist and synthetic
+ones otherwise, and can inject latency, 5xx errors, 429 throttling and
+oversized payloads at seeded, reproducible rates.
+
+    python benchmarks/standin.py --port 8800 --latency 0.05 --error-rate 0.1 --throttle-rate 0.1
+    eval "$(python benchmarks/standin.py --port 8800 --print-env)"
+
+Routes mirror the live sites: /scraperapi/?url=... returns the injury table,
+/league/<league>/<season> and /match/<id> return Understat pages, and
+/_stats returns request and connection counts and the peak number of
+requests in flight.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.fixtures import (
+    injury_table_page, recorded_page, scale_injury_page, scale_understat_page, understat_league_page,
+    understat_match_page,
+)
+
+
+class StandInServer:
+    """
+    Threaded HTTP server with fault injection; use as a context manager or
+    call start()/stop(). Fault decisions come from one seeded generator, so
+    the same request sequence sees the same faults.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, scale=1, latency=0.0, jitter=0.0, error_rate=0.0,
+                 throttle_rate=0.0, retry_after=0, oversize_rate=0.0, oversize_bytes=256 * 1024 * 1024, seed=0,
+                 render_latency=0.0):
+        self.scale = scale
+        self.latency, self.jitter = latency, jitter
+        # Extra delay on the ScraperAPI route, which renders the page first
+        self.render_latency = render_latency
+        self.error_rate, self.throttle_rate, self.retry_after = error_rate, throttle_rate, retry_after
+        self.oversize_rate, self.oversize_bytes = oversize_rate, oversize_bytes
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pages = {}
+        self._in_flight = 0
+        self.stats = {"requests": 0, "connections": 0, "statuses": {}, "max_in_flight": 0, "bytes_sent": 0}
+
+        self._httpd = ThreadingHTTPServer((host, port), _handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict:
+        """Environment variables that point injury_etl.extract at this server."""
+        return {
+            "INJURY_SCRAPERAPI_URL": f"{self.url}/scraperapi/",
+            "INJURY_UNDERSTAT_URL": self.url,
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread:
+            self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"requests": 0, "connections": 0, "statuses": {}, "max_in_flight": 0, "bytes_sent": 0}
+
+    def recorded(self, name, scale_page):
+        page = recorded_page(name)
+        return scale_page(page, self.scale) if page else None
+
+    def page(self, path):
+        """:return: page bytes for a route, or None for an unknown one"""
+        parts = [p for p in path.split("/") if p]
+        if parts[:1] == ["scraperapi"]:
+            key = ("injuries",)
+            build = lambda: self.recorded("injury_table", scale_injury_page) or injury_table_page(self.scale)
+        elif len(parts) == 3 and parts[0] == "league":
+            key = tuple(parts)
+            seed = int(parts[2]) if parts[2].isdigit() else 0
+            build = lambda: (self.recorded("understat_league", scale_understat_page)
+                             or understat_league_page(self.scale, seed))
+        elif len(parts) == 2 and parts[0] == "match" and parts[1].isdigit():
+            # Generated per request; there are too many to keep
+            return understat_match_page(int(parts[1]))
+        else:
+            return None
+
+        with self._lock:
+            if key not in self._pages:
+                self._pages[key] = build()
+            return self._pages[key]
+
+    def delay(self, path=""):
+        with self._lock:
+            extra = self.render_latency if path.startswith("/scraperapi") else 0.0
+            return self.latency + extra + self._rng.uniform(0, self.jitter)
+
+    def fault(self):
+        """:return: "error", "throttle", "oversize" or None for this request"""
+        with self._lock:
+            roll = self._rng.random()
+        for name, rate in (("error", self.error_rate), ("throttle", self.throttle_rate),
+                           ("oversize", self.oversize_rate)):
+            if roll < rate:
+                return name
+            roll -= rate
+        return None
+
+    def _connected(self):
+        with self._lock:
+            self.stats["connections"] += 1
+
+    def _enter(self):
+        with self._lock:
+            self._in_flight += 1
+            self.stats["requests"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+
+    def _leave(self, status, sent):
+        with self._lock:
+            self._in_flight -= 1
+            self.stats["statuses"][str(status)] = self.stats["statuses"].get(str(status), 0) + 1
+            self.stats["bytes_sent"] += sent
+
+
+def _handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        # Keeps connections open between requests, as the real sites do
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            server._connected()
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            split = urlsplit(self.path)
+            if split.path == "/_stats":
+                return self._send(200, json.dumps(server.stats).encode(), "application/json")
+
+            server._enter()
+            status, sent = 500, 0
+            try:
+                time.sleep(server.delay(split.path))
+
+                fault = server.fault()
+                if fault == "error":
+                    status, sent = self._send(503, b"stand-in error")
+                elif fault == "throttle":
+                    status, sent = self._send(429, b"slow down", headers={"Retry-After": str(server.retry_after)})
+                else:
+                    body = server.page(split.path)
+                    if body is None:
+                        status, sent = self._send(404, b"not found")
+                    elif fault == "oversize":
+                        status, sent = self._send_oversized(body)
+                    else:
+                        status, sent = self._send(200, body)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up, e.g. on an oversized body
+                pass
+            finally:
+                server._leave(status, sent)
+
+        def _send(self, status, body, content_type="text/html; charset=utf-8", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+            return status, len(body)
+
+        def _send_oversized(self, body):
+            # No Content-Length: the body runs until the connection closes, so
+            # the client has to notice the size while reading.
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            self.wfile.write(body)
+            sent = len(body)
+            padding = b" " * (1024 * 1024)
+            while sent < server.oversize_bytes:
+                self.wfile.write(padding)
+                sent += len(padding)
+            return 200, sent
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds")
+    parser.add_argument("--render-latency", type=float, default=0.0, help="seconds added to ScraperAPI responses")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered 429")
+    parser.add_argument("--retry-after", type=int, default=0)
+    parser.add_argument("--oversize-rate", type=float, default=0.0, help="share of responses padded past --oversize-mb")
+    parser.add_argument("--oversize-mb", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--print-env", action="store_true", help="print export lines for the server and exit")
+    args = parser.parse_args()
+
+    server = StandInServer(args.host, args.port, args.scale, args.latency, args.jitter, args.error_rate,
+                           args.throttle_rate, args.retry_after, args.oversize_rate,
+                           args.oversize_mb * 1024 * 1024, args.seed, args.render_latency)
+    if args.print_env:
+        server.stop()
+        print("\n".join(f"export {k}={v}" for k, v in server.env().items()))
+        return
+
+    print(f"Serving on {server.url}")
+    server.start()
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+from airflow.sdk import DAG, Param
+from airflow.decorators import task, task_group
+from datetime import datetime, timedelta
+import os
+
+from injury_etl import backfill_tasks as tasks
+
+# The task callables live in injury_etl.backfill_tasks; see injury_etl_dag.py.
+
+# Seasons loaded at once; the mapped instances share the database and, per
+# process, the Understat rate limit.
+PARALLELISM = int(os.environ.get("INJURY_BACKFILL_PARALLELISM", "4"))
+
+default_args = {
+    "retries": 2,
+    "retry_delay": timedelta(minutes=1),
+}
+
+with DAG(
+    dag_id="injury_backfill_dag",
+    description="Backfill Understat matches and player stats over many leagues and seasons",
+    schedule=None,
+    start_date=datetime(2024, 1, 1),
+    catchup=False,
+    default_args=default_args,
+    params={
+        "leagues": Param(["EPL"], type="array"),
+        "seasons": Param([str(y) for y in range(2015, 2025)], type="array"),
+        # Runs sharing a checkpoint name resume each other; use a new name to
+        # rebuild from scratch.
+        "checkpoint": Param("backfill", type="string"),
+        "batch_size": Param(5000, type="integer", minimum=1),
+        "match_workers": Param(8, type="integer", minimum=1),
+    },
+    tags=["injury", "understat", "backfill"]
+) as dag:
+
+    prepare_task = task()(tasks.prepare_task)
+    targets_task = task()(tasks.targets_task)
+
+    # One mapped group per (league, season). Inside a mapped group each task
+    # depends only on its own season's upstream, so a season's match pages
+    # start downloading as soon as that season is loaded rather than after
+    # every season has been. Nothing large travels through XCom.
+    season_task = task(max_active_tis_per_dag=PARALLELISM)(tasks.season_task)
+    season_match_details_task = task(max_active_tis_per_dag=PARALLELISM)(tasks.season_match_details_task)
+
+    @task_group()
+    def season_group(target):
+        season_match_details_task(target, season_task(target))
+
+    analytics_task = task()(tasks.analytics_task)
+
+    targets = targets_task()
+    prepare_task() >> targets
+    season_group.expand(target=targets) >> analytics_task()
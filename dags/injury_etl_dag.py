@@ -1,16 +1,12 @@
 from airflow.sdk import DAG
 from airflow.decorators import task
 from datetime import datetime, timedelta
-import sys
-import os
 
-# Add the parent directory of this file to sys.path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from injury_etl import tasks
 
-from injury_etl.extract import extract_injury_data, extract_match_data, extract_understat_player_stats
-from injury_etl.transform import transform_match_data, transform_player_stats, transform_injury_data
-from injury_etl.load import insert_matches, insert_player_details, insert_player_stats, load_injuries_data, create_injury_schema, load_teams
-from injury_etl.utils import get_db_connection, get_team_name_to_id
+# The task callables live in injury_etl.tasks, which imports nothing heavy at
+# module level, so parsing this file stays cheap. injury_etl has to be
+# importable by the scheduler and workers; see "Set PYTHONPATH" in the README.
 
 default_args = {
     "retries": 1,
@@ -27,59 +23,52 @@ with DAG(
     tags=["injury", "understat", "ETL"]
 ) as dag:
 
-    @task()
-    def extract_task(**kwargs):
-        injury_html = extract_injury_data()
-        matches_json = extract_match_data()
-        players_raw = extract_understat_player_stats()
-
-        kwargs["ti"].xcom_push(key="injury_html", value=injury_html.prettify())
-        kwargs["ti"].xcom_push(key="matches_json", value=matches_json)
-        kwargs["ti"].xcom_push(key="players_raw", value=players_raw)
-
-    @task()
-    def transform_task(**kwargs):
-        from bs4 import BeautifulSoup
-
-        ti = kwargs["ti"]
-        conn = get_db_connection()
-        team_name_to_id = get_team_name_to_id(conn)
-
-        # Load XComs
-        injury_html = ti.xcom_pull(key="injury_html", task_ids="extract_task")
-        matches_json = ti.xcom_pull(key="matches_json", task_ids="extract_task")
-        players_raw = ti.xcom_pull(key="players_raw", task_ids="extract_task")
-
-        # Transform
-        match_data = transform_match_data(matches_json, team_name_to_id)
-        players, stats = transform_player_stats(players_raw, team_name_to_id, conn)
-        injuries = transform_injury_data(BeautifulSoup(injury_html, "lxml"), conn, team_name_to_id)
-
-        # Push to XComs
-        ti.xcom_push(key="matches", value=match_data)
-        ti.xcom_push(key="players", value=players)
-        ti.xcom_push(key="player_stats", value=stats)
-        ti.xcom_push(key="injuries", value=injuries)
-
-    @task()
-    def load_task(**kwargs):
-        ti = kwargs["ti"]
-        conn = get_db_connection()
-
-        matches = ti.xcom_pull(key="matches", task_ids="transform_task")
-        players = ti.xcom_pull(key="players", task_ids="transform_task")
-        player_stats = ti.xcom_pull(key="player_stats", task_ids="transform_task")
-        injuries = ti.xcom_pull(key="injuries", task_ids="transform_task")
-
-        with conn.cursor() as cur:
-            create_injury_schema(conn)
-            load_teams(cur)
-            insert_matches(cur, matches)
-            insert_player_details(cur, players)
-            insert_player_stats(cur, player_stats)
-            conn.commit()
-
-        load_injuries_data(conn, injuries)
+    # Both sources are fetched at once in a single extract task, so its wall
+    # time is that of the slower one. From there each source runs as its own
+    # transform -> load branch, and the branches only meet where the data
+    # does: the injury transform resolves players against player_details, so
+    # it waits on the player load alone.
+    extract_sources_task = task()(tasks.extract_sources_task)
+
+    # A source byte-identical to what the last successful load consumed skips
+    # its own branch only; tasks further down still follow their trigger rules.
+    injuries_changed_task = task.short_circuit(ignore_downstream_trigger_rules=False)(tasks.injuries_changed_task)
+    understat_changed_task = task.short_circuit(ignore_downstream_trigger_rules=False)(tasks.understat_changed_task)
+
+    transform_matches_task = task()(tasks.transform_matches_task)
+    transform_players_task = task()(tasks.transform_players_task)
+    load_matches_task = task()(tasks.load_matches_task)
+    load_players_task = task()(tasks.load_players_task)
+    understat_loaded_task = task()(tasks.understat_loaded_task)
+
+    # Runs after the player load, or straight away when the Understat branch
+    # was skipped because nothing changed.
+    transform_injuries_task = task(trigger_rule="none_failed")(tasks.transform_injuries_task)
+    load_injuries_task = task()(tasks.load_injuries_task)
+    match_details_task = task()(tasks.match_details_task)
+
+    # Refreshes when either branch loaded something
+    analytics_task = task(trigger_rule="none_failed_min_one_success")(tasks.analytics_task)
+    cleanup_task = task(trigger_rule="all_done")(tasks.cleanup_task)
 
     # Set dependencies
-    extract_task() >> transform_task() >> load_task()
+    extract = extract_sources_task()
+    understat_changed = extract >> understat_changed_task()
+    transform_matches = understat_changed >> transform_matches_task()
+    load_matches = transform_matches >> load_matches_task()
+    transform_players = understat_changed >> transform_players_task()
+    load_players = transform_players >> load_players_task()
+    [load_matches, load_players] >> understat_loaded_task()
+
+    transform_injuries = extract >> injuries_changed_task() >> transform_injuries_task()
+    load_players >> transform_injuries
+    load_injuries = transform_injuries >> load_injuries_task()
+
+    match_details = load_matches >> match_details_task()
+    analytics = [load_matches, match_details, load_injuries] >> analytics_task()
+
+    # The run's artifacts are deleted only once every task that reads them has
+    # finished. Analytics alone is not enough: it goes upstream_failed as soon
+    # as one branch fails, while the other branch may still be reading.
+    [transform_matches, load_matches, transform_players, load_players,
+     transform_injuries, load_injuries, analytics] >> cleanup_task()
@@ -0,0 +1,324 @@
+"""
+Summary tables for injury-vs-performance queries, refreshed after each load.
+
+team_match_summary   one row per team per match with xG for/against, a
+                     rolling five-match xG differential, and the injuries in
+                     effect on the match date (from injury_history) with
+                     their share of the team's season xG and xA; refreshed
+                     incrementally from a date watermark.
+team_key_player_impact  view: per team, xG differential and points with and
+                     without any of its key players injured.
+team_injury_summary  per team: currently injured players (open spells in
+                     injury_history) and the share of the squad's season
+                     xG/xA they account for.
+player_injury_summary  per currently injured player: season output, days
+                     until the expected return, and days missed over every
+                     recorded spell.
+"""
+
+# Days before the newest summarised match that are recomputed on each
+# refresh, to pick up late corrections to recent results.
+REFRESH_LOOKBACK_DAYS = 14
+# Extra history read so the rolling window is complete at the refresh
+# boundary, even across the summer break.
+ROLLING_HISTORY_DAYS = 200
+ROLLING_MATCHES = 5
+# A team's key players are its top scorers by season xG
+KEY_PLAYERS = 3
+
+
+def create_analytics_schema(conn):
+    with conn.cursor() as cur:
+        # Supporting indexes for the joins below and for dashboard filters
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS matches_home_date_idx ON prem_injury.matches (home_team_id, date);
+            CREATE INDEX IF NOT EXISTS matches_away_date_idx ON prem_injury.matches (away_team_id, date);
+            CREATE INDEX IF NOT EXISTS injuries_team_idx ON prem_injury.injuries (team_id);
+            CREATE INDEX IF NOT EXISTS player_stats_team_idx ON prem_injury.player_stats (team_id);
+            CREATE INDEX IF NOT EXISTS player_stats_season_idx ON prem_injury.player_stats (league, season);
+        """)
+
+        # Each league's latest season of player stats, which the injury
+        # summaries measure current squads against
+        cur.execute("""
+            CREATE OR REPLACE VIEW prem_injury.current_player_stats AS
+            SELECT ps.*
+            FROM prem_injury.player_stats ps
+            WHERE ps.season = (SELECT MAX(l.season) FROM prem_injury.player_stats l WHERE l.league = ps.league);
+        """)
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS prem_injury.team_match_summary (
+                match_id            INTEGER NOT NULL REFERENCES prem_injury.matches(id) ON DELETE CASCADE,
+                team_id             INTEGER NOT NULL REFERENCES prem_injury.teams(id),
+                opponent_id         INTEGER NOT NULL REFERENCES prem_injury.teams(id),
+                date                DATE NOT NULL,
+                is_home             BOOLEAN NOT NULL,
+                points              SMALLINT NOT NULL,
+                xg_for              REAL,
+                xg_against          REAL,
+                xg_diff             REAL,
+                rolling_xg_diff     REAL,
+                PRIMARY KEY (match_id, team_id)
+            );
+            CREATE INDEX IF NOT EXISTS team_match_summary_team_date_idx
+                ON prem_injury.team_match_summary (team_id, date);
+
+            ALTER TABLE prem_injury.team_match_summary
+                ADD COLUMN IF NOT EXISTS injured_players INTEGER,
+                ADD COLUMN IF NOT EXISTS injured_xg_share REAL,
+                ADD COLUMN IF NOT EXISTS key_players_out INTEGER;
+        """)
+        cur.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = 'prem_injury' AND table_name = 'team_match_summary'
+              AND column_name = 'injured_xa_share'
+        """)
+        if not cur.fetchone():
+            # Summaries are derived, so they are emptied and the next refresh
+            # rebuilds every match with the new column filled in
+            cur.execute("""
+                ALTER TABLE prem_injury.team_match_summary ADD COLUMN injured_xa_share REAL;
+                TRUNCATE prem_injury.team_match_summary;
+            """)
+
+        cur.execute("""
+            CREATE OR REPLACE VIEW prem_injury.team_key_player_impact AS
+            SELECT team_id,
+                   key_players_out > 0 AS key_players_missing,
+                   COUNT(*) AS matches,
+                   AVG(xg_diff) AS avg_xg_diff,
+                   AVG(points) AS avg_points
+            FROM prem_injury.team_match_summary
+            WHERE key_players_out IS NOT NULL
+            GROUP BY team_id, key_players_out > 0;
+        """)
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS prem_injury.team_injury_summary (
+                team_id             INTEGER PRIMARY KEY REFERENCES prem_injury.teams(id),
+                injured_players     INTEGER NOT NULL,
+                injured_xg          REAL NOT NULL,
+                injured_xa          REAL NOT NULL,
+                team_xg             REAL NOT NULL,
+                team_xa             REAL NOT NULL,
+                injured_xg_share    REAL,
+                injured_xa_share    REAL,
+                refreshed_at        TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        """)
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS prem_injury.player_injury_summary (
+                player_id           INTEGER PRIMARY KEY REFERENCES prem_injury.player_details(id) ON DELETE CASCADE,
+                team_id             INTEGER NOT NULL REFERENCES prem_injury.teams(id),
+                name                TEXT NOT NULL,
+                reason              TEXT,
+                status              TEXT,
+                potential_return    DATE,
+                days_to_return      INTEGER,
+                minutes             INTEGER,
+                xg                  REAL,
+                xa                  REAL,
+                refreshed_at        TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            CREATE INDEX IF NOT EXISTS player_injury_summary_team_idx
+                ON prem_injury.player_injury_summary (team_id);
+
+            ALTER TABLE prem_injury.player_injury_summary
+                ADD COLUMN IF NOT EXISTS days_missed INTEGER;
+        """)
+
+
+def refresh_team_match_summary(cur, full=False):
+    """
+    Upserts team_match_summary for matches on or after the refresh cutoff:
+    the newest summarised match minus REFRESH_LOOKBACK_DAYS, or the oldest
+    match not summarised yet if that is earlier (e.g. after a backfill), or
+    everything when full=True. Unchanged rows are left untouched.
+
+    :return: number of rows inserted or updated
+    """
+    cur.execute("""
+        SELECT CASE WHEN %(full)s THEN DATE '1900-01-01'
+                    ELSE COALESCE(
+                        LEAST(
+                            (SELECT MAX(date) - %(lookback)s FROM prem_injury.team_match_summary),
+                            (SELECT MIN(m.date) FROM prem_injury.matches m
+                             WHERE NOT EXISTS (SELECT 1 FROM prem_injury.team_match_summary s
+                                               WHERE s.match_id = m.id))
+                        ),
+                        CURRENT_DATE
+                    ) END
+    """, {"full": full, "lookback": REFRESH_LOOKBACK_DAYS})
+    cutoff = cur.fetchone()[0]
+
+    cur.execute("""
+        WITH team_matches AS (
+            SELECT id AS match_id, home_team_id AS team_id, away_team_id AS opponent_id, date,
+                   TRUE AS is_home, xg_home AS xg_for, xg_away AS xg_against,
+                   CASE result WHEN 'H' THEN 3 WHEN 'D' THEN 1 ELSE 0 END AS points
+            FROM prem_injury.matches
+            WHERE date >= %(cutoff)s::date - %(history)s
+            UNION ALL
+            SELECT id, away_team_id, home_team_id, date,
+                   FALSE, xg_away, xg_home,
+                   CASE result WHEN 'A' THEN 3 WHEN 'D' THEN 1 ELSE 0 END
+            FROM prem_injury.matches
+            WHERE date >= %(cutoff)s::date - %(history)s
+        ),
+        season_xg AS (
+            SELECT pd.id AS player_id, ps.team_id, ps.season, ps.xG,
+                   ps.xG / NULLIF(SUM(ps.xG) OVER (PARTITION BY ps.league, ps.season, ps.team_id), 0) AS xg_share,
+                   ps.xA / NULLIF(SUM(ps.xA) OVER (PARTITION BY ps.league, ps.season, ps.team_id), 0) AS xa_share,
+                   RANK() OVER (PARTITION BY ps.league, ps.season, ps.team_id ORDER BY ps.xG DESC) AS xg_rank
+            FROM prem_injury.player_stats ps
+            JOIN prem_injury.player_details pd ON pd.understat_id = ps.understat_id
+        ),
+        windowed AS (
+            SELECT *,
+                   xg_for - xg_against AS xg_diff,
+                   AVG(xg_for - xg_against) OVER (
+                       PARTITION BY team_id ORDER BY date, match_id
+                       ROWS BETWEEN %(preceding)s PRECEDING AND CURRENT ROW
+                   ) AS rolling_xg_diff
+            FROM team_matches
+        ),
+        -- One set-based range join of matches to the spells open on their
+        -- date, rather than an as-of lookup per match. Open spells compare
+        -- as ending at infinity, so the predicate has no OR and the scan can
+        -- drop every spell that closed before the cutoff.
+        injured AS (
+            SELECT w.match_id, w.team_id,
+                   COUNT(*)::int AS injured_players,
+                   COALESCE(SUM(sx.xg_share), 0) AS injured_xg_share,
+                   COALESCE(SUM(sx.xa_share), 0) AS injured_xa_share,
+                   COUNT(*) FILTER (WHERE sx.xg_rank <= %(key_players)s)::int AS key_players_out
+            FROM windowed w
+            JOIN prem_injury.injury_history h
+              ON h.team_id = w.team_id
+             AND h.valid_from <= w.date
+             AND COALESCE(h.valid_to, 'infinity') > w.date
+            LEFT JOIN season_xg sx ON sx.player_id = h.player_id AND sx.team_id = h.team_id
+                                  -- Understat season "2024" runs from August 2024 to the next summer
+                                  AND sx.season = EXTRACT(YEAR FROM w.date - INTERVAL '7 months')::int::text
+            WHERE w.date >= %(cutoff)s
+              AND COALESCE(h.valid_to, 'infinity') > %(cutoff)s
+            GROUP BY w.match_id, w.team_id
+        )
+        INSERT INTO prem_injury.team_match_summary AS s
+            (match_id, team_id, opponent_id, date, is_home, points, xg_for, xg_against, xg_diff, rolling_xg_diff,
+             injured_players, injured_xg_share, injured_xa_share, key_players_out)
+        SELECT w.match_id, w.team_id, w.opponent_id, w.date, w.is_home, w.points,
+               w.xg_for, w.xg_against, w.xg_diff, w.rolling_xg_diff,
+               COALESCE(inj.injured_players, 0), COALESCE(inj.injured_xg_share, 0),
+               COALESCE(inj.injured_xa_share, 0), COALESCE(inj.key_players_out, 0)
+        FROM windowed w
+        LEFT JOIN injured inj ON inj.match_id = w.match_id AND inj.team_id = w.team_id
+        WHERE w.date >= %(cutoff)s
+        ON CONFLICT (match_id, team_id) DO UPDATE
+        SET opponent_id = EXCLUDED.opponent_id,
+            date = EXCLUDED.date,
+            is_home = EXCLUDED.is_home,
+            points = EXCLUDED.points,
+            xg_for = EXCLUDED.xg_for,
+            xg_against = EXCLUDED.xg_against,
+            xg_diff = EXCLUDED.xg_diff,
+            rolling_xg_diff = EXCLUDED.rolling_xg_diff,
+            injured_players = EXCLUDED.injured_players,
+            injured_xg_share = EXCLUDED.injured_xg_share,
+            injured_xa_share = EXCLUDED.injured_xa_share,
+            key_players_out = EXCLUDED.key_players_out
+        WHERE (s.opponent_id, s.date, s.is_home, s.points, s.xg_for, s.xg_against, s.rolling_xg_diff,
+               s.injured_players, s.injured_xg_share, s.injured_xa_share, s.key_players_out)
+              IS DISTINCT FROM
+              (EXCLUDED.opponent_id, EXCLUDED.date, EXCLUDED.is_home, EXCLUDED.points,
+               EXCLUDED.xg_for, EXCLUDED.xg_against, EXCLUDED.rolling_xg_diff,
+               EXCLUDED.injured_players, EXCLUDED.injured_xg_share, EXCLUDED.injured_xa_share,
+               EXCLUDED.key_players_out);
+    """, {"cutoff": cutoff, "history": ROLLING_HISTORY_DAYS, "preceding": ROLLING_MATCHES - 1,
+          "key_players": KEY_PLAYERS})
+    return cur.rowcount
+
+
+def refresh_team_injury_summary(cur):
+    # At most one row per team, so it is rebuilt outright
+    cur.execute("DELETE FROM prem_injury.team_injury_summary")
+    cur.execute("""
+        WITH squad AS (
+            SELECT team_id, SUM(xG) AS team_xg, SUM(xA) AS team_xa
+            FROM prem_injury.current_player_stats
+            GROUP BY team_id
+        ),
+        injured AS (
+            SELECT i.team_id,
+                   COUNT(*) AS injured_players,
+                   COALESCE(SUM(ps.xG), 0) AS injured_xg,
+                   COALESCE(SUM(ps.xA), 0) AS injured_xa
+            FROM prem_injury.injury_history i
+            JOIN prem_injury.player_details pd ON pd.id = i.player_id
+            LEFT JOIN prem_injury.current_player_stats ps
+                   ON ps.understat_id = pd.understat_id AND ps.team_id = i.team_id
+            WHERE i.valid_to IS NULL
+            GROUP BY i.team_id
+        )
+        INSERT INTO prem_injury.team_injury_summary
+            (team_id, injured_players, injured_xg, injured_xa, team_xg, team_xa, injured_xg_share, injured_xa_share)
+        SELECT s.team_id,
+               COALESCE(i.injured_players, 0),
+               COALESCE(i.injured_xg, 0),
+               COALESCE(i.injured_xa, 0),
+               s.team_xg,
+               s.team_xa,
+               COALESCE(i.injured_xg, 0) / NULLIF(s.team_xg, 0),
+               COALESCE(i.injured_xa, 0) / NULLIF(s.team_xa, 0)
+        FROM squad s
+        LEFT JOIN injured i ON i.team_id = s.team_id;
+    """)
+    return cur.rowcount
+
+
+def refresh_player_injury_summary(cur):
+    cur.execute("DELETE FROM prem_injury.player_injury_summary")
+    # Open spells are the injuries in effect today; the injuries table keeps
+    # players after they recover. Days missed add up every spell, open or closed.
+    cur.execute("""
+        WITH missed AS (
+            SELECT player_id, SUM(COALESCE(valid_to, CURRENT_DATE) - valid_from) AS days_missed
+            FROM prem_injury.injury_history
+            GROUP BY player_id
+        ),
+        open_spells AS (
+            SELECT DISTINCT ON (player_id) *
+            FROM prem_injury.injury_history
+            WHERE valid_to IS NULL
+            ORDER BY player_id, valid_from DESC
+        )
+        INSERT INTO prem_injury.player_injury_summary
+            (player_id, team_id, name, reason, status, potential_return, days_to_return, days_missed,
+             minutes, xg, xa)
+        SELECT i.player_id, i.team_id, pd.name, i.reason, i.status, i.potential_return,
+               i.potential_return - CURRENT_DATE, m.days_missed,
+               ps.minutes, ps.xG, ps.xA
+        FROM open_spells i
+        JOIN missed m ON m.player_id = i.player_id
+        JOIN prem_injury.player_details pd ON pd.id = i.player_id
+        LEFT JOIN prem_injury.current_player_stats ps
+               ON ps.understat_id = pd.understat_id AND ps.team_id = i.team_id;
+    """)
+    return cur.rowcount
+
+
+def refresh_analytics(conn, full=False) -> dict:
+    """Refreshes every summary table in one transaction and returns row counts."""
+    with conn.cursor() as cur:
+        counts = {
+            "team_match_summary": refresh_team_match_summary(cur, full=full),
+            "team_injury_summary": refresh_team_injury_summary(cur),
+            "player_injury_summary": refresh_player_injury_summary(cur),
+        }
+    conn.commit()
+
+    for table, count in counts.items():
+        print(f"Refreshed {count} rows in {table}.")
+    return counts
@@ -0,0 +1,113 @@
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import shutil
+from urllib.parse import urlsplit
+
+from injury_etl.records import RECORD_TYPES, is_record
+
+DEFAULT_ARTIFACT_DIR = os.path.expanduser("~/.local/share/injury_etl/artifacts")
+
+
+class ArtifactStore:
+    """
+    Filesystem-backed store for the data handed between DAG tasks.
+
+    Row lists are written as gzip-compressed JSON lines and raw pages as
+    gzip-compressed bytes. Callers pass around the small reference dicts
+    returned by the put_* methods (uri, format, rows, bytes, sha256), which is
+    all that should go through XCom. The file:// URIs keep the door open for
+    an object-store backend with the same interface.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or os.environ.get("INJURY_ETL_ARTIFACT_DIR", DEFAULT_ARTIFACT_DIR)
+
+    def _path(self, run_id, name, suffix):
+        safe_run = "".join(c if c.isalnum() or c in "-_." else "_" for c in str(run_id))
+        path = os.path.join(self.root, safe_run, name + suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    @staticmethod
+    def _local_path(ref):
+        uri = urlsplit(ref["uri"])
+        if uri.scheme != "file":
+            raise ValueError(f"Unsupported artifact URI: {ref['uri']}")
+        return uri.path
+
+    def _finish(self, path, fmt, rows):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return {
+            "uri": "file://" + os.path.abspath(path),
+            "format": fmt,
+            "rows": rows,
+            "bytes": os.path.getsize(path),
+            "sha256": digest.hexdigest(),
+        }
+
+    def put_rows(self, run_id, name, rows) -> dict:
+        """
+        Rows that are records (injury_etl.records) are written as JSON arrays
+        after a header line naming the record type, so field names are stored
+        once per file rather than once per row; other rows as JSON objects.
+        """
+        path = self._path(run_id, name, ".jsonl.gz")
+        rows = iter(rows)
+        first = next(rows, None)
+        fmt = "records.jsonl.gz" if is_record(first) else "jsonl.gz"
+        count = 0
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8", compresslevel=6) as f:
+            if fmt == "records.jsonl.gz":
+                f.write(json.dumps({"record": type(first).__name__, "fields": first._fields}))
+                f.write("\n")
+            if first is not None:
+                for row in itertools.chain((first,), rows):
+                    f.write(json.dumps(row, default=str, ensure_ascii=False, separators=(",", ":")))
+                    f.write("\n")
+                    count += 1
+        os.replace(path + ".tmp", path)
+        return self._finish(path, fmt, count)
+
+    def iter_rows(self, ref):
+        with gzip.open(self._local_path(ref), "rt", encoding="utf-8") as f:
+            if ref["format"] == "records.jsonl.gz":
+                make = RECORD_TYPES[json.loads(f.readline())["record"]]._make
+                for line in f:
+                    yield make(json.loads(line))
+                return
+            for line in f:
+                yield json.loads(line)
+
+    def get_rows(self, ref) -> list:
+        return list(self.iter_rows(ref))
+
+    def put_bytes(self, run_id, name, content) -> dict:
+        path = self._path(run_id, name, ".gz")
+        with gzip.open(path + ".tmp", "wb", compresslevel=6) as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
+        return self._finish(path, "bytes.gz", None)
+
+    def get_bytes(self, ref) -> bytes:
+        with gzip.open(self._local_path(ref), "rb") as f:
+            return f.read()
+
+    def delete_run(self, run_id):
+        safe_run = "".join(c if c.isalnum() or c in "-_." else "_" for c in str(run_id))
+        shutil.rmtree(os.path.join(self.root, safe_run), ignore_errors=True)
+
+
+_store = None
+
+
+def get_artifact_store() -> ArtifactStore:
+    global _store
+    if _store is None:
+        _store = ArtifactStore()
+    return _store
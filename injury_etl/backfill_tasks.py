@@ -0,0 +1,94 @@
+"""
+Task callables of dags/injury_backfill_dag.py. See injury_etl.tasks for why
+everything is imported inside the functions.
+"""
+
+
+def prepare_task():
+    from injury_etl.load import ensure_injury_schema, load_teams
+    from injury_etl.utils import db_connection
+
+    with db_connection() as conn:
+        ensure_injury_schema(conn)
+        with conn.cursor() as cur:
+            load_teams(cur)
+        conn.commit()
+
+
+def targets_task(**kwargs):
+    from injury_etl.extract import backfill_targets
+
+    params = kwargs["params"]
+    return [list(t) for t in backfill_targets(params["leagues"], params["seasons"])]
+
+
+# Each table is loaded in checkpointed batches, so a retry or a rerun under
+# the same checkpoint name redoes only the batches that never committed,
+# and a finished season is skipped before anything is fetched.
+def season_task(target, **kwargs):
+    from injury_etl.checkpoints import load_in_batches, season_done
+    from injury_etl.extract import UNDERSTAT_FIELDS, extract_understat_league
+    from injury_etl.load import bulk_insert_matches, bulk_insert_player_details, bulk_insert_player_stats
+    from injury_etl.quality import quality_gate, reference_keys
+    from injury_etl.reference import get_reference_data, register_season_teams
+    from injury_etl.transform import transform_match_data, transform_player_stats
+    from injury_etl.utils import db_connection
+
+    league, season = target
+    params = kwargs["params"]
+    checkpoint = params["checkpoint"]
+
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            if season_done(cur, checkpoint, league, season):
+                print(f"{league} {season} already backfilled under '{checkpoint}'; skipping.")
+                return []
+
+        understat = extract_understat_league(league, season, ("datesData", "playersData"), UNDERSTAT_FIELDS)
+        # Promoted and relegated clubs differ season to season
+        with conn.cursor() as cur:
+            register_season_teams(cur, league, season,
+                                  {m[side]["title"] for m in understat["datesData"] for side in ("h", "a")})
+        conn.commit()
+        reference = get_reference_data(conn)
+        match_rejects, player_rejects = [], []
+        match_data = transform_match_data(understat["datesData"], reference.team_name_to_id, match_rejects)
+        players, stats = transform_player_stats(understat["playersData"], reference.team_name_to_id,
+                                                player_rejects, league=league, season=season)
+
+        # Rejects are quarantined under this run; too many fail the season
+        keys, run_id = reference_keys(reference), kwargs["run_id"]
+        match_data = quality_gate(conn, "matches", match_data, keys, match_rejects, run_id)
+        players = quality_gate(conn, "player_details", players, keys, player_rejects, run_id)
+        stats = quality_gate(conn, "player_stats", stats, keys, (), run_id)
+
+        # Player stats reference player_details, so the tables go in order
+        for table, rows, loader in (("matches", match_data, bulk_insert_matches),
+                                    ("player_details", players, bulk_insert_player_details),
+                                    ("player_stats", stats, bulk_insert_player_stats)):
+            load_in_batches(conn, checkpoint, league, season, table, rows, loader, params["batch_size"])
+
+    return [m["match_id"] for m in match_data]
+
+
+# ingest_match_details commits as pages arrive and only fetches matches
+# without appearances, so it resumes on its own.
+def season_match_details_task(target, match_ids, **kwargs):
+    from injury_etl.checkpoints import mark_season_done
+    from injury_etl.match_details import ingest_match_details
+    from injury_etl.utils import db_connection
+
+    league, season = target
+    params = kwargs["params"]
+    with db_connection() as conn:
+        if match_ids:
+            ingest_match_details(conn, match_ids, max_workers=params["match_workers"])
+        mark_season_done(conn, params["checkpoint"], league, season)
+
+
+def analytics_task():
+    from injury_etl.analytics import refresh_analytics
+    from injury_etl.utils import db_connection
+
+    with db_connection() as conn:
+        refresh_analytics(conn)
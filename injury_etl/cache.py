@@ -0,0 +1,234 @@
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlencode
+
+DEFAULT_CACHE_DIR = os.path.expanduser("~/.cache/injury_etl")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Query parameters that identify the caller rather than the resource.
+IGNORED_PARAMS = {"api_key"}
+
+
+class OfflineCacheMiss(RuntimeError):
+    pass
+
+
+class CachedResponse:
+    """
+    Response body served through the cache. Mirrors the parts of
+    requests.Response the extractors use, plus the content hash and whether
+    the body differs from the previously cached copy.
+    """
+
+    def __init__(self, url, content, headers, content_hash, changed, from_cache):
+        self.url = url
+        self.content = content
+        self.headers = headers
+        self.status_code = 200
+        self.content_hash = content_hash
+        self.changed = changed
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+
+class ResponseCache:
+    """
+    On-disk cache of raw page bodies.
+
+    Bodies are gzip-compressed and stored once per sha256 of their content
+    under blobs/; entries/ maps a hash of (url, params) to the blob plus the
+    ETag, Last-Modified and fetch time used for conditional requests and TTL.
+    """
+
+    def __init__(self, root=None, max_bytes=None, offline=None):
+        self.root = root or os.environ.get("INJURY_ETL_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes or int(os.environ.get("INJURY_ETL_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        if offline is None:
+            offline = os.environ.get("INJURY_ETL_OFFLINE", "") not in ("", "0", "false")
+        self.offline = offline
+        self.fingerprints = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.root, "entries"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "blobs"), exist_ok=True)
+
+    @staticmethod
+    def key(url, params=None):
+        params = {k: v for k, v in (params or {}).items() if k not in IGNORED_PARAMS}
+        raw = url + "?" + urlencode(sorted(params.items()))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.root, "entries", key + ".json")
+
+    def _blob_path(self, content_hash):
+        return os.path.join(self.root, "blobs", content_hash + ".gz")
+
+    def get_entry(self, key):
+        try:
+            with open(self._entry_path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read_blob(self, content_hash):
+        """Returns the cached body, or None if the blob is gone or unreadable."""
+        # Another process can evict the blob between get_entry and this read
+        try:
+            with gzip.open(self._blob_path(content_hash), "rb") as f:
+                return f.read()
+        except (OSError, EOFError):
+            return None
+
+    def store(self, key, url, content, headers):
+        content_hash = hashlib.sha256(content).hexdigest()
+        blob = self._blob_path(content_hash)
+        if not os.path.exists(blob):
+            tmp = f"{blob}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp, "wb", compresslevel=6) as f:
+                f.write(content)
+            os.replace(tmp, blob)
+
+        entry = {
+            "url": url,
+            "content_hash": content_hash,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }
+        self._write_entry(key, entry)
+        self.evict()
+        return entry
+
+    def touch(self, key, entry):
+        entry["fetched_at"] = time.time()
+        self._write_entry(key, entry)
+
+    def _write_entry(self, key, entry):
+        path = self._entry_path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+
+    def evict(self):
+        """Drops least recently fetched entries until the blobs fit in max_bytes."""
+        with self._lock:
+            entries_dir = os.path.join(self.root, "entries")
+            entries = []
+            for name in os.listdir(entries_dir):
+                if name.endswith(".json"):
+                    entry = self.get_entry(name[:-5])
+                    if entry:
+                        entries.append((entry["fetched_at"], name[:-5], entry["content_hash"]))
+            entries.sort()
+
+            referenced = {}
+            for _, key, content_hash in entries:
+                referenced.setdefault(content_hash, []).append(key)
+
+            sizes = {}
+            for content_hash in referenced:
+                try:
+                    sizes[content_hash] = os.path.getsize(self._blob_path(content_hash))
+                except OSError:
+                    sizes[content_hash] = 0
+            total = sum(sizes.values())
+
+            for _, key, content_hash in entries:
+                if total <= self.max_bytes:
+                    break
+                # Another process may be evicting the same entries
+                try:
+                    os.remove(self._entry_path(key))
+                except FileNotFoundError:
+                    pass
+                referenced[content_hash].remove(key)
+                if not referenced[content_hash]:
+                    try:
+                        os.remove(self._blob_path(content_hash))
+                    except OSError:
+                        pass
+                    total -= sizes[content_hash]
+
+    def fetch(self, url, params=None, ttl=None, fetcher=None, label=None):
+        """
+        Returns the body for (url, params), going to the network only when the
+        cached copy is older than ttl seconds, and then conditionally.
+
+        :param fetcher: callable(url, params, headers) -> requests.Response
+        :param label: name to record the content hash under in self.fingerprints
+        :return: CachedResponse
+        """
+        key = self.key(url, params)
+        entry = self.get_entry(key)
+        content = self.read_blob(entry["content_hash"]) if entry else None
+        if content is None:
+            # An entry whose blob has been evicted is a plain miss
+            entry = None
+
+        if entry and (self.offline or (ttl is not None and time.time() - entry["fetched_at"] < ttl)):
+            response = CachedResponse(url, content, {},
+                                      entry["content_hash"], changed=False, from_cache=True)
+        elif self.offline:
+            raise OfflineCacheMiss(f"{url} is not in the cache and offline mode is on.")
+        else:
+            headers = {}
+            if entry and entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry and entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+            res = fetcher(url, params, headers)
+            if res.status_code == 304 and entry:
+                self.touch(key, entry)
+                response = CachedResponse(url, content, res.headers,
+                                          entry["content_hash"], changed=False, from_cache=True)
+            else:
+                new_entry = self.store(key, url, res.content, res.headers)
+                changed = not entry or entry["content_hash"] != new_entry["content_hash"]
+                response = CachedResponse(url, res.content, res.headers,
+                                          new_entry["content_hash"], changed=changed, from_cache=False)
+
+        self.fingerprints[label or url] = response.content_hash
+        return response
+
+
+_cache = None
+
+
+def get_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
+
+
+def last_loaded_fingerprints():
+    """Source content hashes recorded by the last successful load, if any."""
+    try:
+        with open(os.path.join(get_cache().root, "loaded.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def mark_loaded(fingerprints):
+    """
+    Records the given sources as loaded, keeping what earlier loads recorded
+    for other sources. Branches of a run may call this concurrently.
+    """
+    path = os.path.join(get_cache().root, "loaded.json")
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        loaded = {**last_loaded_fingerprints(), **fingerprints}
+        with open(path + ".tmp", "w") as f:
+            json.dump(loaded, f)
+        os.replace(path + ".tmp", path)
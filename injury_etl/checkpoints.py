@@ -0,0 +1,105 @@
+"""
+Checkpointed, resumable loading for backfills.
+
+A backfill splits each (league, season, table) into fixed-size batches in
+natural-key order. Every batch is loaded and recorded in
+prem_injury.backfill_checkpoints in the same transaction, so a batch is
+either fully loaded and checkpointed or not at all. A retry, or a later run
+under the same checkpoint name, skips batches whose recorded content hash
+still matches and loads only the rest. A batch whose content changed since
+it was checkpointed is loaded again.
+"""
+import hashlib
+
+# Table name recorded once every table of a season, match details included,
+# is done; a season with this checkpoint is skipped without being fetched.
+SEASON_DONE = "season"
+
+
+def create_checkpoint_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS prem_injury.backfill_checkpoints (
+                checkpoint      TEXT NOT NULL,
+                league          TEXT NOT NULL,
+                season          TEXT NOT NULL,
+                table_name      TEXT NOT NULL,
+                batch           INTEGER NOT NULL,
+                batch_hash      TEXT NOT NULL,
+                rows            INTEGER NOT NULL,
+                completed_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (checkpoint, league, season, table_name, batch)
+            );
+        """)
+
+
+def completed_batches(cur, checkpoint, league, season, table) -> dict:
+    """:return: {batch number: batch_hash} already loaded"""
+    cur.execute("""
+        SELECT batch, batch_hash FROM prem_injury.backfill_checkpoints
+        WHERE checkpoint = %s AND league = %s AND season = %s AND table_name = %s
+    """, (checkpoint, league, season, table))
+    return dict(cur.fetchall())
+
+
+def record_checkpoint(cur, checkpoint, league, season, table, batch, batch_hash, rows):
+    cur.execute("""
+        INSERT INTO prem_injury.backfill_checkpoints
+            (checkpoint, league, season, table_name, batch, batch_hash, rows)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (checkpoint, league, season, table_name, batch) DO UPDATE
+        SET batch_hash = EXCLUDED.batch_hash,
+            rows = EXCLUDED.rows,
+            completed_at = now();
+    """, (checkpoint, league, season, table, batch, batch_hash, rows))
+
+
+def season_done(cur, checkpoint, league, season) -> bool:
+    return bool(completed_batches(cur, checkpoint, league, season, SEASON_DONE))
+
+
+def mark_season_done(conn, checkpoint, league, season):
+    with conn.cursor() as cur:
+        record_checkpoint(cur, checkpoint, league, season, SEASON_DONE, 0, "", 0)
+    conn.commit()
+
+
+def load_in_batches(conn, checkpoint, league, season, table, rows, loader, batch_size=5000) -> dict:
+    """
+    Loads rows batch by batch, skipping batches already checkpointed with the
+    same content.
+
+    :param table: key into incremental.TABLE_KEYS; also the checkpoint name
+    :param loader: bulk loader called as loader(cur, batch), e.g. bulk_insert_matches
+    :return: dict {"batches": n, "loaded": n, "skipped": n, "rows": n}
+    """
+    # incremental imports load, which imports this module for its schema
+    from injury_etl.incremental import row_hash, row_key
+
+    rows = sorted(rows, key=lambda r: row_key(table, r))
+    batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+
+    with conn.cursor() as cur:
+        done = completed_batches(cur, checkpoint, league, season, table)
+
+    counts = {"batches": len(batches), "loaded": 0, "skipped": 0, "rows": 0}
+    for number, batch in enumerate(batches):
+        digest = hashlib.blake2b("".join(row_hash(r) for r in batch).encode(), digest_size=16).hexdigest()
+        if done.get(number) == digest:
+            counts["skipped"] += 1
+            continue
+
+        try:
+            with conn.cursor() as cur:
+                loader(cur, batch)
+                record_checkpoint(cur, checkpoint, league, season, table, number, digest, len(batch))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        counts["loaded"] += 1
+        counts["rows"] += len(batch)
+
+    print(f"{league} {season} {table}: loaded {counts['loaded']} of {counts['batches']} batches "
+          f"({counts['skipped']} already checkpointed).")
+    return counts
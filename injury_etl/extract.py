@@ -1,17 +1,205 @@
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+import asyncio
+import codecs
+import contextvars
 import json
 import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
 
-def extract_injury_data():
+from injury_etl import metrics
+from injury_etl.cache import get_cache
+
+# Source endpoints; point these at benchmarks/standin.py to run the pipeline
+# without network access.
+SCRAPERAPI_URL = os.environ.get("INJURY_SCRAPERAPI_URL", "https://api.scraperapi.com/")
+SCRAPERAPI_KEY = os.environ.get("INJURY_SCRAPERAPI_KEY", "your_api_key")
+INJURY_TABLE_URL = os.environ.get("INJURY_TABLE_URL", "https://www.premierinjuries.com/injury-table.php")
+UNDERSTAT_BASE_URL = os.environ.get("INJURY_UNDERSTAT_URL", "https://understat.com").rstrip("/")
+
+# Minimum spacing between requests to the same host, in seconds.
+HOST_MIN_INTERVAL = {
+    "understat.com": 1.0,
+    "api.scraperapi.com": 0.0,
+    # the local stand-in server
+    "127.0.0.1": 0.0,
+    "localhost": 0.0,
+}
+DEFAULT_MIN_INTERVAL = 0.5
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Responses larger than this are refused rather than read into memory.
+MAX_RESPONSE_BYTES = int(os.environ.get("INJURY_ETL_MAX_RESPONSE_BYTES", 128 * 1024 * 1024))
+
+
+class ResponseTooLarge(ValueError):
+    pass
+
+# Connections kept open per host by the shared session.
+POOL_SIZE = int(os.environ.get("INJURY_ETL_POOL_SIZE", "16"))
+# Seconds allowed to open a connection. Read timeouts are per source:
+# ScraperAPI renders the page in a headless browser before it answers.
+CONNECT_TIMEOUT = 10
+SCRAPERAPI_TIMEOUT = 120
+UNDERSTAT_TIMEOUT = 30
+
+# How long a cached page is served without asking the source again, in seconds.
+INJURY_PAGE_TTL = 6 * 60 * 60
+UNDERSTAT_PAGE_TTL = 6 * 60 * 60
+# A finished match's page does not change.
+UNDERSTAT_MATCH_TTL = 30 * 24 * 60 * 60
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests per host so concurrent workers never hit the same
+    site faster than its configured interval.
+    """
+
+    def __init__(self, intervals=None, default=DEFAULT_MIN_INTERVAL):
+        self.intervals = dict(HOST_MIN_INTERVAL if intervals is None else intervals)
+        self.default = default
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url):
+        host = urlsplit(url).hostname or ""
+        interval = self.intervals.get(host, self.default)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_rate_limiter = HostRateLimiter()
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Process-wide requests.Session, created on first use, whose connection
+    pool keeps connections to each host alive between requests and threads.
+    A forked child gets its own, since pooled sockets cannot be shared.
+    """
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            # Retries are fetch()'s job
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+
+def _read_limited(res, max_bytes):
+    # Reads the body in chunks so an oversized response is abandoned before it
+    # is held in memory, whether or not it declares a Content-Length.
+    declared = res.headers.get("Content-Length", "")
+    if declared.isdigit() and int(declared) > max_bytes:
+        res.close()
+        raise ResponseTooLarge(f"{res.url} declares {declared} bytes, limit is {max_bytes}")
+
+    chunks, size = [], 0
+    for chunk in res.iter_content(chunk_size=1024 * 1024):
+        size += len(chunk)
+        if size > max_bytes:
+            res.close()
+            raise ResponseTooLarge(f"{res.url} exceeded {max_bytes} bytes")
+        chunks.append(chunk)
+    res._content = b"".join(chunks)
+
+
+def fetch(url, params=None, retries=3, backoff=1.0, timeout=60, limiter=None, headers=None,
+          max_bytes=None):
+    """
+    GETs a URL through the per-host rate limiter, retrying connection errors,
+    timeouts, 429s and 5xx responses with exponential backoff and jitter.
+
+    :param timeout: seconds to wait for the response once connected
+    :param max_bytes: refuse bodies larger than this (default MAX_RESPONSE_BYTES)
+    :return: requests.Response with a 2xx status
+    """
+    limiter = limiter or _rate_limiter
+    max_bytes = max_bytes or MAX_RESPONSE_BYTES
+
+    for attempt in range(retries + 1):
+        limiter.wait(url)
+        try:
+            res = get_session().get(url, params=params, headers=headers,
+                                    timeout=(CONNECT_TIMEOUT, timeout), stream=True)
+            _read_limited(res, max_bytes)
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt
+        else:
+            if res.status_code not in RETRY_STATUSES or attempt == retries:
+                if res.status_code != 304:
+                    res.raise_for_status()
+                metrics.count("bytes_fetched", len(res.content))
+                return res
+            retry_after = res.headers.get("Retry-After", "")
+            delay = float(retry_after) if retry_after.isdigit() else backoff * 2 ** attempt
+
+        time.sleep(delay + random.uniform(0, backoff))
+
+
+def cached_fetch(url, params=None, ttl=None, label=None, timeout=UNDERSTAT_TIMEOUT):
+    """
+    fetch() through the on-disk response cache: fresh entries are replayed,
+    stale ones are revalidated with If-None-Match/If-Modified-Since, and with
+    INJURY_ETL_OFFLINE=1 everything is served from the cache.
+
+    :return: injury_etl.cache.CachedResponse
+    """
+    return get_cache().fetch(
+        url, params, ttl=ttl, label=label,
+        fetcher=lambda u, p, h: fetch(u, params=p, headers=h, timeout=timeout),
+    )
+
+
+def source_fingerprints(prefix="") -> dict:
+    """
+    Content hashes of every page fetched in this process, keyed by source.
+
+    :param prefix: only sources whose label starts with this, e.g. "understat/"
+    """
+    return {k: v for k, v in get_cache().fingerprints.items() if k.startswith(prefix)}
+
+
+def extract_injury_page() -> bytes:
+    """Raw HTML of the rendered injury table page."""
     payload = {
-        'api_key': 'your_api_key',
-        'url': 'https://www.premierinjuries.com/injury-table.php',
+        'api_key': SCRAPERAPI_KEY,
+        'url': INJURY_TABLE_URL,
         'render': 'true' 
     }
 
-    response = requests.get('https://api.scraperapi.com/', params=payload)
-    soup = BeautifulSoup(response.text, 'html.parser')
+    response = cached_fetch(SCRAPERAPI_URL, params=payload, ttl=INJURY_PAGE_TTL, label="injuries",
+                            timeout=SCRAPERAPI_TIMEOUT)
+
+    # Basic validation — check that the table or expected content exists
+    if b"<table" not in response.content.lower():
+        raise ValueError("Expected injury table not found in the page HTML.")
+
+    return response.content
+
+def extract_injury_data():
+    soup = BeautifulSoup(extract_injury_page(), 'html.parser')
     
     # Basic validation — check that the table or expected content exists
     if not soup.find("table"):
@@ -19,50 +207,345 @@ def extract_injury_data():
     
     return soup
 
-def extract_match_data():
-    #Send HTTP request
-    url = 'https://understat.com/league/EPL/2024'
-    res = requests.get(url)
+UNDERSTAT_LEAGUE_URL = UNDERSTAT_BASE_URL + "/league/{league}/{season}"
+DEFAULT_LEAGUE = "EPL"
+DEFAULT_SEASON = "2024"
+UNDERSTAT_VARIABLES = ("datesData", "playersData", "teamsData")
 
-    #Parse HTML
-    soup = BeautifulSoup(res.content, 'lxml')
+# Understat embeds each dataset as `var name = JSON.parse('...')` inside a
+# <script> tag. The payload is hex-escaped, so it never contains a raw quote
+# and the first "')" after the opening closes it; finding that with
+# bytes.find is an order of magnitude faster than a lazy regex group.
+_JSON_PARSE_RE = re.compile(rb"var\s+(\w+)\s*=\s*JSON\.parse\('")
 
-    #find and loop through <script> tags to find datesData
-    script_tags = soup.find_all('script')
+# Only the fields the transforms read; passing these to parse_understat_page
+# drops the rest of each record as soon as it is decoded.
+UNDERSTAT_FIELDS = {
+    "datesData": ("id", "isResult", "datetime", "h", "a", "goals", "xG"),
+    "playersData": ("id", "player_name", "position", "team_title", "games", "time",
+                    "goals", "assists", "xG", "xA", "npxG", "xGChain", "xGBuildup"),
+}
 
-    for script in script_tags:
-        # Extract JSON string from Javascript
-        if 'datesData' in script.text:
-            raw_text = script.string
-            start = raw_text.find("JSON.parse('") + len("JSON.parse('")
-            end = raw_text.find("')", start)
-            if start == -1 or end == -1:
-                    continue
-                    
-            json_str = raw_text[start:end]
+# An escaped backslash, or an escape escape_decode does not know (anything
+# but \\, \', \", \a, \b, \f, \n, \r, \t, \v, octal and \x)
+_STRAY_ESCAPE_RE = re.compile(rb"\\([^'\"abfnrtvx0-7\n])")
+_ESCAPED_BACKSLASH_RE = re.compile(rb"\\\\")
+_ESCAPED_SLASH_RE = re.compile(rb"\\/")
 
-            # Decode unicode escapes
-            decoded_json = json_str.encode('utf8').decode('unicode_escape')
 
-            # Parse JSON
-            return json.loads(decoded_json)
+def _keep_stray_escape(match):
+    char = match.group(1)
+    if char == b"\\":
+        return match.group(0)
+    if char == b"/":
+        return char
+    return b"\\\\" + char
 
-    # raise error if no data is found
-    raise RuntimeError("Failed to extract match data from Understat.")
 
-def extract_understat_player_stats():
-    url = "https://understat.com/league/EPL/2024"
-    res = requests.get(url)
-    soup = BeautifulSoup(res.content, "lxml")
+def _unescape_js(raw) -> bytes:
+    # codecs.escape_decode is undocumented CPython API, but it is the only
+    # C-level decoder for these escapes that works on bytes. It leaves escapes
+    # it does not know in place for the JSON parser and emits a
+    # DeprecationWarning for each one. Understat's only such escape is \/,
+    # which is "/" in JavaScript, so it is replaced up front; that is only
+    # safe while no escaped backslash can sit in front of it (Understat writes
+    # a backslash as \x5C). Otherwise, or if warnings are errors and another
+    # unknown escape shows up, \/ is replaced in place and the backslash of
+    # any other unknown escape is escaped, which hands the JSON parser the
+    # same text without escape_decode having anything to warn about.
+    if _ESCAPED_BACKSLASH_RE.search(raw) is None:
+        if _ESCAPED_SLASH_RE.search(raw):
+            raw = bytes(raw).replace(b"\\/", b"/")
+        try:
+            return codecs.escape_decode(raw)[0]
+        except DeprecationWarning:
+            pass
+    return codecs.escape_decode(_STRAY_ESCAPE_RE.sub(_keep_stray_escape, raw))[0]
 
-    script_tag = next(s for s in soup.find_all("script") if "playersData" in s.text)
-    start = script_tag.text.find("JSON.parse('") + len("JSON.parse('")
-    end = script_tag.text.find("')", start)
-    raw_json = script_tag.text[start:end]
-    decoded_json = raw_json.encode("utf-8").decode("unicode_escape")
-    players_data = json.loads(decoded_json)
 
-    return players_data
+# Escaped bytes unescaped and decoded at a time by _iter_unescaped. Small
+# enough that the freed text of one chunk is reused for the next batch of
+# records instead of leaving holes in the heap.
+PAYLOAD_CHUNK_BYTES = 32 * 1024
+
+
+def _iter_unescaped(raw, chunk=PAYLOAD_CHUNK_BYTES):
+    # Yields the unescaped payload as text, about `chunk` escaped bytes at a
+    # time, so neither the unescaped bytes nor the text of a full-season
+    # payload exist at once. Only called when the payload holds no escaped
+    # backslash: then every backslash starts an escape of at most four bytes,
+    # and cutting a chunk before the last backslash of its final four bytes
+    # never splits one. The UTF-8 decoder is incremental, so a character cut
+    # in two is joined with the next chunk.
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    start, size = 0, len(raw)
+    while start < size:
+        end = min(start + chunk, size)
+        if end < size:
+            cut = bytes(raw[end - 4:end]).rfind(b"\\")
+            if cut > 0 or (cut == 0 and end - 4 > start):
+                end = end - 4 + cut
+        yield decoder.decode(_unescape_js(raw[start:end]), final=end == size)
+        start = end
+
+
+def _last_object_boundary(text):
+    # (index of "}", index of "{") of the last "}, {" in text, whitespace
+    # allowed around the comma, or (-1, -1)
+    end = len(text)
+    while (opening := text.rfind("{", 0, end)) > 0:
+        i = opening - 1
+        while i >= 0 and text[i] in " \t\r\n":
+            i -= 1
+        if i >= 0 and text[i] == ",":
+            i -= 1
+            while i >= 0 and text[i] in " \t\r\n":
+                i -= 1
+            if i >= 0 and text[i] == "}":
+                return i, opening
+        end = opening
+    return -1, -1
+
+
+def _iter_array(pieces, loads=json.loads):
+    # Yields the elements of a top-level JSON array of objects whose text
+    # arrives in pieces. Each time a piece arrives, the objects completed so
+    # far are parsed by one loads() call, cut at the last "}, {" in the text.
+    # One call per batch rather than per object lets the parser share the key
+    # strings of every object in the batch. If the cut falls inside an object
+    # or a string, the batch cannot parse, so it is kept and retried with the
+    # next piece; an array with no "}, {" is parsed whole at the end.
+    text = ""
+    for piece in pieces:
+        text += piece
+        if "[" in text:
+            text = text[text.index("[") + 1:]
+            break
+    else:
+        raise json.JSONDecodeError("Expecting '['", text, len(text))
+
+    for piece in pieces:
+        text += piece
+        closing, opening = _last_object_boundary(text)
+        if closing == -1:
+            continue
+        try:
+            batch = loads("[" + text[:closing + 1] + "]")
+        except ValueError:
+            continue
+        text = text[opening:]
+        yield from batch
+    yield from loads("[" + text)
+
+
+def decode_understat_payload(raw, fields=None, loads=json.loads):
+    """
+    Decodes one JSON.parse('...') payload from an Understat page.
+
+    The JS string escapes (\\xNN, \\', \\\\) are undone by a C-level pass over
+    the bytes, which leaves raw UTF-8 untouched, and the result is decoded as
+    UTF-8. The old decode("unicode_escape") round trip read raw UTF-8 as
+    Latin-1, so "Ødegaard" came out as "Ã\\x98degaard".
+
+    Array payloads (datesData, playersData) are unescaped and parsed a chunk
+    at a time, so peak memory is the decoded records plus about one chunk
+    rather than the whole payload's bytes and text on top of them.
+
+    :param raw: escaped payload as bytes or a memoryview over the page
+    :param fields: if given, keep only these keys of each array record, so
+        the untrimmed records never all exist at once
+    :param loads: JSON parser, e.g. orjson.loads, which is faster
+    """
+    # Understat writes the opening bracket as \x5B
+    head = bytes(raw[:16]).lstrip()
+    is_array = head.startswith(b"[") or head[:4].lower() == b"\\x5b"
+    if not is_array or _ESCAPED_BACKSLASH_RE.search(raw) is not None:
+        data = loads(_unescape_js(raw).decode("utf-8"))
+        if fields and isinstance(data, list):
+            data = [{k: record[k] for k in fields if k in record} for record in data]
+        return data
+
+    records = _iter_array(_iter_unescaped(raw), loads)
+    if fields:
+        return [{k: record[k] for k in fields if k in record} for record in records]
+    return list(records)
+
+
+def parse_understat_page(content, variables=UNDERSTAT_VARIABLES, fields=None, loads=json.loads) -> dict:
+    """
+    Pulls the JSON.parse payloads for the given variables out of an Understat
+    page in one scan of the raw bytes, without building a DOM.
+
+    :param content: page body as bytes (or str)
+    :param variables: names of the embedded JS variables to extract
+    :param fields: optional {variable_name: keys to keep}, e.g. UNDERSTAT_FIELDS
+    :param loads: JSON parser passed to decode_understat_payload
+    :return: dict {variable_name: decoded JSON}
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+
+    wanted = set(variables)
+    fields = fields or {}
+    view = memoryview(content)
+    found = {}
+    pos = 0
+    while match := _JSON_PARSE_RE.search(content, pos):
+        end = content.find(b"')", match.end())
+        if end == -1:
+            break
+        pos = end + 2
+
+        name = match.group(1).decode("ascii")
+        if name not in wanted:
+            continue
+
+        found[name] = decode_understat_payload(view[match.end():end], fields.get(name), loads)
+
+        if len(found) == len(wanted):
+            break
+
+    missing = wanted - found.keys()
+    if missing:
+        raise RuntimeError(f"Failed to extract {', '.join(sorted(missing))} from Understat.")
+
+    return found
+
+
+def extract_understat_league(league=DEFAULT_LEAGUE, season=DEFAULT_SEASON, variables=UNDERSTAT_VARIABLES,
+                             fields=None) -> dict:
+    """
+    Fetches one Understat league page once and returns every requested dataset.
+
+    :return: dict {"datesData": [...], "playersData": [...], "teamsData": {...}}
+    """
+    res = cached_fetch(UNDERSTAT_LEAGUE_URL.format(league=league, season=season),
+                       ttl=UNDERSTAT_PAGE_TTL, label=f"understat/{league}/{season}")
+    return parse_understat_page(res.content, variables, fields)
+
+
+def backfill_targets(leagues, seasons) -> list[tuple[str, str]]:
+    """Every (league, season) pair for a backfill, oldest season first."""
+    return [(str(league), str(season)) for season in sorted(seasons) for league in leagues]
+
+
+def _extract_concurrently(fn, targets, max_workers, describe):
+    # Runs fn(*target) for every target on a bounded thread pool and yields
+    # (target, result) as each finishes. Failures are raised together once
+    # every other target has been yielded.
+    failures = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Each worker runs in a copy of the caller's context so fetches are
+        # counted against the caller's metrics stage.
+        futures = {
+            pool.submit(contextvars.copy_context().run, fn, *target): target
+            for target in targets
+        }
+        for future in as_completed(futures):
+            target = futures[future]
+            try:
+                yield target, future.result()
+            except Exception as e:
+                failures[target] = e
+
+    if failures:
+        detail = "; ".join(f"{describe(target)}: {e}" for target, e in failures.items())
+        raise RuntimeError(f"Failed to extract {len(failures)} Understat page(s): {detail}")
+
+
+def extract_understat_leagues(targets, max_workers=4, variables=UNDERSTAT_VARIABLES):
+    """
+    Fetches many (league, season) pages concurrently on a bounded thread pool
+    and yields ((league, season), datasets) as each one finishes.
+
+    Targets that still fail after retries are reported together once every
+    other target has been yielded.
+    """
+    yield from _extract_concurrently(
+        lambda league, season: extract_understat_league(league, season, variables),
+        targets, max_workers, lambda target: " ".join(target),
+    )
+
+
+def extract_match_data(league=DEFAULT_LEAGUE, season=DEFAULT_SEASON):
+    return extract_understat_league(league, season, ("datesData",), UNDERSTAT_FIELDS)["datesData"]
+
+
+def extract_understat_player_stats(league=DEFAULT_LEAGUE, season=DEFAULT_SEASON):
+    return extract_understat_league(league, season, ("playersData",), UNDERSTAT_FIELDS)["playersData"]
+
+
+UNDERSTAT_MATCH_URL = UNDERSTAT_BASE_URL + "/match/{match_id}"
+UNDERSTAT_MATCH_VARIABLES = ("shotsData", "rostersData")
+
+
+def extract_understat_match(match_id) -> dict:
+    """
+    Fetches one Understat match page.
+
+    :return: dict {"shotsData": {"h": [...], "a": [...]},
+                   "rostersData": {"h": {...}, "a": {...}}}
+    """
+    res = cached_fetch(UNDERSTAT_MATCH_URL.format(match_id=match_id), ttl=UNDERSTAT_MATCH_TTL)
+    return parse_understat_page(res.content, UNDERSTAT_MATCH_VARIABLES)
+
+
+def extract_understat_matches(match_ids, max_workers=8):
+    """
+    Fetches many match pages concurrently and yields (match_id, datasets) as
+    each one finishes. Requests to understat.com are still spaced by the
+    shared rate limiter, so max_workers only hides network latency.
+    """
+    for (match_id,), data in _extract_concurrently(
+            extract_understat_match, [(m,) for m in match_ids], max_workers,
+            lambda target: f"match {target[0]}"):
+        yield match_id, data
+
+
+async def gather_sources(sources, max_concurrency=4) -> dict:
+    """
+    Runs the blocking extractors in `sources` ({name: zero-argument callable})
+    concurrently on worker threads, at most max_concurrency at a time, so a
+    slow source no longer holds up the others. They share the pooled session
+    and the per-host rate limiter.
+
+    Sources that fail are raised together once every other one has finished.
+
+    :return: dict {name: result}
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(fn):
+        async with semaphore:
+            # to_thread runs fn in a copy of this context, so fetches are
+            # counted against the caller's metrics stage
+            return await asyncio.to_thread(fn)
+
+    names = list(sources)
+    outcomes = await asyncio.gather(*(run(sources[name]) for name in names), return_exceptions=True)
+
+    failures = {name: e for name, e in zip(names, outcomes) if isinstance(e, BaseException)}
+    if failures:
+        detail = "; ".join(f"{name}: {e}" for name, e in failures.items())
+        raise RuntimeError(f"Failed to extract {len(failures)} source(s): {detail}")
+    return dict(zip(names, outcomes))
+
+
+async def extract_sources_async(league=DEFAULT_LEAGUE, season=DEFAULT_SEASON, variables=UNDERSTAT_VARIABLES,
+                                fields=None, max_concurrency=4) -> dict:
+    """
+    Fetches the injury page and the Understat league page at the same time.
+
+    :return: dict {"injuries": raw injury page bytes,
+                   "understat": {variable_name: decoded JSON}}
+    """
+    return await gather_sources({
+        "injuries": extract_injury_page,
+        "understat": lambda: extract_understat_league(league, season, variables, fields),
+    }, max_concurrency)
 
-    
 
+def extract_sources(league=DEFAULT_LEAGUE, season=DEFAULT_SEASON, variables=UNDERSTAT_VARIABLES,
+                    fields=None, max_concurrency=4) -> dict:
+    """Synchronous wrapper around extract_sources_async for callers without an event loop."""
+    return asyncio.run(extract_sources_async(league, season, variables, fields, max_concurrency))
@@ -0,0 +1,174 @@
+"""
+Injury history kept as state transitions, so the injury list in effect on
+any past date can be reconstructed.
+
+Each row of prem_injury.injury_history is one spell of an unchanged injury
+state for a player: it opens on the scrape date the state was first seen
+(valid_from) and closes on the scrape date it changed or disappeared
+(valid_to, NULL while still current). The table is range-partitioned by
+month of valid_from.
+"""
+from datetime import date
+
+STATE_COLUMNS = ["reason", "detail", "potential_return", "condition", "status"]
+SNAPSHOT_COLUMNS = ["player_id", "team_id", *STATE_COLUMNS]
+
+
+def create_history_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS prem_injury.injury_history (
+                player_id           INTEGER NOT NULL REFERENCES prem_injury.player_details(id) ON DELETE CASCADE,
+                team_id             INTEGER NOT NULL REFERENCES prem_injury.teams(id),
+                reason              TEXT,
+                detail              TEXT,
+                potential_return    DATE,
+                condition           TEXT,
+                status              TEXT,
+                valid_from          DATE NOT NULL,
+                valid_to            DATE,
+                PRIMARY KEY (player_id, team_id, valid_from),
+                CHECK (valid_to IS NULL OR valid_to > valid_from)
+            ) PARTITION BY RANGE (valid_from);
+        """)
+        # Spells are short, so filtering on valid_to first discards almost
+        # every old row in an as-of lookup.
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS injury_history_validity_idx
+                ON prem_injury.injury_history (valid_to, valid_from);
+            CREATE INDEX IF NOT EXISTS injury_history_team_idx
+                ON prem_injury.injury_history (team_id, valid_from);
+            CREATE INDEX IF NOT EXISTS injury_history_valid_from_idx
+                ON prem_injury.injury_history (valid_from);
+        """)
+        cur.execute("""
+            CREATE OR REPLACE FUNCTION prem_injury.injuries_as_of(as_of DATE)
+            RETURNS SETOF prem_injury.injury_history
+            LANGUAGE sql STABLE AS $$
+                SELECT * FROM prem_injury.injury_history
+                WHERE valid_from <= as_of
+                  AND (valid_to IS NULL OR valid_to > as_of)
+            $$;
+        """)
+
+
+def _month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def ensure_history_partitions(cur, start, end=None):
+    """Creates the monthly partitions covering start..end (inclusive)."""
+    month = _month_start(start)
+    last = _month_start(end or start)
+    while month <= last:
+        upper = _next_month(month)
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS prem_injury.injury_history_{month:%Y_%m}
+            PARTITION OF prem_injury.injury_history
+            FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')
+        """)
+        month = upper
+
+
+def load_injury_snapshot(conn, injury_rows, scraped_on) -> dict:
+    """
+    Records the full injury list scraped on `scraped_on` as state transitions:
+    open spells that no longer match the snapshot are closed, and snapshot
+    rows with no matching open spell start a new one. Reloading the same date
+    is idempotent; loading a date older than the newest recorded one is
+    refused.
+
+    :param injury_rows: every injury row from the scrape, not just changed ones
+    :return: dict {"opened": n, "closed": n, "unchanged": n}
+    """
+    # Imported here because load imports this module for its DDL
+    from injury_etl.load import stage_rows
+
+    if isinstance(scraped_on, str):
+        scraped_on = date.fromisoformat(scraped_on[:10])
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT MAX(valid_from) FROM prem_injury.injury_history")
+        newest = cur.fetchone()[0]
+        if newest and scraped_on < newest:
+            raise ValueError(f"Snapshot for {scraped_on} is older than the newest recorded one ({newest}).")
+
+        ensure_history_partitions(cur, scraped_on)
+
+        seen = {}
+        for row in injury_rows:
+            seen[(row["player_id"], row["team_id"])] = row
+        total = stage_rows(cur, "_staging_injury_snapshot", "injuries", SNAPSHOT_COLUMNS,
+                           (tuple(r[c] for c in SNAPSHOT_COLUMNS) for r in seen.values()))
+
+        same_state = " AND ".join(f"h.{c} IS NOT DISTINCT FROM s.{c}" for c in STATE_COLUMNS)
+        unmatched = f"""
+            h.valid_to IS NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM _staging_injury_snapshot s
+                WHERE s.player_id = h.player_id AND s.team_id = h.team_id AND {same_state}
+            )
+        """
+
+        # Spells opened earlier today by a previous run of the same date
+        # never really existed; drop them instead of closing them.
+        cur.execute(f"""
+            DELETE FROM prem_injury.injury_history h
+            WHERE h.valid_from = %s AND {unmatched}
+        """, (scraped_on,))
+
+        # A previous run for the same date may have closed a spell the
+        # snapshot still contains; reopen it rather than starting a new one.
+        cur.execute(f"""
+            UPDATE prem_injury.injury_history h
+            SET valid_to = NULL
+            WHERE h.valid_to = %s
+              AND EXISTS (
+                  SELECT 1 FROM _staging_injury_snapshot s
+                  WHERE s.player_id = h.player_id AND s.team_id = h.team_id AND {same_state}
+              )
+              AND NOT EXISTS (
+                  SELECT 1 FROM prem_injury.injury_history o
+                  WHERE o.player_id = h.player_id AND o.team_id = h.team_id AND o.valid_to IS NULL
+              )
+        """, (scraped_on,))
+
+        cur.execute(f"""
+            UPDATE prem_injury.injury_history h
+            SET valid_to = %s
+            WHERE {unmatched}
+        """, (scraped_on,))
+        closed = cur.rowcount
+
+        cols = ", ".join(SNAPSHOT_COLUMNS)
+        cur.execute(f"""
+            INSERT INTO prem_injury.injury_history ({cols}, valid_from)
+            SELECT {", ".join("s." + c for c in SNAPSHOT_COLUMNS)}, %s
+            FROM _staging_injury_snapshot s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM prem_injury.injury_history h
+                WHERE h.valid_to IS NULL
+                  AND h.player_id = s.player_id AND h.team_id = s.team_id AND {same_state}
+            )
+        """, (scraped_on,))
+        opened = cur.rowcount
+
+    conn.commit()
+    counts = {"opened": opened, "closed": closed, "unchanged": total - opened}
+    print(f"Injury history for {scraped_on}: {opened} opened, {closed} closed, {counts['unchanged']} unchanged.")
+    return counts
+
+
+def injuries_as_of(cur, as_of) -> list[dict]:
+    """The injury list in effect on a given date (e.g. a match date)."""
+    cur.execute("""
+        SELECT player_id, team_id, reason, detail, potential_return, condition, status, valid_from, valid_to
+        FROM prem_injury.injuries_as_of(%s)
+        ORDER BY team_id, player_id
+    """, (as_of,))
+    columns = [d[0] for d in cur.description]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
@@ -0,0 +1,76 @@
+import hashlib
+import json
+
+from injury_etl import metrics
+from injury_etl.load import bulk_upsert
+from injury_etl.records import is_record
+
+# Natural key of each transformed row set, matching the ON CONFLICT targets
+TABLE_KEYS = {
+    "matches": ("match_id",),
+    "player_details": ("understat_id",),
+    "player_stats": ("understat_id", "team_id", "league", "season"),
+    "injuries": ("player_id", "team_id"),
+}
+
+
+def row_key(table, row) -> str:
+    return "|".join(str(row[k]) for k in TABLE_KEYS[table])
+
+
+def row_hash(row) -> str:
+    """Stable hash of a transformed row, independent of key order and of whether it is a dict or a record."""
+    if is_record(row):
+        row = row.as_dict()
+    payload = json.dumps(row, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def load_row_hashes(cur, table) -> dict:
+    cur.execute(
+        "SELECT row_key, row_hash FROM prem_injury.row_hashes WHERE table_name = %s",
+        (table,)
+    )
+    return dict(cur.fetchall())
+
+
+def filter_changed(cur, table, rows):
+    """
+    Drops rows whose hash matches the one recorded by the last successful load.
+
+    :return: (rows to load, pending {row_key: row_hash}, counts dict with
+              "new", "changed" and "unchanged")
+    """
+    previous = load_row_hashes(cur, table)
+    changed_rows, pending = [], {}
+    counts = {"new": 0, "changed": 0, "unchanged": 0}
+
+    for row in rows:
+        key, digest = row_key(table, row), row_hash(row)
+        old = previous.get(key)
+        if old == digest:
+            counts["unchanged"] += 1
+            continue
+        counts["new" if old is None else "changed"] += 1
+        changed_rows.append(row)
+        pending[key] = digest
+
+    return changed_rows, pending, counts
+
+
+def record_row_hashes(cur, table, pending):
+    """
+    Stores the hashes of rows that were just loaded. Run it in the same
+    transaction as the load so a failed load never marks rows as current.
+    """
+    if not pending:
+        return
+    # Own stage so hash rows are not counted as loaded data rows
+    with metrics.stage("load.row_hashes", table=table):
+        bulk_upsert(
+            cur, "row_hashes",
+            ["table_name", "row_key", "row_hash"],
+            ((table, key, digest) for key, digest in pending.items()),
+            conflict=["table_name", "row_key"],
+            update=["row_hash"],
+        )
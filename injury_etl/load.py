@@ -1,3 +1,14 @@
+import io
+
+from injury_etl import metrics
+from injury_etl.extract import DEFAULT_LEAGUE, DEFAULT_SEASON
+from injury_etl.records import InjuryRecord, MatchRecord, PlayerRecord, PlayerStatsRecord, as_records, is_record
+
+from injury_etl.analytics import create_analytics_schema
+from injury_etl.checkpoints import create_checkpoint_schema
+from injury_etl.history import create_history_schema
+from injury_etl.quality import create_quality_schema
+from injury_etl.reference import create_reference_schema, seed_reference_data
 
 def create_injury_schema(conn):
     with conn.cursor() as cur:
@@ -31,7 +42,8 @@ def create_injury_schema(conn):
                 understat_id    INTEGER UNIQUE NOT NULL,
                 name            TEXT NOT NULL,
                 position        TEXT,
-                team_id         INTEGER NOT NULL REFERENCES prem_injury.teams(id)
+                team_id         INTEGER NOT NULL REFERENCES prem_injury.teams(id),
+                season          TEXT
             );
         """)
 
@@ -40,16 +52,37 @@ def create_injury_schema(conn):
                 id              SERIAL PRIMARY KEY,
                 understat_id    INTEGER NOT NULL REFERENCES prem_injury.player_details(understat_id),
                 team_id         INTEGER NOT NULL REFERENCES prem_injury.teams(id),
+                league          TEXT NOT NULL,
+                season          TEXT NOT NULL,
                 games           INTEGER,
                 minutes         INTEGER,
                 goals           INTEGER,
                 assists         INTEGER,
                 xG              REAL,
                 xA              REAL,
-                CONSTRAINT player_stats_unique UNIQUE (understat_id, team_id)
+                CONSTRAINT player_stats_unique UNIQUE (understat_id, team_id, league, season)
 
             );
 """)
+
+        # Before version 8 player stats were kept once per player and team, so
+        # every season loaded overwrote the last. Those rows are taken to be the
+        # daily DAG's season; a backfill must be rerun under a new checkpoint.
+        cur.execute("""
+            ALTER TABLE prem_injury.player_details
+                ADD COLUMN IF NOT EXISTS season TEXT;
+            ALTER TABLE prem_injury.player_stats
+                ADD COLUMN IF NOT EXISTS league TEXT,
+                ADD COLUMN IF NOT EXISTS season TEXT;
+            UPDATE prem_injury.player_stats
+            SET league = %(league)s, season = %(season)s
+            WHERE league IS NULL OR season IS NULL;
+            ALTER TABLE prem_injury.player_stats
+                ALTER COLUMN league SET NOT NULL,
+                ALTER COLUMN season SET NOT NULL,
+                DROP CONSTRAINT IF EXISTS player_stats_unique,
+                ADD CONSTRAINT player_stats_unique UNIQUE (understat_id, team_id, league, season);
+""", {"league": DEFAULT_LEAGUE, "season": DEFAULT_SEASON})
         
         cur.execute("""
             CREATE TABLE IF NOT EXISTS prem_injury.injuries (
@@ -67,34 +100,129 @@ def create_injury_schema(conn):
 
 """)
 
+        # Per-match detail from the Understat match pages
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS prem_injury.match_appearances (
+                id              SERIAL PRIMARY KEY,
+                match_id        INTEGER NOT NULL REFERENCES prem_injury.matches(id) ON DELETE CASCADE,
+                understat_id    INTEGER NOT NULL,
+                team_id         INTEGER NOT NULL REFERENCES prem_injury.teams(id),
+                position        TEXT,
+                started         BOOLEAN,
+                minutes         INTEGER,
+                goals           INTEGER,
+                own_goals       INTEGER,
+                assists         INTEGER,
+                shots           INTEGER,
+                key_passes      INTEGER,
+                yellow_cards    INTEGER,
+                red_cards       INTEGER,
+                xg              REAL,
+                xa              REAL,
+                xgchain         REAL,
+                xgbuildup       REAL,
+                CONSTRAINT match_appearances_unique UNIQUE (match_id, understat_id)
+            );
+            CREATE INDEX IF NOT EXISTS match_appearances_player_idx
+                ON prem_injury.match_appearances (understat_id, match_id);
+""")
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS prem_injury.shots (
+                id              BIGINT PRIMARY KEY,
+                match_id        INTEGER NOT NULL REFERENCES prem_injury.matches(id) ON DELETE CASCADE,
+                understat_id    INTEGER NOT NULL,
+                team_id         INTEGER NOT NULL REFERENCES prem_injury.teams(id),
+                minute          INTEGER,
+                result          TEXT,
+                x               REAL,
+                y               REAL,
+                xg              REAL,
+                situation       TEXT,
+                shot_type       TEXT,
+                last_action     TEXT,
+                assisted_by     TEXT
+            );
+            CREATE INDEX IF NOT EXISTS shots_match_idx ON prem_injury.shots (match_id);
+""")
+
+        # Hash of every row as of the last successful load, per table
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS prem_injury.row_hashes (
+                table_name  TEXT NOT NULL,
+                row_key     TEXT NOT NULL,
+                row_hash    TEXT NOT NULL,
+                PRIMARY KEY (table_name, row_key)
+            );
+""")
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS prem_injury.schema_version (
+                id          BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+                version     INTEGER NOT NULL,
+                migrated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+""")
+
+# Bump whenever create_injury_schema changes so existing databases re-run it.
+SCHEMA_VERSION = 11
+
+_schema_ready = set()
+
+
+def _schema_version(cur):
+    cur.execute("SELECT to_regclass('prem_injury.schema_version') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        return None
+    cur.execute("SELECT version FROM prem_injury.schema_version")
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def ensure_injury_schema(conn):
+    """
+    Runs create_injury_schema only when the database is not already at
+    SCHEMA_VERSION. Once a database has been checked in this process the
+    check itself is skipped.
+
+    Tasks that start together (the matches and players transforms) may both
+    find an old version. Concurrent DDL can fail with unique violations on
+    pg_type, "tuple concurrently updated" or deadlocks, so the migration runs
+    under a transaction-level advisory lock and the version is read again
+    once the lock is held.
+    """
+    dsn = conn.dsn
+    if dsn in _schema_ready:
+        return
+
+    with conn.cursor() as cur:
+        version = _schema_version(cur)
+        if version != SCHEMA_VERSION:
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('prem_injury.schema_version'))")
+            # Another process may have migrated while this one waited
+            version = _schema_version(cur)
+
+        if version != SCHEMA_VERSION:
+            create_injury_schema(conn)
+            create_reference_schema(conn)
+            create_history_schema(conn)
+            create_analytics_schema(conn)
+            create_checkpoint_schema(conn)
+            create_quality_schema(conn)
+            cur.execute("""
+                INSERT INTO prem_injury.schema_version (id, version) VALUES (TRUE, %s)
+                ON CONFLICT (id) DO UPDATE
+                SET version = EXCLUDED.version,
+                    migrated_at = now();
+            """, (SCHEMA_VERSION,))
+            print(f"Migrated prem_injury schema to version {SCHEMA_VERSION}.")
+
+    conn.commit()
+    _schema_ready.add(dsn)
+
 def load_teams(cur):
-    cur.execute(
-        """
-INSERT INTO prem_injury.teams (id, name) VALUES
-(1,  'Arsenal'),
-(2,  'Aston Villa'),
-(3,  'Bournemouth'),
-(4,  'Brentford'),
-(5,  'Brighton & Hove Albion'),
-(6,  'Chelsea'),
-(7,  'Crystal Palace'),
-(8,  'Everton'),
-(9,  'Fulham'),
-(10, 'Ipswich Town'),
-(11, 'Leicester City'),
-(12, 'Liverpool'),
-(13, 'Manchester City'),
-(14, 'Manchester United'),
-(15, 'Newcastle United'),
-(16, 'Nottingham Forest'),
-(17, 'Southampton'),
-(18, 'Tottenham Hotspur'),
-(19, 'West Ham United'),
-(20, 'Wolverhampton Wanderers')
-ON CONFLICT (id)
-DO UPDATE SET name = EXCLUDED.name;
-"""
-    )
+    """Seeds teams, aliases and season memberships; a no-op once seeded."""
+    seed_reference_data(cur)
 
 def load_injuries_data(dbconn, injury_rows):
     with dbconn.cursor() as cur:
@@ -142,14 +270,20 @@ def insert_matches(cur, match_data: list):
 def insert_player_details(cur, players: list[dict]):
     for player in players:
         cur.execute("""
-            INSERT INTO prem_injury.player_details (understat_id, name, position, team_id)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (understat_id) DO NOTHING;
+            INSERT INTO prem_injury.player_details AS p (understat_id, name, position, team_id, season)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (understat_id) DO UPDATE
+            SET name     = EXCLUDED.name,
+                position = EXCLUDED.position,
+                team_id  = EXCLUDED.team_id,
+                season   = EXCLUDED.season
+            WHERE p.season IS NULL OR EXCLUDED.season >= p.season;
         """, (
             player["understat_id"],
             player["name"],
             player["position"],
-            player["team_id"]
+            player["team_id"],
+            player["season"]
         ))
     print(f" Inserted {len(players)} players.")
 
@@ -157,11 +291,11 @@ def insert_player_stats(cur, player_stats: list):
     for stats in player_stats:
         cur.execute("""
             INSERT INTO prem_injury.player_stats (
-                understat_id, team_id, games, minutes, goals, assists,
+                understat_id, team_id, league, season, games, minutes, goals, assists,
                 xG, xA
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (understat_id, team_id) DO UPDATE
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (understat_id, team_id, league, season) DO UPDATE
             SET games   = EXCLUDED.games,
                 minutes = EXCLUDED.minutes,
                 goals   = EXCLUDED.goals,
@@ -171,12 +305,201 @@ def insert_player_stats(cur, player_stats: list):
         """, (
             stats["understat_id"],
             stats["team_id"],
+            stats["league"],
+            stats["season"],
             stats["games"],
             stats["minutes"],
             stats["goals"],
             stats["assists"],
-            stats["xG"],
-            stats["xA"],
+            stats["xg"],
+            stats["xa"],
         ))
         
     print(f"Inserted {len(player_stats)} player stat rows.")
+
+
+
+# --- Bulk load path -------------------------------------------------------
+# Each batch is streamed into a temporary staging table with COPY and merged
+# into the target table with one INSERT ... SELECT ... ON CONFLICT, so a load
+# costs a handful of round trips instead of one per row.
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    return (str(value)
+            .replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r"))
+
+
+def _dedupe(rows, key, keep="last"):
+    # ON CONFLICT DO UPDATE refuses to touch the same row twice in one
+    # statement, so collapse duplicate keys the way the per-row path would:
+    # last write wins for DO UPDATE, first write wins for DO NOTHING.
+    seen = {}
+    for row in rows:
+        k = tuple(getattr(row, c) for c in key) if is_record(row) else tuple(row[c] for c in key)
+        if keep == "last" or k not in seen:
+            seen[k] = row
+    return list(seen.values())
+
+
+def stage_rows(cur, staging, table, columns, rows) -> int:
+    """
+    COPYs rows into a temp table shaped like the given columns of
+    prem_injury.<table>, dropped at commit.
+
+    :return: number of rows staged
+    """
+    cols = ", ".join(columns)
+
+    buf = io.StringIO()
+    total = 0
+    for row in rows:
+        buf.write("\t".join(_copy_value(v) for v in row))
+        buf.write("\n")
+        total += 1
+    buf.seek(0)
+
+    cur.execute(f"DROP TABLE IF EXISTS {staging}")
+    cur.execute(f"""
+        CREATE TEMP TABLE {staging} ON COMMIT DROP AS
+        SELECT {cols} FROM prem_injury.{table} WITH NO DATA
+    """)
+    cur.copy_expert(f"COPY {staging} ({cols}) FROM STDIN", buf)
+    return total
+
+
+def bulk_upsert(cur, table, columns, rows, conflict, update=None, where=None):
+    """
+    Streams rows into a staging copy of prem_injury.<table> and upserts them.
+
+    :param cur: psycopg2 cursor
+    :param table: target table name inside the prem_injury schema
+    :param columns: target column names, in the order of each row tuple
+    :param rows: iterable of tuples
+    :param conflict: conflict target columns
+    :param update: columns to overwrite on conflict; None means DO NOTHING
+    :param where: optional condition an existing row (aliased "t") must meet
+        to be updated, e.g. "EXCLUDED.season >= t.season"
+    :return: dict {"inserted": n, "updated": n, "skipped": n}
+    """
+    staging = f"_staging_{table}"
+    cols = ", ".join(columns)
+    total = stage_rows(cur, staging, table, columns, rows)
+
+    if update:
+        action = "DO UPDATE SET " + ", ".join(f"{c} = EXCLUDED.{c}" for c in update)
+        if where:
+            action += f" WHERE {where}"
+    else:
+        action = "DO NOTHING"
+
+    # xmax is 0 for freshly inserted tuples and non-zero for updated ones.
+    cur.execute(f"""
+        INSERT INTO prem_injury.{table} AS t ({cols})
+        SELECT {cols} FROM {staging}
+        ON CONFLICT ({", ".join(conflict)}) {action}
+        RETURNING (xmax = 0) AS inserted
+    """)
+    flags = [r[0] for r in cur.fetchall()]
+    inserted = sum(1 for f in flags if f)
+    updated = len(flags) - inserted
+
+    metrics.count("rows_in", total)
+    metrics.count("rows_out", len(flags))
+    return {"inserted": inserted, "updated": updated, "skipped": total - len(flags)}
+
+
+def bulk_insert_matches(cur, match_data: list):
+    match_data = _dedupe(as_records(match_data, MatchRecord), ("match_id",), keep="first")
+    counts = bulk_upsert(
+        cur, "matches",
+        ["id", "date", "home_team_id", "away_team_id", "result", "xg_home", "xg_away"],
+        match_data,
+        conflict=["id"],
+    )
+    print(f"Inserted {counts['inserted']} matches, skipped {counts['skipped']}.")
+    return counts
+
+
+def bulk_insert_player_details(cur, players: list[dict]):
+    players = _dedupe(as_records(players, PlayerRecord), ("understat_id",))
+    # Seasons may load in any order; a player's team and details come from
+    # the latest season loaded
+    counts = bulk_upsert(
+        cur, "player_details",
+        ["understat_id", "name", "position", "team_id", "season"],
+        players,
+        conflict=["understat_id"],
+        update=["name", "position", "team_id", "season"],
+        where="t.season IS NULL OR EXCLUDED.season >= t.season",
+    )
+    print(f"Inserted {counts['inserted']}, updated {counts['updated']} players, skipped {counts['skipped']}.")
+    return counts
+
+
+def bulk_insert_player_stats(cur, player_stats: list):
+    key = ("understat_id", "team_id", "league", "season")
+    player_stats = _dedupe(as_records(player_stats, PlayerStatsRecord), key)
+    counts = bulk_upsert(
+        cur, "player_stats",
+        ["understat_id", "team_id", "league", "season", "games", "minutes", "goals", "assists", "xG", "xA"],
+        # The table has no columns for the rest of the record
+        (s[:10] for s in player_stats),
+        conflict=list(key),
+        update=["games", "minutes", "goals", "assists", "xG", "xA"],
+    )
+    print(f"Inserted {counts['inserted']}, updated {counts['updated']} player stat rows.")
+    return counts
+
+
+def bulk_load_injuries_data(dbconn, injury_rows):
+    injury_rows = _dedupe(as_records(injury_rows, InjuryRecord), ("player_id", "team_id"))
+    with dbconn.cursor() as cur:
+        counts = bulk_upsert(
+            cur, "injuries",
+            ["player_id", "team_id", "reason", "detail", "potential_return", "condition", "status"],
+            injury_rows,
+            conflict=["player_id", "team_id"],
+            update=["reason", "detail", "potential_return", "condition", "status"],
+        )
+
+    dbconn.commit()
+    print(f"Inserted {counts['inserted']}, updated {counts['updated']} injuries.")
+    return counts
+
+
+APPEARANCE_COLUMNS = ["match_id", "understat_id", "team_id", "position", "started", "minutes", "goals",
+                      "own_goals", "assists", "shots", "key_passes", "yellow_cards", "red_cards",
+                      "xg", "xa", "xgchain", "xgbuildup"]
+
+
+def bulk_insert_match_appearances(cur, appearances: list[dict]):
+    appearances = _dedupe(appearances, ("match_id", "understat_id"))
+    counts = bulk_upsert(
+        cur, "match_appearances", APPEARANCE_COLUMNS,
+        (tuple(a[c] for c in APPEARANCE_COLUMNS) for a in appearances),
+        conflict=["match_id", "understat_id"],
+        update=APPEARANCE_COLUMNS[2:],
+    )
+    print(f"Inserted {counts['inserted']}, updated {counts['updated']} match appearances.")
+    return counts
+
+
+SHOT_COLUMNS = ["match_id", "understat_id", "team_id", "minute", "result", "x", "y", "xg",
+                "situation", "shot_type", "last_action", "assisted_by"]
+
+
+def bulk_insert_shots(cur, shots: list[dict]):
+    shots = _dedupe(shots, ("shot_id",))
+    counts = bulk_upsert(
+        cur, "shots", ["id", *SHOT_COLUMNS],
+        ((s["shot_id"], *(s[c] for c in SHOT_COLUMNS)) for s in shots),
+        conflict=["id"],
+        update=SHOT_COLUMNS,
+    )
+    print(f"Inserted {counts['inserted']}, updated {counts['updated']} shots.")
+    return counts
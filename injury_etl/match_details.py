@@ -0,0 +1,76 @@
+"""
+Per-match player appearances and shots from the Understat match pages.
+
+Only stored matches without appearances are fetched, and results are
+committed in batches as pages arrive, so an interrupted run resumes where it
+stopped and a rerun on an up-to-date database fetches nothing.
+"""
+from injury_etl.extract import extract_understat_matches
+from injury_etl.load import bulk_insert_match_appearances, bulk_insert_shots
+from injury_etl.transform import transform_match_details
+
+
+def pending_matches(cur, match_ids=None) -> list[dict]:
+    """
+    Stored matches with no appearances yet, oldest first.
+
+    :param match_ids: optionally restrict to these matches
+    """
+    cur.execute("""
+        SELECT m.id, m.home_team_id, m.away_team_id
+        FROM prem_injury.matches m
+        WHERE NOT EXISTS (SELECT 1 FROM prem_injury.match_appearances a WHERE a.match_id = m.id)
+          AND (%(ids)s::int[] IS NULL OR m.id = ANY(%(ids)s::int[]))
+        ORDER BY m.date, m.id
+    """, {"ids": list(match_ids) if match_ids is not None else None})
+    return [
+        {"match_id": match_id, "home_team_id": home, "away_team_id": away}
+        for match_id, home, away in cur.fetchall()
+    ]
+
+
+def ingest_match_details(conn, match_ids=None, max_workers=8, batch_size=50) -> dict:
+    """
+    Fetches, transforms and bulk loads the match pages of every pending match.
+
+    Pages that fail after retries are skipped and raised together at the end;
+    everything that succeeded is already committed by then.
+
+    :return: dict {"matches": n, "appearances": n, "shots": n}
+    """
+    with conn.cursor() as cur:
+        pending = {m["match_id"]: m for m in pending_matches(cur, match_ids)}
+    print(f"{len(pending)} matches need per-match detail.")
+
+    counts = {"matches": 0, "appearances": 0, "shots": 0}
+    batch = []
+
+    def flush():
+        appearances, shots = [], []
+        for rows, match_shots in batch:
+            appearances.extend(rows)
+            shots.extend(match_shots)
+        with conn.cursor() as cur:
+            bulk_insert_match_appearances(cur, appearances)
+            bulk_insert_shots(cur, shots)
+        conn.commit()
+        counts["matches"] += len(batch)
+        counts["appearances"] += len(appearances)
+        counts["shots"] += len(shots)
+        batch.clear()
+
+    failure = None
+    try:
+        for match_id, details in extract_understat_matches(list(pending), max_workers):
+            batch.append(transform_match_details(pending[match_id], details))
+            if len(batch) == batch_size:
+                flush()
+    except RuntimeError as e:
+        # Raised once every other page has been yielded
+        failure = e
+
+    if batch:
+        flush()
+    if failure:
+        raise failure
+    return counts
@@ -0,0 +1,213 @@
+"""
+Per-stage instrumentation for the ETL.
+
+    with stage("transform.matches") as s:
+        ...
+        s.count("rows_in", len(raw))
+
+Code running inside a stage (including on worker threads started with
+copy_context) can call metrics.count() without holding the stage object;
+fetch() counts bytes_fetched and the counting cursor counts db_round_trips
+this way. Each finished stage is logged as one JSON line on the
+"injury_etl.metrics" logger, sent to Airflow's Stats client when running
+under Airflow, and accumulated for write_textfile(), which writes the
+Prometheus textfile-collector format.
+"""
+import contextvars
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2.extensions
+
+logger = logging.getLogger("injury_etl.metrics")
+
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+COUNTERS = ("bytes_fetched", "rows_in", "rows_out", "rows_rejected", "db_round_trips")
+
+_current = contextvars.ContextVar("injury_etl_stage", default=None)
+_registry_lock = threading.Lock()
+# {(stage, counter): total}
+_counters = {}
+# {stage: [bucket counts..., +Inf count, sum]}
+_durations = {}
+# Stages open in any thread, which share the process's peak RSS
+_open_stages = set()
+_open_lock = threading.Lock()
+
+
+class Stage:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.peak_rss_kb = 0
+        self._lock = threading.Lock()
+
+    def count(self, key, n=1):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + n
+
+
+def count(key, n=1):
+    """Adds n to a counter of the innermost active stage, if there is one."""
+    current = _current.get()
+    if current is not None:
+        current.count(key, n)
+
+
+def _high_water_kb():
+    # VmHWM, the peak RSS since start or since the last reset; Linux only
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and never resets
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _reset_high_water():
+    # Writing 5 to clear_refs resets VmHWM to the current RSS
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _credit_peak():
+    # Every open stage was running while the peak so far was reached
+    peak = _high_water_kb()
+    for s in _open_stages:
+        s.peak_rss_kb = max(s.peak_rss_kb, peak)
+
+
+@contextmanager
+def stage(name, **labels):
+    """
+    Times a block and collects its counters. Records wall time, CPU time and
+    the peak RSS while the block ran.
+
+    The peak comes from VmHWM, which is reset as each stage starts once the
+    peak so far has been credited to the stages already open. Where
+    /proc/self/clear_refs cannot be written it is the process's lifetime peak.
+    """
+    current = Stage(name, labels)
+    token = _current.set(current)
+    with _open_lock:
+        _credit_peak()
+        _open_stages.add(current)
+        _reset_high_water()
+    wall, cpu = time.perf_counter(), time.process_time()
+    status = "ok"
+    try:
+        yield current
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _current.reset(token)
+        with _open_lock:
+            _credit_peak()
+            _open_stages.discard(current)
+        record = {
+            "stage": name,
+            **labels,
+            "status": status,
+            "wall_seconds": round(time.perf_counter() - wall, 4),
+            "cpu_seconds": round(time.process_time() - cpu, 4),
+            "peak_rss_mb": round(current.peak_rss_kb / 1024, 1),
+            **current.counts,
+        }
+        _record(record)
+
+
+def _record(record):
+    name = record["stage"]
+    with _registry_lock:
+        for key in COUNTERS:
+            _counters[(name, key)] = _counters.get((name, key), 0) + record[key]
+        hist = _durations.setdefault(name, [0] * (len(DURATION_BUCKETS) + 2))
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if record["wall_seconds"] <= bound:
+                hist[i] += 1
+        hist[-2] += 1
+        hist[-1] += record["wall_seconds"]
+
+    logger.info(json.dumps(record))
+    _send_to_airflow(record)
+
+
+def _send_to_airflow(record):
+    try:
+        from airflow.stats import Stats
+    except ImportError:
+        return
+
+    prefix = f"injury_etl.{record['stage']}"
+    Stats.timing(f"{prefix}.wall_seconds", record["wall_seconds"] * 1000)
+    Stats.gauge(f"{prefix}.cpu_seconds", record["cpu_seconds"])
+    Stats.gauge(f"{prefix}.peak_rss_mb", record["peak_rss_mb"])
+    for key in COUNTERS:
+        if record[key]:
+            Stats.incr(f"{prefix}.{key}", record[key])
+
+
+def write_textfile(path=None, job="injury_etl"):
+    """
+    Writes every stage recorded in this process in the Prometheus textfile
+    collector format. Defaults to $INJURY_ETL_METRICS_DIR/<job>.prom.
+    """
+    if path is None:
+        directory = os.environ.get("INJURY_ETL_METRICS_DIR")
+        if not directory:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{job}.prom")
+
+    lines = []
+    with _registry_lock:
+        for key in COUNTERS:
+            lines.append(f"# TYPE injury_etl_{key}_total counter")
+            for (name, counter), total in sorted(_counters.items()):
+                if counter == key:
+                    lines.append(f'injury_etl_{key}_total{{job="{job}",stage="{name}"}} {total}')
+
+        lines.append("# TYPE injury_etl_stage_duration_seconds histogram")
+        for name, hist in sorted(_durations.items()):
+            base = f'job="{job}",stage="{name}"'
+            for bound, n in zip(DURATION_BUCKETS, hist):
+                lines.append(f'injury_etl_stage_duration_seconds_bucket{{{base},le="{bound}"}} {n}')
+            lines.append(f'injury_etl_stage_duration_seconds_bucket{{{base},le="+Inf"}} {hist[-2]}')
+            lines.append(f"injury_etl_stage_duration_seconds_count{{{base}}} {hist[-2]}")
+            lines.append(f"injury_etl_stage_duration_seconds_sum{{{base}}} {hist[-1]:.4f}")
+
+    # Write-then-rename so the collector never reads a half-written file
+    with open(path + ".tmp", "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(path + ".tmp", path)
+    return path
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    """Cursor that counts each statement sent to the server as a round trip."""
+
+    def execute(self, query, vars=None):
+        count("db_round_trips")
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        vars_list = list(vars_list)
+        count("db_round_trips", len(vars_list))
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        count("db_round_trips")
+        return super().copy_expert(sql, file, size)
@@ -0,0 +1,129 @@
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+# Fuzzy matches below this similarity are treated as unknown players
+FUZZY_THRESHOLD = 0.75
+# Trigram candidates scored per lookup, so a lookup never scans a whole squad list
+FUZZY_CANDIDATES = 5
+
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+# Letters NFKD does not decompose into a base letter plus accent
+_FOLD_EXTRA = str.maketrans({
+    "ø": "o", "æ": "ae", "œ": "oe", "ß": "ss", "đ": "d", "ł": "l", "ı": "i", "þ": "th", "ð": "d",
+})
+# Two fuzzy candidates closer than this are ambiguous and resolve to nothing
+FUZZY_MARGIN = 0.02
+
+
+def fold_name(name) -> str:
+    """Lowercases, strips accents and punctuation, and collapses whitespace."""
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower().translate(_FOLD_EXTRA)
+    text = text.replace("-", " ").replace("'", "")
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def sorted_tokens(folded) -> str:
+    return " ".join(sorted(folded.split()))
+
+
+def initial_surname(folded) -> str:
+    """'john smith' and 'j smith' both become 'j smith'."""
+    tokens = folded.split()
+    if len(tokens) < 2:
+        return folded
+    return f"{tokens[0][0]} {tokens[-1]}"
+
+
+def trigrams(folded) -> set:
+    padded = f"  {folded} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PlayerIndex:
+    """
+    Resolves an injury-table player name and team to a player_details id.
+
+    Lookups try, in order: the exact lowercased name; the accent-folded,
+    token-sorted name; the folded "initial surname" form; and finally a
+    fuzzy match among players of the same team, scored (trigram Dice
+    similarity) only against the few candidates sharing the most trigrams
+    with the query.
+    """
+
+    def __init__(self, rows, signature=None):
+        self.signature = signature
+        self.names = {}
+        self.gram_counts = {}
+        self.exact = {}
+        self.normalised = {}
+        self.initials = defaultdict(set)
+        self.grams = defaultdict(lambda: defaultdict(set))
+
+        for player_id, name, team_id in rows:
+            folded = fold_name(name)
+            self.names[player_id] = folded
+            self.exact[(name.lower(), team_id)] = player_id
+            self.normalised[(sorted_tokens(folded), team_id)] = player_id
+            self.initials[(initial_surname(folded), team_id)].add(player_id)
+            grams = trigrams(folded)
+            self.gram_counts[player_id] = len(grams)
+            for gram in grams:
+                self.grams[team_id][gram].add(player_id)
+
+        # defaultdicts with lambdas cannot be pickled
+        self.initials = dict(self.initials)
+        self.grams = {team_id: dict(index) for team_id, index in self.grams.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    def resolve(self, name, team_id):
+        """
+        :return: (player_id, confidence, method) or (None, 0.0, None)
+        """
+        player_id = self.exact.get(((name or "").lower(), team_id))
+        if player_id:
+            return player_id, 1.0, "exact"
+
+        folded = fold_name(name)
+        if not folded:
+            return None, 0.0, None
+
+        player_id = self.normalised.get((sorted_tokens(folded), team_id))
+        if player_id:
+            return player_id, 0.95, "normalised"
+
+        candidates = self.initials.get((initial_surname(folded), team_id), ())
+        if len(candidates) == 1:
+            return next(iter(candidates)), 0.9, "initials"
+
+        return self._fuzzy(folded, team_id)
+
+    def _fuzzy(self, folded, team_id):
+        team_grams = self.grams.get(team_id)
+        if not team_grams:
+            return None, 0.0, None
+
+        query_grams = trigrams(folded)
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(team_grams.get(gram, ()))
+
+        # Dice coefficient over trigram sets: 2|A ∩ B| / (|A| + |B|)
+        scored = [
+            (2 * count / (len(query_grams) + self.gram_counts[player_id]), player_id)
+            for player_id, count in shared.most_common(FUZZY_CANDIDATES)
+        ]
+        if not scored:
+            return None, 0.0, None
+
+        scored.sort(reverse=True)
+        best_score, best_id = scored[0]
+        if best_score < FUZZY_THRESHOLD:
+            return None, round(best_score, 3), None
+        if len(scored) > 1 and best_score - scored[1][0] < FUZZY_MARGIN:
+            return None, round(best_score, 3), None
+        return best_id, round(best_score, 3), "fuzzy"
+
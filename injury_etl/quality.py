@@ -0,0 +1,279 @@
+"""
+Data-quality gate between transform and load.
+
+Each table has declarative column rules (type, nullability, range, allowed
+values, and references to team and player ids from the cached reference
+data), checked a column at a time over the whole batch. Rows that fail a
+rule, and rows the transforms already had to drop (unknown teams or players,
+unparseable dates, malformed matches), are written with their reason to
+prem_injury.quarantine instead of vanishing into the log. A batch whose
+reject rate passes the threshold fails the run once its rejects are saved.
+"""
+import json
+import os
+
+from injury_etl import metrics
+from injury_etl.records import InjuryRecord, MatchRecord, PlayerRecord, PlayerStatsRecord, as_records, is_record
+
+# Share of a table's rows that may be rejected before the run fails.
+MAX_REJECT_RATE = float(os.environ.get("INJURY_ETL_MAX_REJECT_RATE", "0.1"))
+# Share that may be EXPECTED_REJECTS. Higher, since some happen every day,
+# but an empty roster or a broken resolver still fails the run.
+MAX_EXPECTED_REJECT_RATE = float(os.environ.get("INJURY_ETL_MAX_EXPECTED_REJECT_RATE", "0.5"))
+
+
+class QualityGateError(RuntimeError):
+    pass
+
+
+# Transform drops that happen in normal operation, by reason prefix. They are
+# quarantined like any other reject but are held to MAX_EXPECTED_REJECT_RATE
+# instead of MAX_REJECT_RATE: an injured player who has not played yet is not
+# in Understat's playersData.
+EXPECTED_REJECTS = ("unknown player:",)
+
+
+# {table: (record type, {column: rule})}. A rule may set:
+#   type      "int", "float", "str" or "date"
+#   null      True if the column may be empty
+#   min, max  inclusive bounds for numbers
+#   values    the allowed values
+#   ref       "teams" or "players": must be a known id
+TABLE_RULES = {
+    "matches": (MatchRecord, {
+        "match_id": {"type": "int", "min": 1},
+        "date": {"type": "date"},
+        "home_team_id": {"type": "int", "ref": "teams"},
+        "away_team_id": {"type": "int", "ref": "teams"},
+        "result": {"type": "str", "values": ("H", "A", "D")},
+        "xg_home": {"type": "float", "min": 0, "max": 15},
+        "xg_away": {"type": "float", "min": 0, "max": 15},
+    }),
+    "player_details": (PlayerRecord, {
+        "understat_id": {"type": "int", "min": 1},
+        "name": {"type": "str"},
+        "position": {"type": "str", "null": True},
+        "team_id": {"type": "int", "ref": "teams"},
+        "season": {"type": "str"},
+    }),
+    "player_stats": (PlayerStatsRecord, {
+        "understat_id": {"type": "int", "min": 1},
+        "team_id": {"type": "int", "ref": "teams"},
+        "league": {"type": "str"},
+        "season": {"type": "str"},
+        "games": {"type": "int", "min": 0, "max": 60},
+        "minutes": {"type": "int", "min": 0, "max": 60 * 130},
+        "goals": {"type": "int", "min": 0},
+        "assists": {"type": "int", "min": 0},
+        "xg": {"type": "float", "min": 0},
+        "xa": {"type": "float", "min": 0},
+        "npxg": {"type": "float", "min": 0, "null": True},
+        "xgchain": {"type": "float", "min": 0, "null": True},
+        "xgbuildup": {"type": "float", "min": 0, "null": True},
+    }),
+    "injuries": (InjuryRecord, {
+        "player_id": {"type": "int", "ref": "players"},
+        "team_id": {"type": "int", "ref": "teams"},
+        "reason": {"type": "str", "null": True},
+        "detail": {"type": "str", "null": True},
+        "potential_return": {"type": "date", "null": True},
+        "condition": {"type": "str", "null": True},
+        "status": {"type": "str", "null": True},
+    }),
+}
+
+QUARANTINE_COLUMNS = ["run_id", "table_name", "rule", "reason", "record"]
+
+
+def create_quality_schema(conn):
+    # A row is quarantined once per table, keyed on a hash of the record, so
+    # the same reject turning up in every daily run is not stored again;
+    # run_id and quarantined_at are those of the first run that hit it.
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS prem_injury.quarantine (
+                id              BIGSERIAL PRIMARY KEY,
+                run_id          TEXT,
+                table_name      TEXT NOT NULL,
+                rule            TEXT NOT NULL,
+                reason          TEXT NOT NULL,
+                record          JSONB NOT NULL,
+                record_hash     TEXT,
+                quarantined_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            CREATE INDEX IF NOT EXISTS quarantine_table_idx
+                ON prem_injury.quarantine (table_name, quarantined_at);
+
+            -- Before version 10 every run stored its rejects again; keep the first of each
+            ALTER TABLE prem_injury.quarantine ADD COLUMN IF NOT EXISTS record_hash TEXT;
+            UPDATE prem_injury.quarantine SET record_hash = md5(record::text) WHERE record_hash IS NULL;
+            DELETE FROM prem_injury.quarantine q
+            USING prem_injury.quarantine first
+            WHERE q.table_name = first.table_name
+              AND q.record_hash = first.record_hash
+              AND q.id > first.id;
+            CREATE UNIQUE INDEX IF NOT EXISTS quarantine_record_idx
+                ON prem_injury.quarantine (table_name, record_hash);
+        """)
+
+
+def reference_keys(reference) -> dict:
+    """The id sets rules with "ref" check against, from a ReferenceData snapshot."""
+    return {"teams": set(reference.team_names), "players": set(reference.players.names)}
+
+
+def _column_violations(values, column, rule, keys):
+    # Yields (rule name, boolean array of failing rows, reason) for one column
+    import numpy as np
+    import pandas as pd
+
+    objects = np.array(values, dtype=object)
+    missing = pd.isna(objects)
+    if not rule.get("null"):
+        yield "not_null", missing, f"missing {column}"
+
+    kind = rule.get("type")
+    if kind in ("int", "float"):
+        try:
+            # Fast path: every value is already a number (None becomes NaN)
+            numbers = objects.astype("float64")
+        except (TypeError, ValueError):
+            numbers = pd.to_numeric(pd.Series(objects), errors="coerce").to_numpy(dtype="float64")
+        finite = np.isfinite(numbers)
+        bad = ~missing & ~finite
+        if kind == "int":
+            bad |= finite & (numbers != np.round(numbers))
+        yield "type", bad, f"{column} is not a{'n integer' if kind == 'int' else ' number'}"
+        if "min" in rule:
+            yield "range", finite & (numbers < rule["min"]), f"{column} below {rule['min']}"
+        if "max" in rule:
+            yield "range", finite & (numbers > rule["max"]), f"{column} above {rule['max']}"
+    elif kind == "date":
+        # Dates arrive as date objects or as ISO strings from artifacts
+        parsed = pd.to_datetime(pd.Series(objects).astype(str), format="%Y-%m-%d", errors="coerce")
+        yield "type", ~missing & parsed.isna().to_numpy(), f"{column} is not a date"
+    elif kind == "str":
+        is_str = np.fromiter((type(v) is str for v in objects), dtype=bool, count=len(objects))
+        yield "type", ~missing & ~is_str, f"{column} is not text"
+
+    if "values" in rule:
+        allowed = pd.Series(objects).isin(rule["values"]).to_numpy()
+        yield "values", ~missing & ~allowed, f"{column} not one of {', '.join(rule['values'])}"
+    if "ref" in rule and keys is not None:
+        known = pd.Series(objects).isin(keys[rule["ref"]]).to_numpy()
+        yield "ref", ~missing & ~known, f"unknown {rule['ref'][:-1]} {column}"
+
+
+def validate(table, rows, keys=None):
+    """
+    Checks rows against TABLE_RULES[table], one column at a time.
+
+    :param rows: records or dicts for the table
+    :param keys: {"teams": ids, "players": ids} for "ref" rules, e.g. from
+        reference_keys(); "ref" rules are skipped without it
+    :return: (valid records in input order, [(record, rule, reason), ...]),
+        each rejected row reported once, for the first rule it fails
+    """
+    import numpy as np
+
+    record_type, rules = TABLE_RULES[table]
+    rows = as_records(rows, record_type)
+    if not rows:
+        return rows, []
+
+    columns = dict(zip(record_type._fields, zip(*rows)))
+    violations = [
+        violation
+        for column, rule in rules.items()
+        for violation in _column_violations(columns[column], column, rule, keys)
+    ]
+    if table == "matches":
+        violations.append(("consistency", np.equal(columns["home_team_id"], columns["away_team_id"]),
+                           "home and away team are the same"))
+
+    # Index into `violations` of the first rule each row fails, or -1
+    failed = np.full(len(rows), -1)
+    for i, (_, mask, _) in enumerate(violations):
+        failed[mask & (failed == -1)] = i
+
+    valid = [row for row, code in zip(rows, failed.tolist()) if code == -1]
+    rejects = [(rows[i], violations[failed[i]][0], violations[failed[i]][2]) for i in np.flatnonzero(failed >= 0)]
+    return valid, rejects
+
+
+def quarantine(cur, table, rejects, run_id=None) -> int:
+    """
+    Stages rejected rows with COPY and adds those not already quarantined
+    for the table to prem_injury.quarantine.
+
+    :param rejects: [(record, rule, reason), ...]; record may be a record,
+        a dict or the raw source row a transform could not use
+    :return: rows newly written
+    """
+    # load imports this module for its schema
+    from injury_etl.load import stage_rows
+
+    if not rejects:
+        return 0
+
+    def payloads():
+        for record, rule, reason in rejects:
+            if is_record(record):
+                record = record.as_dict()
+            yield run_id, table, rule, reason, json.dumps(record, default=str, ensure_ascii=False)
+
+    # The hash is taken over jsonb's own text form, which does not depend on
+    # key order, so it matches the one the migration gave older rows
+    cols = ", ".join(QUARANTINE_COLUMNS)
+    stage_rows(cur, "_staging_quarantine", "quarantine", QUARANTINE_COLUMNS, payloads())
+    cur.execute(f"""
+        INSERT INTO prem_injury.quarantine ({cols}, record_hash)
+        SELECT {cols}, md5(record::text) FROM _staging_quarantine
+        ON CONFLICT (table_name, record_hash) DO NOTHING
+    """)
+    return cur.rowcount
+
+
+def quality_gate(conn, table, rows, keys=None, upstream_rejects=(), run_id=None, max_reject_rate=None,
+                 max_expected_reject_rate=None):
+    """
+    Validates rows, commits every reject to the quarantine table, and raises
+    QualityGateError when rejects exceed max_reject_rate of all rows seen, or
+    EXPECTED_REJECTS exceed max_expected_reject_rate of them.
+
+    :param upstream_rejects: (source row, reason) pairs the transform already
+        dropped
+    :return: the valid records
+    """
+    max_reject_rate = MAX_REJECT_RATE if max_reject_rate is None else max_reject_rate
+    if max_expected_reject_rate is None:
+        max_expected_reject_rate = MAX_EXPECTED_REJECT_RATE
+
+    valid, rejects = validate(table, rows, keys)
+    upstream = [(record, "transform", reason) for record, reason in upstream_rejects]
+    expected = sum(reason.startswith(EXPECTED_REJECTS) for _, _, reason in upstream)
+    rejects = upstream + rejects
+
+    unexpected = len(rejects) - expected
+    total = len(valid) + len(rejects)
+    rate = unexpected / total if total else 0.0
+    expected_rate = expected / total if total else 0.0
+    metrics.count("rows_rejected", len(rejects))
+
+    if rejects:
+        with conn.cursor() as cur:
+            written = quarantine(cur, table, rejects, run_id)
+        conn.commit()
+        print(f"{table}: {len(rejects)} of {total} rows rejected, {written} new to the quarantine; "
+              f"{unexpected} unexpected ({rate:.1%}), {expected} expected ({expected_rate:.1%}).")
+
+    if rate > max_reject_rate:
+        raise QualityGateError(
+            f"{table}: {unexpected} of {total} rows rejected ({rate:.1%}), "
+            f"above the {max_reject_rate:.1%} limit; see prem_injury.quarantine for run {run_id}")
+    if expected_rate > max_expected_reject_rate:
+        raise QualityGateError(
+            f"{table}: {expected} of {total} rows dropped as {' / '.join(EXPECTED_REJECTS)} ({expected_rate:.1%}), "
+            f"above the {max_expected_reject_rate:.1%} limit; check the player roster and name resolver; "
+            f"see prem_injury.quarantine for run {run_id}")
+    return valid
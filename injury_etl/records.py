@@ -0,0 +1,66 @@
+"""
+Compact record types for transformed rows.
+
+Each record is a named tuple: the field names live once on the class, not on
+every row, and a row is exactly the tuple the bulk loaders COPY. Records still
+answer row["field"] and row.get("field"), so code written against the old
+dict rows keeps working, and as_dicts / as_records convert between the two.
+"""
+from collections import namedtuple
+
+
+class _RecordMixin:
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if isinstance(key, str) else default
+
+    def keys(self):
+        return self._fields
+
+    def as_dict(self) -> dict:
+        return dict(zip(self._fields, self))
+
+    @classmethod
+    def from_dict(cls, row):
+        # Fields the dict lacks become None; loaders only read their table's columns
+        return cls._make(row.get(f) for f in cls._fields)
+
+
+def _record(name, fields):
+    return type(name, (_RecordMixin, namedtuple(name, fields)), {"__slots__": ()})
+
+
+# Field order matches the column order of the bulk loaders
+MatchRecord = _record("MatchRecord", (
+    "match_id", "date", "home_team_id", "away_team_id", "result", "xg_home", "xg_away"))
+PlayerRecord = _record("PlayerRecord", ("understat_id", "name", "position", "team_id", "season"))
+PlayerStatsRecord = _record("PlayerStatsRecord", (
+    "understat_id", "team_id", "league", "season", "games", "minutes", "goals", "assists", "xg", "xa",
+    "npxg", "xgchain", "xgbuildup"))
+InjuryRecord = _record("InjuryRecord", (
+    "player_id", "team_id", "reason", "detail", "potential_return", "condition", "status"))
+
+RECORD_TYPES = {cls.__name__: cls for cls in (MatchRecord, PlayerRecord, PlayerStatsRecord, InjuryRecord)}
+
+
+def is_record(row) -> bool:
+    return isinstance(row, _RecordMixin)
+
+
+def as_records(rows, record_type) -> list:
+    """Rows as record_type, converting dicts and passing records through."""
+    return [row if isinstance(row, record_type) else record_type.from_dict(row) for row in rows]
+
+
+def as_dicts(rows) -> list[dict]:
+    """The list-of-dicts shape the transforms used to return."""
+    return [row.as_dict() if is_record(row) else row for row in rows]
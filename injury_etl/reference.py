@@ -0,0 +1,357 @@
+"""
+Reference data: teams, their aliases on each source, which clubs played which
+league season, and the player roster.
+
+Transforms look names up in one immutable ReferenceData snapshot instead of
+querying the database themselves. Snapshots are keyed by a version stamp in
+prem_injury.reference_version, which triggers bump in the same transaction
+as any change to the underlying tables, so the only query a caller pays
+while nothing has changed is reading that stamp. A snapshot is kept in
+process and its rows are written as JSON to the cache directory, so later
+tasks in other processes skip the queries too. JSON rather than pickle: the
+cache directory is shared, and loading a pickle from it would run whatever
+anyone with write access put there.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from types import MappingProxyType
+
+import psycopg2 as pg
+
+from injury_etl.cache import DEFAULT_CACHE_DIR
+from injury_etl.players import PlayerIndex
+
+# Bump whenever SEED_TEAMS, SEED_ALIASES or SEED_SEASONS change so existing
+# databases pick the new rows up.
+SEED_VERSION = 1
+
+# The 2024 clubs keep the ids they have always had; rows in matches,
+# player_details and injuries point at them.
+SEED_TEAMS = [
+    (1, "Arsenal"), (2, "Aston Villa"), (3, "Bournemouth"), (4, "Brentford"),
+    (5, "Brighton & Hove Albion"), (6, "Chelsea"), (7, "Crystal Palace"), (8, "Everton"),
+    (9, "Fulham"), (10, "Ipswich Town"), (11, "Leicester City"), (12, "Liverpool"),
+    (13, "Manchester City"), (14, "Manchester United"), (15, "Newcastle United"),
+    (16, "Nottingham Forest"), (17, "Southampton"), (18, "Tottenham Hotspur"),
+    (19, "West Ham United"), (20, "Wolverhampton Wanderers"),
+]
+
+# Clubs from other Premier League seasons; they get the next free ids.
+SEED_EXTRA_TEAMS = [
+    "Burnley", "Cardiff City", "Huddersfield Town", "Hull City", "Leeds United", "Luton Town",
+    "Middlesbrough", "Norwich City", "Sheffield United", "Stoke City", "Sunderland",
+    "Swansea City", "Watford", "West Bromwich Albion",
+]
+
+# (alias, source, canonical team name). Canonical names need no alias.
+SEED_ALIASES = [
+    # Understat team titles
+    ("Brighton", "understat", "Brighton & Hove Albion"),
+    ("Cardiff", "understat", "Cardiff City"),
+    ("Huddersfield", "understat", "Huddersfield Town"),
+    ("Hull", "understat", "Hull City"),
+    ("Ipswich", "understat", "Ipswich Town"),
+    ("Leeds", "understat", "Leeds United"),
+    ("Leicester", "understat", "Leicester City"),
+    ("Luton", "understat", "Luton Town"),
+    ("Norwich", "understat", "Norwich City"),
+    ("Stoke", "understat", "Stoke City"),
+    ("Swansea", "understat", "Swansea City"),
+    ("Tottenham", "understat", "Tottenham Hotspur"),
+    ("West Ham", "understat", "West Ham United"),
+    # premierinjuries.com team headings
+    ("AFC Bournemouth", "premierinjuries", "Bournemouth"),
+    ("Brighton and Hove Albion", "premierinjuries", "Brighton & Hove Albion"),
+    ("Man City", "premierinjuries", "Manchester City"),
+    ("Man Utd", "premierinjuries", "Manchester United"),
+    ("Newcastle", "premierinjuries", "Newcastle United"),
+    ("Nott'm Forest", "premierinjuries", "Nottingham Forest"),
+    ("Spurs", "premierinjuries", "Tottenham Hotspur"),
+    ("West Brom", "premierinjuries", "West Bromwich Albion"),
+    ("Wolves", "premierinjuries", "Wolverhampton Wanderers"),
+    # The same headings as they come back through ScraperAPI, with the
+    # ampersand left escaped
+    ("Brighton &amp; Hove Albion", "scraperapi", "Brighton & Hove Albion"),
+    ("Brighton &amp; Hove", "scraperapi", "Brighton & Hove Albion"),
+]
+
+SEED_SEASONS = {
+    ("EPL", "2024"): [name for _, name in SEED_TEAMS],
+}
+
+# Tables whose changes bump the reference version
+VERSIONED_TABLES = ("teams", "team_aliases", "team_seasons", "player_details")
+
+
+def create_reference_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS prem_injury.team_aliases (
+                alias           TEXT PRIMARY KEY,
+                team_id         INTEGER NOT NULL REFERENCES prem_injury.teams(id) ON DELETE CASCADE,
+                source          TEXT NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS prem_injury.team_seasons (
+                league          TEXT NOT NULL,
+                season          TEXT NOT NULL,
+                team_id         INTEGER NOT NULL REFERENCES prem_injury.teams(id) ON DELETE CASCADE,
+                PRIMARY KEY (league, season, team_id)
+            );
+
+            -- token changes whenever the schema is recreated, so a cached
+            -- snapshot of a dropped database never matches a new one
+            CREATE TABLE IF NOT EXISTS prem_injury.reference_version (
+                id              BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+                token           TEXT NOT NULL DEFAULT md5(random()::text || clock_timestamp()::text),
+                version         BIGINT NOT NULL DEFAULT 1,
+                seed_version    INTEGER NOT NULL DEFAULT 0,
+                updated_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            INSERT INTO prem_injury.reference_version (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
+
+            -- Statement-level, so a bulk load bumps the version once, and only
+            -- when it actually inserted, updated or deleted rows
+            CREATE OR REPLACE FUNCTION prem_injury.bump_reference_version() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    PERFORM 1 FROM old_rows LIMIT 1;
+                ELSE
+                    PERFORM 1 FROM new_rows LIMIT 1;
+                END IF;
+                IF FOUND THEN
+                    UPDATE prem_injury.reference_version SET version = version + 1, updated_at = now();
+                END IF;
+                RETURN NULL;
+            END;
+            $$;
+        """)
+        for table in VERSIONED_TABLES:
+            for op, transition in (("insert", "NEW TABLE AS new_rows"), ("update", "NEW TABLE AS new_rows"),
+                                   ("delete", "OLD TABLE AS old_rows")):
+                cur.execute(f"""
+                    DROP TRIGGER IF EXISTS {table}_reference_{op} ON prem_injury.{table};
+                    CREATE TRIGGER {table}_reference_{op}
+                    AFTER {op.upper()} ON prem_injury.{table}
+                    REFERENCING {transition}
+                    FOR EACH STATEMENT EXECUTE FUNCTION prem_injury.bump_reference_version();
+                """)
+
+
+def seed_reference_data(cur):
+    """
+    Inserts the seed teams, aliases and season memberships missing from the
+    database. Does nothing once the database has this SEED_VERSION, and never
+    overwrites existing rows.
+    """
+    cur.execute("SELECT seed_version FROM prem_injury.reference_version")
+    if cur.fetchone()[0] == SEED_VERSION:
+        return
+
+    cur.execute("""
+        INSERT INTO prem_injury.teams (id, name)
+        SELECT * FROM unnest(%s::int[], %s::text[])
+        ON CONFLICT DO NOTHING;
+    """, ([team_id for team_id, _ in SEED_TEAMS], [name for _, name in SEED_TEAMS]))
+    # Explicit ids leave the serial behind; move it past them
+    cur.execute("""
+        SELECT setval(pg_get_serial_sequence('prem_injury.teams', 'id'),
+                      greatest((SELECT max(id) FROM prem_injury.teams), 1))
+    """)
+    cur.execute("""
+        INSERT INTO prem_injury.teams (name) SELECT unnest(%s::text[])
+        ON CONFLICT DO NOTHING;
+    """, (SEED_EXTRA_TEAMS,))
+
+    aliases, sources, names = zip(*SEED_ALIASES)
+    cur.execute("""
+        INSERT INTO prem_injury.team_aliases (alias, team_id, source)
+        SELECT a.alias, t.id, a.source
+        FROM unnest(%s::text[], %s::text[], %s::text[]) AS a(alias, source, name)
+        JOIN prem_injury.teams t ON t.name = a.name
+        ON CONFLICT (alias) DO NOTHING;
+    """, (list(aliases), list(sources), list(names)))
+
+    for (league, season), names in SEED_SEASONS.items():
+        cur.execute("""
+            INSERT INTO prem_injury.team_seasons (league, season, team_id)
+            SELECT %s, %s, id FROM prem_injury.teams WHERE name = ANY(%s)
+            ON CONFLICT DO NOTHING;
+        """, (league, season, names))
+
+    cur.execute("UPDATE prem_injury.reference_version SET seed_version = %s", (SEED_VERSION,))
+    print(f"Seeded reference data version {SEED_VERSION}.")
+
+
+def register_season_teams(cur, league, season, titles) -> int:
+    """
+    Records which clubs played a league season, given their names as a source
+    spells them (e.g. the Understat team titles). A name that is neither a
+    team nor a known alias becomes a new team, which is how promoted clubs
+    outside the seed list arrive.
+
+    :return: number of new teams
+    """
+    titles = sorted(set(titles))
+    cur.execute("""
+        INSERT INTO prem_injury.teams (name)
+        SELECT t FROM unnest(%s::text[]) t
+        WHERE NOT EXISTS (SELECT 1 FROM prem_injury.team_aliases a WHERE a.alias = t)
+          AND NOT EXISTS (SELECT 1 FROM prem_injury.teams tm WHERE tm.name = t)
+        ON CONFLICT DO NOTHING
+        RETURNING name;
+    """, (titles,))
+    added = [name for name, in cur.fetchall()]
+    if added:
+        print(f"New teams for {league} {season}: {', '.join(added)}")
+
+    cur.execute("""
+        INSERT INTO prem_injury.team_seasons (league, season, team_id)
+        SELECT DISTINCT %s, %s, coalesce(a.team_id, tm.id)
+        FROM unnest(%s::text[]) t
+        LEFT JOIN prem_injury.team_aliases a ON a.alias = t
+        LEFT JOIN prem_injury.teams tm ON tm.name = t
+        WHERE coalesce(a.team_id, tm.id) IS NOT NULL
+        ON CONFLICT DO NOTHING;
+    """, (league, season, titles))
+    return len(added)
+
+
+class ReferenceData:
+    """
+    Immutable snapshot of the reference tables at one version.
+
+    team_name_to_id maps canonical names and every alias to a team id;
+    team_names maps ids back to canonical names; season_teams maps
+    (league, season) to the frozenset of team ids that played it; players is
+    the PlayerIndex over player_details.
+    """
+
+    __slots__ = ("key", "team_name_to_id", "team_names", "season_teams", "players", "_rows")
+
+    def __init__(self, key, teams, aliases, seasons, player_rows):
+        names = {name: team_id for team_id, name in teams}
+        for alias, team_id in aliases:
+            names.setdefault(alias, team_id)
+
+        by_season = {}
+        for league, season, team_id in seasons:
+            by_season.setdefault((league, season), set()).add(team_id)
+
+        set_ = object.__setattr__
+        set_(self, "key", key)
+        set_(self, "team_name_to_id", MappingProxyType(names))
+        set_(self, "team_names", MappingProxyType(dict(teams)))
+        set_(self, "season_teams", MappingProxyType({k: frozenset(v) for k, v in by_season.items()}))
+        set_(self, "players", PlayerIndex(player_rows, key))
+        set_(self, "_rows", (teams, aliases, seasons, player_rows))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ReferenceData is immutable")
+
+    def __reduce__(self):
+        # Mapping proxies cannot be pickled; rebuild them from the rows
+        return ReferenceData, (self.key, *self._rows)
+
+    def to_json(self) -> str:
+        return json.dumps({"key": self.key, "rows": self._rows}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        key = tuple(data["key"])
+        return cls(key, *(tuple(map(tuple, rows)) for rows in data["rows"]))
+
+    @property
+    def version(self):
+        return self.key[1]
+
+    def team_id(self, name):
+        return self.team_name_to_id.get(name)
+
+    def teams_in(self, league, season) -> frozenset:
+        return self.season_teams.get((league, season), frozenset())
+
+
+_snapshots = {}
+
+
+def _reference_key(cur):
+    cur.execute("SELECT token, version FROM prem_injury.reference_version")
+    row = cur.fetchone()
+    return tuple(row) if row else None
+
+
+def _load(cur, key) -> ReferenceData:
+    cur.execute("SELECT id, name FROM prem_injury.teams ORDER BY id")
+    teams = tuple(cur.fetchall())
+    cur.execute("SELECT alias, team_id FROM prem_injury.team_aliases ORDER BY alias")
+    aliases = tuple(cur.fetchall())
+    cur.execute("SELECT league, season, team_id FROM prem_injury.team_seasons ORDER BY league, season, team_id")
+    seasons = tuple(cur.fetchall())
+    cur.execute("SELECT id, name, team_id FROM prem_injury.player_details ORDER BY id")
+    players = tuple(cur.fetchall())
+    return ReferenceData(key, teams, aliases, seasons, players)
+
+
+def get_reference_data(conn, cache_path=None) -> ReferenceData:
+    """
+    Returns the ReferenceData snapshot for the database behind conn, reusing
+    this process's copy or the cached copy from an earlier task when the
+    database's reference version still matches; otherwise loads it once.
+
+    Commit any reference changes made on conn before calling, or the snapshot
+    may describe rows that are later rolled back.
+    """
+    dsn = conn.dsn
+    try:
+        with conn.cursor() as cur:
+            key = _reference_key(cur)
+    except pg.errors.UndefinedTable:
+        conn.rollback()
+        raise RuntimeError("prem_injury reference tables are missing; run ensure_injury_schema first")
+
+    cached = _snapshots.get(dsn)
+    if cached is not None and cached.key == key:
+        return cached
+
+    cache_path = cache_path or os.path.join(
+        os.environ.get("INJURY_ETL_CACHE_DIR", DEFAULT_CACHE_DIR),
+        f"reference-{hashlib.blake2b(dsn.encode(), digest_size=8).hexdigest()}.json")
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cached = ReferenceData.from_json(f.read())
+        if cached.key == key:
+            _snapshots[dsn] = cached
+            return cached
+    except Exception as e:
+        # Missing, truncated or foreign files are all just a miss
+        if not isinstance(e, FileNotFoundError):
+            print(f"Ignoring reference cache {cache_path}: {e!r}")
+
+    with conn.cursor() as cur:
+        snapshot = _load(cur, key)
+    _snapshots[dsn] = snapshot
+
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # A temporary file of our own, so concurrent tasks never write into
+        # each other's half-written copy
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(cache_path),
+                                         prefix=".reference-", delete=False) as f:
+            tmp = f.name
+            f.write(snapshot.to_json())
+        os.replace(tmp, cache_path)
+    except OSError as e:
+        print(f"Could not cache reference data: {e}")
+        if tmp:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    return snapshot
@@ -0,0 +1,296 @@
+"""
+Task callables of dags/injury_etl_dag.py; the DAG file only wires them up.
+
+The scheduler imports this module every time it parses the DAG file, which
+it does every few seconds, so nothing here imports injury_etl, requests,
+BeautifulSoup, lxml, pandas or psycopg2 at module level; each task imports
+what it needs when it runs. benchmarks/bench_dag_import.py holds DAG parsing
+to its import-time budget.
+
+Tasks hand data to each other through the artifact store; XCom only carries
+the small references it returns.
+"""
+
+
+def sources_changed(fingerprints):
+    from injury_etl.cache import last_loaded_fingerprints
+
+    last = last_loaded_fingerprints()
+    return any(last.get(source) != digest for source, digest in fingerprints.items())
+
+
+# If either source fails the task fails once both are done; on retry the
+# one that succeeded is served from the response cache.
+def extract_sources_task(**kwargs):
+    from injury_etl.artifacts import get_artifact_store
+    from injury_etl.extract import UNDERSTAT_FIELDS, extract_sources, source_fingerprints
+    from injury_etl.metrics import stage, write_textfile
+
+    ti = kwargs["ti"]
+    store = get_artifact_store()
+    run_id = kwargs["run_id"]
+
+    with stage("extract.sources") as s:
+        sources = extract_sources(variables=("datesData", "playersData"), fields=UNDERSTAT_FIELDS)
+        understat = sources["understat"]
+        s.count("rows_out", len(understat["datesData"]) + len(understat["playersData"]))
+
+    ti.xcom_push(key="injury_html", value=store.put_bytes(run_id, "injury_html", sources["injuries"]))
+    ti.xcom_push(key="matches_json", value=store.put_rows(run_id, "matches_json", understat["datesData"]))
+    ti.xcom_push(key="players_raw", value=store.put_rows(run_id, "players_raw", understat["playersData"]))
+    ti.xcom_push(key="injury_fingerprints", value=source_fingerprints("injuries"))
+    ti.xcom_push(key="understat_fingerprints", value=source_fingerprints("understat/"))
+    write_textfile(job="injury_etl_extract")
+
+
+def injuries_changed_task(**kwargs):
+    if not sources_changed(kwargs["ti"].xcom_pull(key="injury_fingerprints", task_ids="extract_sources_task")):
+        print("Injury table unchanged since the last load; skipping.")
+        return False
+    return True
+
+
+def understat_changed_task(**kwargs):
+    if not sources_changed(kwargs["ti"].xcom_pull(key="understat_fingerprints", task_ids="extract_sources_task")):
+        print("Understat unchanged since the last load; skipping.")
+        return False
+    return True
+
+
+# Clubs new to the league this season are added as teams before the
+# Understat rows are mapped, so promoted sides are not rejected.
+def season_reference(conn, titles):
+    from injury_etl.extract import DEFAULT_LEAGUE, DEFAULT_SEASON
+    from injury_etl.load import ensure_injury_schema, load_teams
+    from injury_etl.reference import get_reference_data, register_season_teams
+
+    ensure_injury_schema(conn)
+    with conn.cursor() as cur:
+        load_teams(cur)
+        register_season_teams(cur, DEFAULT_LEAGUE, DEFAULT_SEASON, titles)
+    conn.commit()
+    return get_reference_data(conn)
+
+
+# Rows failing the quality rules, and rows the transform had to drop, go
+# to prem_injury.quarantine; a table with too many of them fails its task.
+def validate(conn, table, rows, reference, run_id, upstream_rejects=()):
+    from injury_etl.metrics import stage
+    from injury_etl.quality import quality_gate, reference_keys
+
+    with stage(f"validate.{table}"):
+        return quality_gate(conn, table, rows, reference_keys(reference), upstream_rejects, run_id)
+
+
+def transform_matches_task(**kwargs):
+    from injury_etl.artifacts import get_artifact_store
+    from injury_etl.metrics import stage, write_textfile
+    from injury_etl.transform import transform_match_data
+    from injury_etl.utils import db_connection
+
+    ti = kwargs["ti"]
+    store = get_artifact_store()
+    run_id = kwargs["run_id"]
+    matches_json = store.get_rows(ti.xcom_pull(key="matches_json", task_ids="extract_sources_task"))
+
+    with db_connection() as conn:
+        titles = {m[side]["title"] for m in matches_json for side in ("h", "a")}
+        reference = season_reference(conn, titles)
+
+        # The row transforms, not the columnar ones: at a season's size
+        # pandas costs more to set up than the whole loop takes
+        with stage("transform.matches") as s:
+            match_rejects = []
+            match_data = transform_match_data(matches_json, reference.team_name_to_id, match_rejects)
+            s.count("rows_in", len(matches_json))
+            s.count("rows_out", len(match_data))
+            s.count("rows_rejected", len(match_rejects))
+
+        match_data = validate(conn, "matches", match_data, reference, run_id, match_rejects)
+
+    ti.xcom_push(key="matches", value=store.put_rows(run_id, "matches", match_data))
+    write_textfile(job="injury_etl_transform_matches")
+
+
+def transform_players_task(**kwargs):
+    from injury_etl.artifacts import get_artifact_store
+    from injury_etl.metrics import stage, write_textfile
+    from injury_etl.transform import transform_player_stats
+    from injury_etl.utils import db_connection
+
+    ti = kwargs["ti"]
+    store = get_artifact_store()
+    run_id = kwargs["run_id"]
+    players_raw = store.get_rows(ti.xcom_pull(key="players_raw", task_ids="extract_sources_task"))
+
+    with db_connection() as conn:
+        # Players who moved mid-season have every club in team_title, comma separated
+        titles = {p["team_title"] for p in players_raw if "," not in p["team_title"]}
+        reference = season_reference(conn, titles)
+
+        with stage("transform.players") as s:
+            player_rejects = []
+            players, stats = transform_player_stats(players_raw, reference.team_name_to_id, player_rejects)
+            s.count("rows_in", len(players_raw))
+            s.count("rows_out", len(players))
+            s.count("rows_rejected", len(player_rejects))
+
+        # A player the transform dropped is missing from both tables; count it once
+        players = validate(conn, "player_details", players, reference, run_id, player_rejects)
+        stats = validate(conn, "player_stats", stats, reference, run_id)
+
+    ti.xcom_push(key="players", value=store.put_rows(run_id, "players", players))
+    ti.xcom_push(key="player_stats", value=store.put_rows(run_id, "player_stats", stats))
+    write_textfile(job="injury_etl_transform_players")
+
+
+# Only rows that are new or changed since the last successful load are
+# written; their hashes are recorded in the same transaction.
+def load_changed(cur, table, rows, loader):
+    from injury_etl.incremental import filter_changed, record_row_hashes
+
+    rows, hashes, counts = filter_changed(cur, table, rows)
+    loader(cur, rows)
+    record_row_hashes(cur, table, hashes)
+    print(f"{table}: {counts['new']} new, {counts['changed']} changed, {counts['unchanged']} unchanged")
+    return counts
+
+
+def load_matches_task(**kwargs):
+    from injury_etl.artifacts import get_artifact_store
+    from injury_etl.load import bulk_insert_matches, ensure_injury_schema, load_teams
+    from injury_etl.metrics import stage, write_textfile
+    from injury_etl.utils import db_connection
+
+    ti = kwargs["ti"]
+    matches = get_artifact_store().get_rows(ti.xcom_pull(key="matches", task_ids="transform_matches_task"))
+
+    with stage("load.matches"), db_connection() as conn:
+        ensure_injury_schema(conn)
+        with conn.cursor() as cur:
+            load_teams(cur)
+            counts = load_changed(cur, "matches", matches, bulk_insert_matches)
+        conn.commit()
+    ti.xcom_push(key="change_counts", value=counts)
+    write_textfile(job="injury_etl_load_matches")
+
+
+def load_players_task(**kwargs):
+    from injury_etl.artifacts import get_artifact_store
+    from injury_etl.load import bulk_insert_player_details, bulk_insert_player_stats, ensure_injury_schema, load_teams
+    from injury_etl.metrics import stage, write_textfile
+    from injury_etl.utils import db_connection
+
+    ti = kwargs["ti"]
+    store = get_artifact_store()
+    players = store.get_rows(ti.xcom_pull(key="players", task_ids="transform_players_task"))
+    player_stats = store.get_rows(ti.xcom_pull(key="player_stats", task_ids="transform_players_task"))
+
+    with stage("load.players"), db_connection() as conn:
+        ensure_injury_schema(conn)
+        with conn.cursor() as cur:
+            load_teams(cur)
+            counts = {
+                "player_details": load_changed(cur, "player_details", players, bulk_insert_player_details),
+                "player_stats": load_changed(cur, "player_stats", player_stats, bulk_insert_player_stats),
+            }
+        conn.commit()
+    ti.xcom_push(key="change_counts", value=counts)
+    write_textfile(job="injury_etl_load_players")
+
+
+# Recorded only once both halves of the Understat page are in, so a
+# failed matches load is retried by the next run instead of skipped.
+def understat_loaded_task(**kwargs):
+    from injury_etl.cache import mark_loaded
+
+    mark_loaded(kwargs["ti"].xcom_pull(key="understat_fingerprints", task_ids="extract_sources_task"))
+
+
+def transform_injuries_task(**kwargs):
+    from injury_etl.artifacts import get_artifact_store
+    from injury_etl.metrics import stage, write_textfile
+    from injury_etl.reference import get_reference_data
+    from injury_etl.transform import transform_injury_stream
+    from injury_etl.utils import db_connection
+
+    ti = kwargs["ti"]
+    store = get_artifact_store()
+    injury_html = store.get_bytes(ti.xcom_pull(key="injury_html", task_ids="extract_sources_task"))
+
+    with db_connection() as conn:
+        rejects = []
+        with stage("transform.injuries") as s:
+            injuries = list(transform_injury_stream(injury_html, conn, rejects=rejects))
+            s.count("rows_out", len(injuries))
+            s.count("rows_rejected", len(rejects))
+
+        injuries = validate(conn, "injuries", injuries, get_reference_data(conn), kwargs["run_id"], rejects)
+
+    ti.xcom_push(key="injuries", value=store.put_rows(kwargs["run_id"], "injuries", injuries))
+    write_textfile(job="injury_etl_transform_injuries")
+
+
+def load_injuries_task(**kwargs):
+    from injury_etl.artifacts import get_artifact_store
+    from injury_etl.cache import mark_loaded
+    from injury_etl.history import load_injury_snapshot
+    from injury_etl.incremental import filter_changed, record_row_hashes
+    from injury_etl.load import bulk_load_injuries_data, ensure_injury_schema
+    from injury_etl.metrics import stage, write_textfile
+    from injury_etl.utils import db_connection
+
+    ti = kwargs["ti"]
+    injuries = get_artifact_store().get_rows(ti.xcom_pull(key="injuries", task_ids="transform_injuries_task"))
+
+    changes = {}
+    with stage("load.injuries"), db_connection() as conn:
+        ensure_injury_schema(conn)
+        with conn.cursor() as cur:
+            snapshot = injuries
+            injuries, injury_hashes, changes["injuries"] = filter_changed(cur, "injuries", injuries)
+            record_row_hashes(cur, "injuries", injury_hashes)
+
+        # Commits the injury rows together with their hashes
+        bulk_load_injuries_data(conn, injuries)
+
+        # The history needs the full list to tell which injuries ended
+        changes["injury_history"] = load_injury_snapshot(conn, snapshot, kwargs["ds"])
+
+    counts = changes["injuries"]
+    print(f"injuries: {counts['new']} new, {counts['changed']} changed, {counts['unchanged']} unchanged")
+    ti.xcom_push(key="change_counts", value=changes)
+    mark_loaded(ti.xcom_pull(key="injury_fingerprints", task_ids="extract_sources_task"))
+    write_textfile(job="injury_etl_load_injuries")
+
+
+# Fetches the match pages of every stored match that has no per-match
+# detail yet, which after the first run is just the new results.
+def match_details_task(**kwargs):
+    from injury_etl.match_details import ingest_match_details
+    from injury_etl.metrics import stage, write_textfile
+    from injury_etl.utils import db_connection
+
+    with stage("match_details"), db_connection() as conn:
+        counts = ingest_match_details(conn)
+    kwargs["ti"].xcom_push(key="match_detail_counts", value=counts)
+    write_textfile(job="injury_etl_match_details")
+
+
+def analytics_task(**kwargs):
+    from injury_etl.analytics import refresh_analytics
+    from injury_etl.load import ensure_injury_schema
+    from injury_etl.metrics import stage, write_textfile
+    from injury_etl.utils import db_connection
+
+    with stage("analytics"), db_connection() as conn:
+        ensure_injury_schema(conn)
+        counts = refresh_analytics(conn)
+    kwargs["ti"].xcom_push(key="analytics_counts", value=counts)
+    write_textfile(job="injury_etl_analytics")
+
+
+def cleanup_task(**kwargs):
+    from injury_etl.artifacts import get_artifact_store
+
+    get_artifact_store().delete_run(kwargs["run_id"])
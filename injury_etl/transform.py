@@ -1,20 +1,59 @@
-def transform_injury_data(html_soup, dbconn, team_name_to_id=None):
-    from datetime import datetime
+import io
 
-    # Default to empty dict if not provided
-    team_name_to_id = team_name_to_id or {}
+from injury_etl.extract import DEFAULT_LEAGUE, DEFAULT_SEASON
+from injury_etl.records import InjuryRecord, MatchRecord, PlayerRecord, PlayerStatsRecord
+from injury_etl.reference import get_reference_data
 
-    # Step 1: Always initialize player_map
-    player_map = {}
 
-    with dbconn.cursor() as cur:
-        try:
-            cur.execute("SELECT id, name, team_id FROM prem_injury.player_details")
-            db_rows = cur.fetchall()
-            player_map = {(name.lower(), team_id): player_id for player_id, name, team_id in db_rows}
-        except Exception as e:
-            print(f"Could not fetch player_details: {e}")
-            # leave player_map as {}
+def resolve_injury(current_team, injury, team_name_to_id, player_index, rejects=None):
+    """
+    :param rejects: optional list; rows that cannot be resolved are appended
+        as ({"team": ..., **injury}, reason) for the quality gate
+    """
+    def reject(reason):
+        if rejects is not None:
+            rejects.append(({"team": current_team, **injury}, reason))
+        return None
+
+    team_id = team_name_to_id.get(current_team)
+
+    if not team_id:
+        print(f"Unknown team: {current_team}")
+        return reject(f"unknown team: {current_team}")
+
+    player_name = injury.get("Player", "")
+    player_id, confidence, method = player_index.resolve(player_name, team_id)
+    if not player_id:
+        print(f"Unknown player: {player_name.lower()} ({current_team})")
+        return reject(f"unknown player: {player_name}")
+    if method != "exact":
+        print(f"Matched {player_name} ({current_team}) by {method} lookup, confidence {confidence:.2f}")
+
+    raw_return = injury.get("Potential Return")
+    return_date = parse_date(raw_return)
+    # Words such as "TBC" or "No Return Date" mean no date; digits that do not
+    # parse mean the site's date format changed.
+    if return_date is None and raw_return and any(c.isdigit() for c in raw_return):
+        print(f"Unparseable return date for {player_name}: {raw_return}")
+        return reject(f"unparseable potential return: {raw_return}")
+
+    return InjuryRecord(
+        player_id,
+        team_id,
+        injury.get("Reason"),
+        injury.get("Further Detail"),
+        return_date,
+        injury.get("Condition"),
+        injury.get("Status"),
+    )
+
+
+def transform_injury_data(html_soup, dbconn, team_name_to_id=None, rejects=None):
+    # Teams and players come from one reference snapshot unless a team
+    # mapping is passed in
+    reference = get_reference_data(dbconn)
+    team_name_to_id = team_name_to_id or reference.team_name_to_id
+    player_index = reference.players
 
     transformed = []
 
@@ -38,31 +77,91 @@ def transform_injury_data(html_soup, dbconn, team_name_to_id=None):
 
         if "player-row" in class_list:
             injury = extract_player_injury(row)
-            team_id = team_name_to_id.get(current_team)
-
-            if not team_id:
-                print(f"Unknown team: {current_team}")
+            if injury is None:
                 continue
 
-            player_name = injury.get("Player", "").lower()
-            player_id = player_map.get((player_name, team_id))
-            if not player_id:
-                print(f"Unknown player: {player_name} ({current_team})")
-                continue
+            record = resolve_injury(current_team, injury, team_name_to_id, player_index, rejects)
+            if record:
+                transformed.append(record)
 
-            return_date = parse_date(injury.get("Potential Return"))
+    return transformed
 
-            transformed.append({
-                "player_id": player_id,
-                "team_id": team_id,
-                "reason": injury.get("Reason"),
-                "detail": injury.get("Further Detail"),
-                "potential_return": return_date,
-                "condition": injury.get("Condition"),
-                "status": injury.get("Status")
-            })
 
-    return transformed
+def iter_injury_rows(html):
+    """
+    Streams (team_name, injury) pairs out of the injury table with lxml
+    iterparse, clearing every element once it has been read so memory stays
+    flat however long the page is. Applies the same heading/skip rules as
+    transform_injury_data.
+
+    :param html: page as bytes, str, a file path or a binary file object;
+        bytes are read as UTF-8, as the site serves them
+    """
+    from lxml import etree
+
+    if isinstance(html, str) and "<" in html:
+        html = html.encode("utf-8")
+    if isinstance(html, (bytes, bytearray)):
+        html = io.BytesIO(html)
+
+    in_table = False
+    found_table = False
+    current_team = None
+    # <tr> elements open around the current element; a row's cells are only
+    # read, and cleared with it, once the row ends
+    row_depth = 0
+
+    # Without an explicit encoding libxml2 reads a page that has no
+    # <meta charset> as Latin-1 and mangles every non-ASCII name
+    for event, elem in etree.iterparse(html, events=("start", "end"), html=True, encoding="utf-8"):
+        tag = elem.tag
+
+        if event == "start":
+            if tag == "tr":
+                row_depth += 1
+            elif tag == "table" and {"injury-table", "injury-table-full"} <= set(elem.get("class", "").split()):
+                in_table = found_table = True
+            continue
+
+        if tag == "tr":
+            row_depth -= 1
+            if in_table and not row_depth:
+                class_list = elem.get("class", "").split()
+                if "heading" in class_list:
+                    div = next((d for d in elem.iter("div") if "injury-team" in d.get("class", "").split()), None)
+                    # Same as BeautifulSoup's get_text(strip=True)
+                    current_team = "".join(t.strip() for t in div.itertext()) if div is not None else None
+                elif not should_skip_row(class_list) and current_team and "player-row" in class_list:
+                    cells = list(elem.iter("td"))
+                    if len(cells) >= 6:
+                        yield current_team, injury_from_cells("".join(td.itertext()) for td in cells[:6])
+        elif row_depth:
+            continue
+        elif tag == "table" and {"injury-table", "injury-table-full"} <= set(elem.get("class", "").split()):
+            in_table = False
+
+        # Drop the finished element and everything before it
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+    if not found_table:
+        print("No injury table found.")
+
+
+def transform_injury_stream(html, dbconn, team_name_to_id=None, rejects=None):
+    """
+    Generator counterpart of transform_injury_data that parses the raw page
+    with iter_injury_rows instead of a BeautifulSoup tree.
+    """
+    reference = get_reference_data(dbconn)
+    team_name_to_id = team_name_to_id or reference.team_name_to_id
+    player_index = reference.players
+
+    for current_team, injury in iter_injury_rows(html):
+        record = resolve_injury(current_team, injury, team_name_to_id, player_index, rejects)
+        if record:
+            yield record
 
 
 
@@ -102,33 +201,30 @@ def should_skip_row(class_list):
     return any(cls in skip_keywords for cls in class_list) or any("showTeam" in cls for cls in class_list)
 
 
-def extract_player_injury(row):
-    cells = row.find_all("td")
-    if len(cells) < 6:
-        return None  # Guard in case layout is incomplete
+INJURY_FIELDS = ("Player", "Reason", "Further Detail", "Potential Return", "Condition", "Status")
 
-    def strip_prefix(text, prefix):
-        if text.startswith(prefix) and len(text) > len(prefix):
-            return text[len(prefix):].strip()
-        return text
 
-    # Clean each cell and remove field prefixes
-    player = strip_prefix(clean_text(cells[0].get_text()), "Player")
-    reason = strip_prefix(clean_text(cells[1].get_text()), "Reason")
-    detail = strip_prefix(clean_text(cells[2].get_text()), "Further Detail")
-    return_date = strip_prefix(clean_text(cells[3].get_text()), "Potential Return")
-    condition = strip_prefix(clean_text(cells[4].get_text()), "Condition")
-    status = strip_prefix(clean_text(cells[5].get_text()), "Status")
+def strip_prefix(text, prefix):
+    if text.startswith(prefix) and len(text) > len(prefix):
+        return text[len(prefix):].strip()
+    return text
 
+
+def injury_from_cells(cell_texts):
+    # Clean each cell and remove field prefixes
     return {
-        "Player": player,
-        "Reason": reason,
-        "Further Detail": detail,
-        "Potential Return": return_date,
-        "Condition": condition,
-        "Status": status
+        field: strip_prefix(clean_text(text), field)
+        for field, text in zip(INJURY_FIELDS, cell_texts)
     }
 
+
+def extract_player_injury(row):
+    cells = row.find_all("td")
+    if len(cells) < 6:
+        return None  # Guard in case layout is incomplete
+
+    return injury_from_cells(cell.get_text() for cell in cells[:6])
+
 def clean_text(text):
     return ' '.join(text.strip().split()) if text else ''
 
@@ -143,12 +239,30 @@ def parse_date(date_str):
         return None
 
 
-def transform_match_data(dates_json, team_name_to_id):
+def is_played(match) -> bool:
+    # datesData lists every fixture of the season; unplayed ones have
+    # isResult false and null goals and xG. Rows saved before isResult was
+    # kept fall back to the goals.
+    if "isResult" in match:
+        return bool(match["isResult"])
+    return (match.get("goals") or {}).get("h") is not None
+
+
+def transform_match_data(dates_json, team_name_to_id, rejects=None):
+    """
+    Unplayed fixtures are skipped; they are not rejects.
+
+    :param rejects: optional list; skipped matches are appended as
+        (source record, reason) for the quality gate
+    :return: MatchRecord list
+    """
     matches = []
 
-    for match in dates_json:
+    for match in filter(is_played, dates_json):
         try:
             match_id = int(match['id'])
+            if not isinstance(match['datetime'], str):
+                raise TypeError(f"datetime is {type(match['datetime']).__name__}, not str")
             date = match['datetime'][:10]
 
             home_team = match['h']['title']
@@ -164,6 +278,8 @@ def transform_match_data(dates_json, team_name_to_id):
 
             if home_team_id is None or away_team_id is None:
                 print(f"Skipping match {match_id}: unknown team(s) → {home_team}, {away_team}")
+                if rejects is not None:
+                    rejects.append((match, f"unknown team(s) → {home_team}, {away_team}"))
                 continue
 
             if goals_home > goals_away:
@@ -173,51 +289,316 @@ def transform_match_data(dates_json, team_name_to_id):
             else:
                 result = 'D'
 
-            matches.append({
-                'match_id': match_id,
-                'date': date,
-                'home_team_id': home_team_id,
-                'away_team_id': away_team_id,
-                'result': result,
-                'xg_home': xg_home,
-                'xg_away': xg_away
-            })
-        except Exception as e:
-            print(f"Skipping match {match.get('id', 'unknown')}: {e}")
+            matches.append(MatchRecord(match_id, date, home_team_id, away_team_id, result, xg_home, xg_away))
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Skipping match {match.get('id', 'unknown')}: {e!r}")
+            if rejects is not None:
+                rejects.append((match, f"malformed match: {e!r}"))
             continue
 
     return matches
 
-def transform_player_stats(players_data: list[dict], team_name_to_id: dict) -> tuple[list[dict], list[dict]]:
+def transform_player_stats(players_data: list[dict], team_name_to_id: dict, rejects=None,
+                           league=DEFAULT_LEAGUE, season=DEFAULT_SEASON) -> tuple[list, list]:
+    """
+    :param rejects: optional list; skipped players are appended as
+        (source record, reason) for the quality gate
+    :param league, season: the Understat league page the players come from
+    :return: (PlayerRecord list, PlayerStatsRecord list)
+    """
     players, player_stats = [], []
 
     for p in players_data:
-        team_id = team_name_to_id.get(p["team_title"])
+        team_id = team_name_to_id.get(p.get("team_title"))
         if team_id is None:
-            print(f"Unknown team: {p['team_title']} — skipping player {p['player_name']}")
+            print(f"Unknown team: {p.get('team_title')} — skipping player {p.get('player_name')}")
+            if rejects is not None:
+                rejects.append((p, f"unknown team: {p.get('team_title')}"))
             continue
 
-        players.append({
-            "understat_id": int(p["id"]),
-            "name": p["player_name"],
-            "position": p["position"],
-            "team_id": team_id
-        })
-
-        player_stats.append({
-            "understat_id": int(p["id"]),
-            "team_id": team_id,
-            "games": int(p["games"]),
-            "minutes": int(p["time"]),
-            "goals": int(p["goals"]),
-            "assists": int(p["assists"]),
-            "xg": float(p["xG"]),
-            "xa": float(p["xA"]),
-            "npxg": float(p["npxG"]),
-            "xgchain": float(p["xGChain"]),
-            "xgbuildup": float(p["xGBuildup"])
-        })
+        try:
+            understat_id = int(p["id"])
+            player = PlayerRecord(understat_id, p["player_name"], p["position"], team_id, season)
+            stats = PlayerStatsRecord(
+                understat_id, team_id, league, season,
+                int(p["games"]), int(p["time"]), int(p["goals"]), int(p["assists"]),
+                float(p["xG"]), float(p["xA"]), float(p["npxG"]), float(p["xGChain"]), float(p["xGBuildup"]),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Skipping player {p.get('id', 'unknown')}: {e!r}")
+            if rejects is not None:
+                rejects.append((p, f"malformed player: {e!r}"))
+            continue
+
+        players.append(player)
+        player_stats.append(stats)
 
     print(f"Found {len(players)} players")
     return players, player_stats
+
+
+def transform_match_details(match: dict, details: dict) -> tuple[list[dict], list[dict]]:
+    """
+    Turns one Understat match page into player appearances and shots.
+
+    :param match: stored match row with match_id, home_team_id, away_team_id
+    :param details: {"rostersData": ..., "shotsData": ...} from extract_understat_match
+    :return: (appearances, shots)
+    """
+    team_ids = {"h": match["home_team_id"], "a": match["away_team_id"]}
+    appearances, shots = [], []
+
+    for side, roster in details["rostersData"].items():
+        for r in roster.values():
+            try:
+                appearances.append({
+                    "match_id": match["match_id"],
+                    "understat_id": int(r["player_id"]),
+                    "team_id": team_ids[side],
+                    "position": r["position"],
+                    "started": r["position"] != "Sub",
+                    "minutes": int(r["time"]),
+                    "goals": int(r["goals"]),
+                    "own_goals": int(r["own_goals"]),
+                    "assists": int(r["assists"]),
+                    "shots": int(r["shots"]),
+                    "key_passes": int(r["key_passes"]),
+                    "yellow_cards": int(r["yellow_card"]),
+                    "red_cards": int(r["red_card"]),
+                    "xg": float(r["xG"]),
+                    "xa": float(r["xA"]),
+                    "xgchain": float(r["xGChain"]),
+                    "xgbuildup": float(r["xGBuildup"])
+                })
+            except Exception as e:
+                print(f"Skipping appearance {r.get('id', 'unknown')} in match {match['match_id']}: {e}")
+
+    for side, side_shots in details["shotsData"].items():
+        for shot in side_shots:
+            try:
+                shots.append({
+                    "shot_id": int(shot["id"]),
+                    "match_id": match["match_id"],
+                    "understat_id": int(shot["player_id"]),
+                    "team_id": team_ids[side],
+                    "minute": int(shot["minute"]),
+                    "result": shot["result"],
+                    "x": float(shot["X"]),
+                    "y": float(shot["Y"]),
+                    "xg": float(shot["xG"]),
+                    "situation": shot["situation"],
+                    "shot_type": shot["shotType"],
+                    "last_action": shot["lastAction"],
+                    "assisted_by": shot.get("player_assisted")
+                })
+            except Exception as e:
+                print(f"Skipping shot {shot.get('id', 'unknown')} in match {match['match_id']}: {e}")
+
+    return appearances, shots
     
+
+
+# --- Columnar transform path ---------------------------------------------
+# Same outputs as transform_match_data / transform_player_stats, but the
+# casting, team lookup and result calculation run over whole columns, and rows
+# that cannot be transformed are returned in a rejects frame with a reason
+# instead of being printed. Building the frames costs more than the row loops
+# save, even at ~38k matches, so the DAGs load through the row transforms;
+# this path is for callers that want the frames themselves.
+
+def _flatten(records, nested=()):
+    """
+    Builds a frame from a list of JSON records, expanding each nested dict
+    column in `nested` into "<column>.<key>" columns. Missing fields are NaN.
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame.from_records(records, index=pd.RangeIndex(len(records)))
+    for col in nested:
+        if col not in frame:
+            continue
+        values = [v if isinstance(v, dict) else {} for v in frame[col].tolist()]
+        inner = pd.DataFrame.from_records(values, index=frame.index).add_prefix(col + ".")
+        frame = pd.concat([frame.drop(columns=col), inner], axis=1)
+    frame["_source"] = pd.Series(list(records), index=frame.index, dtype=object)
+    return frame
+
+
+def _column(frame, name):
+    import pandas as pd
+
+    if name in frame:
+        return frame[name]
+    return pd.Series(None, index=frame.index, dtype=object)
+
+
+def _reject(frame, mask, rejects, reasons, reason):
+    import pandas as pd
+
+    rejects.append(frame.loc[mask, "_source"])
+    if isinstance(reason, str):
+        reason = pd.Series(reason, index=frame.index[mask])
+    reasons.append(reason)
+    return frame.loc[~mask]
+
+
+# Bounds of the int64 columns the int fields are cast into
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _cast(value, cast):
+    try:
+        value = cast(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if cast is int and not _INT64_MIN <= value <= _INT64_MAX:
+        return None
+    return value
+
+
+def _coerce(frame, rejects, reasons, columns, kind):
+    # Values are parsed by int() / float() themselves, as the row transforms
+    # do, so both paths accept and reject exactly the same values ("1.0" is
+    # not an int). An int too large for int64 is rejected too.
+    import numpy as np
+    import pandas as pd
+
+    cast, dtype = (int, "int64") if kind == "int" else (float, "float64")
+    for col in columns:
+        raw = frame[col]
+        objects = raw.to_numpy(dtype=object)
+        # A field missing from the source record
+        bad = pd.isna(objects)
+        try:
+            # Fast path: numpy casts object arrays with int() / float()
+            values = objects.astype(dtype)
+        except (TypeError, ValueError, OverflowError):
+            parsed = [_cast(v, cast) for v in objects]
+            bad |= np.array([v is None for v in parsed], dtype=bool)
+            values = np.array([0 if v is None else v for v in parsed], dtype=dtype)
+        if bad.any():
+            frame = _reject(frame, pd.Series(bad, index=raw.index), rejects, reasons, f"invalid {col}")
+            values = values[~bad]
+        frame = frame.assign(**{col: pd.Series(values, index=frame.index)})
+    return frame
+
+
+def _rejects_frame(rejects, reasons):
+    import pandas as pd
+
+    if not rejects:
+        return pd.DataFrame({"record": pd.Series(dtype=object), "reason": pd.Series(dtype=object)})
+    return pd.DataFrame({"record": pd.concat(rejects), "reason": pd.concat(reasons)})
+
+
+def transform_match_frame(dates_json, team_name_to_id):
+    """
+    Columnar transform_match_data. Unplayed fixtures are skipped; they are
+    not rejects.
+
+    :return: (matches DataFrame, rejects DataFrame with "record" and "reason")
+    """
+    import numpy as np
+    import pandas as pd
+
+    frame = _flatten([m for m in dates_json if is_played(m)], nested=("h", "a", "goals", "xG"))
+    frame = pd.DataFrame({
+        "_source": frame["_source"],
+        "match_id": _column(frame, "id"),
+        "datetime": _column(frame, "datetime"),
+        "home_team": _column(frame, "h.title"),
+        "away_team": _column(frame, "a.title"),
+        "goals_home": _column(frame, "goals.h"),
+        "goals_away": _column(frame, "goals.a"),
+        "xg_home": _column(frame, "xG.h"),
+        "xg_away": _column(frame, "xG.a"),
+    })
+    rejects, reasons = [], []
+
+    missing = frame[["datetime", "home_team", "away_team"]].isna().any(axis=1)
+    if missing.any():
+        frame = _reject(frame, missing, rejects, reasons, "missing field")
+
+    # Only a string date is sliced to YYYY-MM-DD, as in transform_match_data
+    not_str = frame["datetime"].map(type) != str
+    if not_str.any():
+        frame = _reject(frame, not_str, rejects, reasons, "invalid datetime")
+
+    frame = _coerce(frame, rejects, reasons, ["match_id", "goals_home", "goals_away"], "int")
+    frame = _coerce(frame, rejects, reasons, ["xg_home", "xg_away"], "float")
+
+    # Team lookup as a hash join against the name -> id mapping
+    home_team_id = frame["home_team"].map(team_name_to_id)
+    away_team_id = frame["away_team"].map(team_name_to_id)
+    unknown = home_team_id.isna() | away_team_id.isna()
+    if unknown.any():
+        frame = _reject(frame, unknown, rejects, reasons,
+                        "unknown team(s) → " + frame.loc[unknown, "home_team"].astype(str)
+                        + ", " + frame.loc[unknown, "away_team"].astype(str))
+
+    goals_home, goals_away = frame["goals_home"].to_numpy(), frame["goals_away"].to_numpy()
+    matches = pd.DataFrame({
+        "match_id": frame["match_id"],
+        "date": frame["datetime"].str[:10],
+        "home_team_id": home_team_id.loc[frame.index].astype("int64"),
+        "away_team_id": away_team_id.loc[frame.index].astype("int64"),
+        "result": np.select([goals_home > goals_away, goals_home < goals_away], ["H", "A"], "D"),
+        "xg_home": frame["xg_home"],
+        "xg_away": frame["xg_away"],
+    }).reset_index(drop=True)
+
+    return matches, _rejects_frame(rejects, reasons).sort_index().reset_index(drop=True)
+
+
+def transform_player_frame(players_data, team_name_to_id, league=DEFAULT_LEAGUE, season=DEFAULT_SEASON):
+    """
+    Columnar transform_player_stats.
+
+    :return: (players DataFrame, player_stats DataFrame, rejects DataFrame)
+    """
+    import pandas as pd
+
+    int_fields = {"games": "games", "minutes": "time", "goals": "goals", "assists": "assists"}
+    float_fields = {"xg": "xG", "xa": "xA", "npxg": "npxG", "xgchain": "xGChain", "xgbuildup": "xGBuildup"}
+
+    source = _flatten(players_data)
+    columns = {
+        "_source": source["_source"],
+        "understat_id": _column(source, "id"),
+        "name": _column(source, "player_name"),
+        "position": _column(source, "position"),
+        "team_title": _column(source, "team_title"),
+    }
+    for out, src in {**int_fields, **float_fields}.items():
+        columns[out] = _column(source, src)
+    frame = pd.DataFrame(columns)
+    rejects, reasons = [], []
+
+    team_id = frame["team_title"].map(team_name_to_id)
+    unknown = team_id.isna()
+    if unknown.any():
+        frame = _reject(frame, unknown, rejects, reasons,
+                        "unknown team: " + frame.loc[unknown, "team_title"].astype(str))
+    frame = frame.assign(team_id=team_id.loc[frame.index].astype("int64"))
+
+    frame = _coerce(frame, rejects, reasons, ["understat_id", *int_fields], "int")
+    frame = _coerce(frame, rejects, reasons, list(float_fields), "float")
+    frame = frame.reset_index(drop=True).assign(league=league, season=season)
+
+    players = frame[["understat_id", "name", "position", "team_id", "season"]].astype(
+        {"name": object, "position": object, "season": object})
+    player_stats = frame[["understat_id", "team_id", "league", "season", *int_fields, *float_fields]].astype(
+        {"league": object, "season": object})
+
+    return players, player_stats, _rejects_frame(rejects, reasons).sort_index().reset_index(drop=True)
+
+
+def frame_to_records(frame, record_type=None) -> list:
+    """
+    Converts a transform frame back to rows load accepts: dicts by default,
+    or record_type tuples (e.g. MatchRecord) taken from the matching columns.
+    """
+    if record_type is None:
+        return frame.to_dict("records")
+    columns = frame[list(record_type._fields)]
+    return [record_type._make(row) for row in columns.itertuples(index=False, name=None)]
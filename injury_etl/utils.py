@@ -1,58 +1,103 @@
+import os
+import threading
+from contextlib import contextmanager
+
 import psycopg2 as pg
+from psycopg2 import pool as pg_pool
+
+from injury_etl.metrics import CountingCursor
+from injury_etl.reference import get_reference_data
+
+DB_CONFIG = {
+    "dbname": os.environ.get("INJURY_DB_NAME", "your_db_name"),
+    "user": os.environ.get("INJURY_DB_USER", "your_db_user"),
+    "password": os.environ.get("INJURY_DB_PASSWORD", "your_password"),
+    "host": os.environ.get("INJURY_DB_HOST", "db_host"),
+    "port": os.environ.get("INJURY_DB_PORT", "5432"),
+}
+POOL_MIN_SIZE = int(os.environ.get("INJURY_DB_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.environ.get("INJURY_DB_POOL_MAX", "4"))
+# Seconds db_connection waits for a free connection before giving up
+POOL_TIMEOUT = float(os.environ.get("INJURY_DB_POOL_TIMEOUT", "30"))
+
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool raises PoolError instead of waiting when every
+# connection is checked out, so checkouts queue on this first. Both limits
+# are per process: concurrent Airflow tasks each have their own pool.
+_pool_slots = threading.BoundedSemaphore(POOL_MAX_SIZE)
+
 
 def get_db_connection():
-    return pg.connect(
-        dbname="your_db_name",
-        user="your_db_user",
-        password="your_password",
-        host="db_host",
-        port="5432"
-    )
+    return pg.connect(cursor_factory=CountingCursor, **DB_CONFIG)
+
+def get_pool():
+    """Process-wide connection pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = pg_pool.ThreadedConnectionPool(
+                POOL_MIN_SIZE, POOL_MAX_SIZE, cursor_factory=CountingCursor, **DB_CONFIG)
+        return _pool
+
+def _is_healthy(conn) -> bool:
+    if conn.closed:
+        return False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except pg.Error:
+        return False
+
+@contextmanager
+def db_connection():
+    """
+    Checks a connection out of the pool for the duration of the block.
+
+    Waits up to POOL_TIMEOUT seconds for a free connection when all
+    POOL_MAX_SIZE are in use in this process. Connections that fail a
+    SELECT 1 health check are discarded and replaced. Uncommitted work is
+    rolled back when the block exits, and the connection goes back to the
+    pool either way.
+    """
+    if not _pool_slots.acquire(timeout=POOL_TIMEOUT):
+        raise pg_pool.PoolError(f"no database connection free after {POOL_TIMEOUT:.0f}s")
+    try:
+        conn_pool = get_pool()
+        conn = conn_pool.getconn()
+        if not _is_healthy(conn):
+            conn_pool.putconn(conn, close=True)
+            conn = conn_pool.getconn()
+
+        try:
+            yield conn
+        finally:
+            broken = conn.closed
+            if not broken:
+                try:
+                    conn.rollback()
+                except pg.Error:
+                    broken = True
+            conn_pool.putconn(conn, close=broken)
+    finally:
+        _pool_slots.release()
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+        _pool = None
 
 def get_team_name_to_id(db_conn) -> dict:
     """
-    Queries the teams table and returns a mapping of normalized team_name → team_id.
-    Applies Understat → DB name normalization.
+    Mapping of canonical team name and every known alias (Understat,
+    premierinjuries, ScraperAPI) to team_id, from the cached reference
+    snapshot.
 
     :param db_conn: psycopg2 connection object
-    :return: dict {normalized_team_name: team_id}
+    :return: dict {team_name: team_id}
     """
-    # Name mapping from Understat to your DB
-    understat_to_db_name = {
-        "Arsenal": "Arsenal",
-        "Aston Villa": "Aston Villa",
-        "Bournemouth": "AFC Bournemouth",
-        "Brentford": "Brentford",
-        "Brighton": "Brighton & Hove Albion",
-        "Chelsea": "Chelsea",
-        "Crystal Palace": "Crystal Palace",
-        "Everton": "Everton",
-        "Fulham": "Fulham",
-        "Ipswich": "Ipswich Town",
-        "Leicester": "Leicester City",
-        "Liverpool": "Liverpool",
-        "Manchester City": "Manchester City",
-        "Manchester United": "Manchester United",
-        "Newcastle United": "Newcastle United",
-        "Nottingham Forest": "Nottingham Forest",
-        "Southampton": "Southampton",
-        "Tottenham": "Tottenham Hotspur",
-        "West Ham": "West Ham United",
-        "Wolverhampton Wanderers": "Wolverhampton Wanderers"
-    }
-
-    with db_conn.cursor() as cur:
-        try:
-            cur.execute("SELECT id, name FROM prem_injury.teams")
-            rows = cur.fetchall()
-            # Base mapping: full DB name → ID
-            name_to_id = {name: team_id for team_id, name in rows}
-
-            # Add aliases: short Understat name → same ID
-            for short_name, full_name in understat_to_db_name.items():
-                if full_name in name_to_id:
-                    name_to_id[short_name] = name_to_id[full_name]
-
-            return name_to_id
-        except:
-            pass
\ No newline at end of file
+    return dict(get_reference_data(db_conn).team_name_to_id)